@@ -641,10 +641,14 @@ INSTALLATION_GUIDE = """
 """
 Если хочешь более мощный ИИ - можно сделать Python backend:
 
-1. Запусти локальный Flask сервер
+1. Запусти локальный сервер: python -m kozel_engine.server
 2. Расширение шлёт запросы на localhost:5000/recommend
 3. Python возвращает рекомендацию
 
+Сервер асинхронный: поиск идёт в пуле процессов, одинаковые запросы
+(расширение повторяет их, пока состояние не меняется) склеиваются,
+готовые ответы берутся из LRU-кэша по хешу состояния.
+
 Плюсы:
 - Можно использовать Claude API для сложных решений
 - Полный Python код логики игры
@@ -656,72 +660,29 @@ INSTALLATION_GUIDE = """
 """
 
 PYTHON_BACKEND = '''
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import anthropic
-
-app = Flask(__name__)
-CORS(app)  # Разрешаем CORS для расширения
-
-# Твой API ключ Claude
-ANTHROPIC_API_KEY = "..."
-
-@app.route('/recommend', methods=['POST'])
-def recommend():
-    """
-    Получить рекомендацию от ИИ
-    
-    Вход: { gameState: {...} }
-    Выход: { card: {...}, reasoning: "..." }
-    """
-    game_state = request.json['gameState']
-    
-    # Вариант 1: Локальная логика (быстро)
-    recommendation = local_ai_logic(game_state)
-    
-    # Вариант 2: Через Claude API (мощно, но медленнее)
-    # recommendation = claude_api_logic(game_state)
-    
-    return jsonify(recommendation)
-
-
-def local_ai_logic(game_state):
-    """Быстрая локальная логика"""
-    # ... твой код из KozelAI ...
-    pass
-
-
-def claude_api_logic(game_state):
-    """Используем Claude для сложных решений"""
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-    
-    prompt = f"""
-Ты эксперт в игре "Козёл". Проанализируй ситуацию и дай рекомендацию.
-
-Правила игры:
-{open('правила_козла.txt').read()}
-
-Текущее состояние:
-Мои карты: {game_state['myCards']}
-Стол: {game_state['tableCards']}
-Счёт: {game_state['myScore']} - {game_state['opponentScore']}
-
-Какой картой лучше ходить и почему?
-Ответь в формате JSON: {{"card": ..., "reasoning": "..."}}
-"""
-    
-    message = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=1000,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    import json
-    return json.loads(message.content[0].text)
-
-
-if __name__ == '__main__':
-    app.run(port=5000)
+# Локальная логика - готовый сервер kozel_engine/server.py
+# (только стандартная библиотека, Flask не нужен):
+#
+#   python -m kozel_engine.server --port 5000 --engine pimc --budget-ms 300
+#
+#   POST /recommend  { gameState: {...} }  ->  { card, reasoning, cached }
+#   GET  /stats      попадания в кэш, склеенные запросы, задержки p50/p99
+#
+# --engine kozelai - правила KozelAI (миллисекунды),
+# pimc / ismcts - поиск с бюджетом --budget-ms на ход.
+
+# Уточнение через Claude API - второй уровень того же сервера
+# (kozel_engine/refine.py). Локальный движок отвечает всегда; модель
+# спрашивается, только если до дедлайна осталось время, а её ответ
+# запоминается по состоянию и достаётся следующему опросу:
+#
+#   export ANTHROPIC_API_KEY=...
+#   python -m kozel_engine.server --engine kozelai --refine --deadline-ms 800
+#
+#   POST /recommend  ->  { card, reasoning, cached, tier: "local" | "refined" }
+#
+# Правила читаются один раз при старте, статическая часть промпта
+# кэшируется; --api-url направляет запросы на локальную заглушку.
 '''
 
 
@@ -0,0 +1,213 @@
+/**
+ * KozelDB - обёртка над IndexedDB "KozelGames" (история ходов, профили)
+ *
+ * Схема версионируется: KozelDB.MIGRATIONS[i] переводит базу с версии i
+ * на i + 1, новая версия = число миграций. Старые миграции не меняются -
+ * только добавляются новые.
+ */
+
+class KozelDB {
+    constructor(name = 'KozelGames') {
+        this.name = name;
+        this.dbPromise = null;
+    }
+
+    /**
+     * Открыть базу (один раз), применив недостающие миграции
+     */
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(this.name, KozelDB.MIGRATIONS.length);
+                request.onupgradeneeded = (event) => {
+                    const db = request.result;
+                    for (let v = event.oldVersion; v < KozelDB.MIGRATIONS.length; v++) {
+                        KozelDB.MIGRATIONS[v](db, request.transaction);
+                    }
+                };
+                request.onsuccess = () => {
+                    const db = request.result;
+                    // Другая вкладка обновляет схему - отпускаем базу
+                    db.onversionchange = () => {
+                        db.close();
+                        this.dbPromise = null;
+                    };
+                    resolve(db);
+                };
+                request.onerror = () => reject(request.error);
+                request.onblocked = () => console.warn('[KozelDB] Обновление схемы ждёт закрытия других вкладок');
+            });
+            this.dbPromise.catch(() => {
+                this.dbPromise = null;
+            });
+        }
+        return this.dbPromise;
+    }
+
+    /**
+     * Выполнить работу в одной транзакции
+     * @param {string|string[]} stores - хранилища транзакции
+     * @param {string} mode - 'readonly' или 'readwrite'
+     * @param {Function} work - (tx) => результат; вызывается синхронно
+     * @returns {Promise} результат work после завершения транзакции
+     */
+    async transaction(stores, mode, work) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(stores, mode);
+            let result;
+            tx.oncomplete = () => resolve(result);
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error || new Error('Транзакция прервана'));
+            result = work(tx);
+        });
+    }
+
+    /**
+     * Результат запроса IDBRequest внутри transaction: {value} после завершения
+     */
+    static capture(request) {
+        const box = { value: undefined };
+        request.onsuccess = () => {
+            box.value = request.result;
+        };
+        return box;
+    }
+
+    async add(store, value) {
+        const box = await this.transaction(store, 'readwrite',
+            tx => KozelDB.capture(tx.objectStore(store).add(value)));
+        return box.value;
+    }
+
+    async put(store, value) {
+        const box = await this.transaction(store, 'readwrite',
+            tx => KozelDB.capture(tx.objectStore(store).put(value)));
+        return box.value;
+    }
+
+    async get(store, key) {
+        const box = await this.transaction(store, 'readonly',
+            tx => KozelDB.capture(tx.objectStore(store).get(key)));
+        return box.value;
+    }
+
+    async count(store, index = null, query = null) {
+        const box = await this.transaction(store, 'readonly', tx => {
+            const source = index ? tx.objectStore(store).index(index) : tx.objectStore(store);
+            return KozelDB.capture(source.count(query));
+        });
+        return box.value;
+    }
+
+    /**
+     * Обойти записи курсором страницами по pageSize
+     *
+     * Каждая страница читается своей короткой транзакцией, поэтому между
+     * записями можно ждать что угодно (IndexedDB закрывает транзакцию,
+     * если ждать внутри неё не-IDB промисы).
+     *
+     * @param {string} store
+     * @param {Object} options - index, query (IDBKeyRange), direction ('next'/'prev'), pageSize
+     */
+    async *iterate(store, { index = null, query = null, direction = 'next', pageSize = 200 } = {}) {
+        let last = null;  // {key, primaryKey} последней выданной записи
+        while (true) {
+            const page = await this._readPage(store, index, query, direction, pageSize, last);
+            for (const entry of page) {
+                yield entry.value;
+            }
+            if (page.length < pageSize) {
+                return;
+            }
+            last = page[page.length - 1];
+        }
+    }
+
+    async _readPage(store, index, query, direction, pageSize, last) {
+        const sign = direction === 'prev' ? -1 : 1;
+        // Запись после last в порядке обхода: сначала по ключу, затем по
+        // первичному ключу (у хранилища они совпадают)
+        const isPast = (cursor) => {
+            const byKey = indexedDB.cmp(cursor.key, last.key) * sign;
+            return byKey > 0 || (byKey === 0 && indexedDB.cmp(cursor.primaryKey, last.primaryKey) * sign > 0);
+        };
+
+        return this.transaction(store, 'readonly', tx => {
+            const objectStore = tx.objectStore(store);
+            const source = index ? objectStore.index(index) : objectStore;
+            const request = source.openCursor(query, direction);
+            const page = [];
+            request.onsuccess = () => {
+                const cursor = request.result;
+                if (!cursor) return;
+                if (last && !isPast(cursor)) {
+                    // Перескок к месту прошлой страницы без чтения записей;
+                    // перескок встаёт на last (если она цела), её пропускаем
+                    const atLast = indexedDB.cmp(cursor.key, last.key) === 0 &&
+                        indexedDB.cmp(cursor.primaryKey, last.primaryKey) === 0;
+                    if (atLast) {
+                        cursor.continue();
+                    } else if (index) {
+                        cursor.continuePrimaryKey(last.key, last.primaryKey);
+                    } else {
+                        cursor.continue(last.key);
+                    }
+                    return;
+                }
+                page.push({ key: cursor.key, primaryKey: cursor.primaryKey, value: cursor.value });
+                if (page.length < pageSize) {
+                    cursor.continue();
+                }
+            };
+            return page;
+        });
+    }
+
+    /**
+     * Удалить записи по диапазону индекса
+     * @returns {Promise<number>} число удалённых записей
+     */
+    async deleteRange(store, index, query) {
+        const counter = await this.transaction(store, 'readwrite', tx => {
+            const objectStore = tx.objectStore(store);
+            const deleted = { value: 0 };
+            const request = objectStore.index(index).openKeyCursor(query);
+            request.onsuccess = () => {
+                const cursor = request.result;
+                if (!cursor) return;
+                objectStore.delete(cursor.primaryKey);
+                deleted.value++;
+                cursor.continue();
+            };
+            return deleted;
+        });
+        return counter.value;
+    }
+}
+
+/**
+ * Миграции схемы: MIGRATIONS[v](db, tx) - с версии v на v + 1
+ */
+KozelDB.MIGRATIONS = [
+    // 1: журнал ходов и заголовки игр (move-history.js)
+    (db) => {
+        const moves = db.createObjectStore('moves', { keyPath: 'seq', autoIncrement: true });
+        moves.createIndex('gameId', 'gameId');
+        moves.createIndex('timestamp', 'timestamp');
+
+        const games = db.createObjectStore('games', { keyPath: 'gameId' });
+        games.createIndex('endTime', 'endTime');
+    },
+
+    // 2: профили игроков (profiler.js); lastUpdated - ISO-строка
+    (db) => {
+        const profiles = db.createObjectStore('profiles', { keyPath: 'name' });
+        profiles.createIndex('lastUpdate', 'lastUpdated');
+    }
+];
+
+// Экспорт
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = KozelDB;
+}
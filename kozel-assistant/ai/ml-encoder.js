@@ -70,60 +70,69 @@ class MLStateEncoder {
      * Закодировать состояние игры
      */
     encodeGameState(gameState) {
-        const features = [];
+        return this.encodeGameStateInto(gameState, new Array(this.INPUT_SIZE), 0);
+    }
+
+    /**
+     * Закодировать состояние игры в готовый буфер без промежуточных массивов
+     * @param {Object} gameState - состояние игры
+     * @param {Array|Float32Array} out - буфер (например, строка пакета)
+     * @param {number} offset - начало вектора в буфере
+     * @returns {Array|Float32Array} out
+     */
+    encodeGameStateInto(gameState, out, offset = 0) {
+        const deck = this.CARDS_IN_DECK;
+        out.fill(0, offset, offset + this.INPUT_SIZE);
 
         // 1. Карты на руке (36 признаков)
         const myCards = gameState.myCards || [];
-        const handVector = this.encodeCards(myCards, this.CARDS_IN_DECK);
-        features.push(...handVector);
+        if (Array.isArray(myCards)) {
+            for (const card of myCards) {
+                const index = this.getCardIndex(card);
+                if (index >= 0 && index < deck) {
+                    out[offset + index] = 1;
+                }
+            }
+        }
 
         // 2. Карты на столе (36 признаков)
-        const tableCardsFlat = (gameState.tableCards || []).map(tc => tc.card);
-        const tableVector = this.encodeCards(tableCardsFlat, this.CARDS_IN_DECK);
-        features.push(...tableVector);
+        const tableCards = gameState.tableCards || [];
+        for (const tc of tableCards) {
+            const index = this.getCardIndex(tc.card);
+            if (index >= 0 && index < deck) {
+                out[offset + deck + index] = 1;
+            }
+        }
 
         // 3. Позиция игрока (4 признака: bottom=1,0,0,0)
-        features.push(1, 0, 0, 0);  // Всегда bottom для нас
+        let i = offset + 2 * deck;
+        out[i] = 1;  // Всегда bottom для нас
+        i += 4;
 
         // 4. Счёт (2 признака, нормализованный)
-        const myScore = (gameState.myTeamScore || 0) / 120;  // Нормализация к [0,1]
-        const oppScore = (gameState.opponentScore || 0) / 120;
-        features.push(myScore, oppScore);
+        out[i++] = (gameState.myTeamScore || 0) / 120;  // Нормализация к [0,1]
+        out[i++] = (gameState.opponentScore || 0) / 120;
 
         // 5. Мой ход (1 признак)
-        features.push(gameState.myTurn ? 1 : 0);
-
-        // 6. Кто выигрывает взятку (3 признака)
-        const tableCards = gameState.tableCards || [];
-        let trickWinner = [1, 0, 0];  // nobody, partner, opponent
+        out[i++] = gameState.myTurn ? 1 : 0;
 
+        // 6. Кто выигрывает взятку (3 признака: nobody, partner, opponent)
+        let trickWinner = 0;
         if (tableCards.length > 0 && typeof KozelRules !== 'undefined') {
             const winner = KozelRules.getTrickWinner(tableCards);
-            if (winner === 'bottom') {
-                trickWinner = [0, 1, 0];  // we/partner winning
-            } else if (winner === 'top') {
-                trickWinner = [0, 1, 0];  // partner winning
-            } else {
-                trickWinner = [0, 0, 1];  // opponent winning
-            }
+            // bottom и top - мы с партнёром
+            trickWinner = winner === 'bottom' || winner === 'top' ? 1 : 2;
         }
-        features.push(...trickWinner);
-
-        // 7. Дополнительные признаки (10 признаков)
-        features.push(
-            myCards.length / 9,                           // Карт на руке (нормализовано)
-            tableCards.length / 4,                        // Карт на столе (нормализовано)
-            (gameState.teams?.myGames || 0) / 3,         // Выигранных партий (нормализовано)
-            (gameState.teams?.opponentGames || 0) / 3,   // Проигранных партий
-            0,  // Резерв
-            0,  // Резерв
-            0,  // Резерв
-            0,  // Резерв
-            0,  // Резерв
-            0   // Резерв
-        );
+        out[i + trickWinner] = 1;
+        i += 3;
+
+        // 7. Дополнительные признаки (10 признаков, последние 6 - резерв)
+        out[i++] = myCards.length / 9;                            // Карт на руке (нормализовано)
+        out[i++] = tableCards.length / 4;                         // Карт на столе (нормализовано)
+        out[i++] = (gameState.teams?.myGames || 0) / 3;          // Выигранных партий (нормализовано)
+        out[i++] = (gameState.teams?.opponentGames || 0) / 3;    // Проигранных партий
 
-        return features;
+        return out;
     }
 
     /**
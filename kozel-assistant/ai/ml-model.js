@@ -21,6 +21,17 @@ class KozelML {
             lastLoss: null,
             modelVersion: '1.0'
         };
+
+        // Пакетные предсказания: пакет - один model.predict, буфер входа
+        // переиспользуется между пакетами
+        this.inputBuffer = null;
+
+        // Счётчики пакетов (не сохраняются в chrome.storage)
+        this.batchStats = {
+            batches: 0,
+            maxBatch: 0,
+            leakedTensors: 0
+        };
     }
 
     /**
@@ -101,54 +112,101 @@ class KozelML {
     }
 
     /**
-     * Предсказать лучшую карту
+     * Предсказать лучшую карту (пакет из одного состояния)
      */
     async predictBestCard(gameState, legalCards) {
         if (!this.modelLoaded || !this.model) {
             return null;
         }
 
+        const [prediction] = await this.predictBatch([{ gameState, legalCards }]);
+        return prediction;
+    }
+
+    /**
+     * Предсказать лучшие карты для нескольких состояний одним вызовом модели
+     *
+     * Состояния кодируются в один Float32Array, model.predict выполняется
+     * внутри tf.tidy, лучшая карта - argmax вероятностей по легальным картам
+     * своего состояния.
+     *
+     * @param {Array<{gameState, legalCards}>} requests
+     * @returns {Promise<Array<{card, confidence, probabilities}|null>>}
+     */
+    async predictBatch(requests) {
+        if (!this.modelLoaded || !this.model) {
+            return requests.map(() => null);
+        }
+        if (requests.length === 0) {
+            return [];
+        }
+
         try {
-            // Кодируем состояние
-            const stateVector = this.encoder.encodeGameState(gameState);
+            const inputSize = this.encoder.getInputSize();
+            const outputSize = this.encoder.getOutputSize();
+            const n = requests.length;
+
+            // Буфер растёт степенями двойки и не перевыделяется на каждом пакете
+            if (!this.inputBuffer || this.inputBuffer.length < n * inputSize) {
+                let rows = 1;
+                while (rows < n) {
+                    rows *= 2;
+                }
+                this.inputBuffer = new Float32Array(rows * inputSize);
+            }
+            for (let r = 0; r < n; r++) {
+                this.encoder.encodeGameStateInto(requests[r].gameState, this.inputBuffer, r * inputSize);
+            }
 
-            // Предсказание
-            const inputTensor = tf.tensor2d([stateVector]);
-            const prediction = this.model.predict(inputTensor);
-            const probabilities = await prediction.data();
+            // Промежуточные тензоры освобождает tidy, выход - мы после data()
+            const tensorsBefore = tf.memory().numTensors;
+            const output = tf.tidy(() => this.model.predict(
+                tf.tensor2d(this.inputBuffer.subarray(0, n * inputSize), [n, inputSize])
+            ));
+            let probabilities;
+            try {
+                probabilities = await output.data();
+            } finally {
+                output.dispose();
+            }
+            const leaked = tf.memory().numTensors - tensorsBefore;
+            if (leaked > 0) {
+                this.batchStats.leakedTensors += leaked;
+                console.warn(`[KozelML] После пакета осталось лишних тензоров: ${leaked}`);
+            }
 
-            // Очищаем тензоры
-            inputTensor.dispose();
-            prediction.dispose();
-
-            // Находим лучшую легальную карту
-            let bestCard = null;
-            let bestProb = -1;
-
-            for (const card of legalCards) {
-                const cardIndex = this.encoder.encodeAction(card);
-                if (cardIndex >= 0 && cardIndex < probabilities.length) {
-                    const prob = probabilities[cardIndex];
-                    if (prob > bestProb) {
-                        bestProb = prob;
+            const results = requests.map(({ legalCards }, r) => {
+                const row = probabilities.subarray(r * outputSize, (r + 1) * outputSize);
+
+                // Находим лучшую легальную карту
+                let bestCard = null;
+                let bestProb = -1;
+                for (const card of legalCards || []) {
+                    const cardIndex = this.encoder.encodeAction(card);
+                    if (cardIndex >= 0 && cardIndex < outputSize && row[cardIndex] > bestProb) {
+                        bestProb = row[cardIndex];
                         bestCard = card;
                     }
                 }
-            }
 
-            this.stats.predictions++;
+                return {
+                    card: bestCard,
+                    confidence: bestProb,
+                    probabilities: row
+                };
+            });
 
-            console.log(`[KozelML] Предсказание: ${bestCard?.toString()} (prob: ${(bestProb * 100).toFixed(1)}%)`);
+            this.stats.predictions += n;
+            this.batchStats.batches++;
+            this.batchStats.maxBatch = Math.max(this.batchStats.maxBatch, n);
 
-            return {
-                card: bestCard,
-                confidence: bestProb,
-                probabilities: probabilities
-            };
+            console.log(`[KozelML] Пакет из ${n}: ${results.map(r => r.card?.toString()).join(', ')}`);
+
+            return results;
 
         } catch (error) {
             console.error('[KozelML] Ошибка предсказания:', error);
-            return null;
+            return requests.map(() => null);
         }
     }
 
@@ -271,11 +329,48 @@ class KozelML {
             return true;
 
         } catch (error) {
+            // Модель, обученная офлайн (python -m kozel_engine.trainer), если её положили в расширение
+            if (await this.importModel(chrome.runtime.getURL('models/kozel-ml/model.json'))) {
+                return true;
+            }
             console.log('[KozelML] Модель не найдена, создаём новую');
             return this.createModel();
         }
     }
 
+    /**
+     * Импортировать модель в формате слоёв TF.js и сохранить её в IndexedDB
+     * @param {string} url - адрес model.json (веса - рядом с ним)
+     */
+    async importModel(url) {
+        if (!mlLoader.isTensorFlowAvailable()) {
+            return false;
+        }
+
+        try {
+            const model = await tf.loadLayersModel(url);
+            model.compile({
+                optimizer: tf.train.adam(this.learningRate),
+                loss: 'categoricalCrossentropy',
+                metrics: ['accuracy']
+            });
+
+            if (this.model) {
+                this.model.dispose();
+            }
+            this.model = model;
+            this.modelLoaded = true;
+            await this.model.save('indexeddb://kozel-ml-model');
+
+            console.log(`[KozelML] ✓ Модель импортирована: ${url}`);
+            return true;
+
+        } catch (error) {
+            console.log(`[KozelML] Модель не импортирована (${url}):`, error.message);
+            return false;
+        }
+    }
+
     /**
      * Сохранить статистику
      */
@@ -305,7 +400,28 @@ class KozelML {
      * Получить статистику
      */
     getStats() {
-        return { ...this.stats };
+        return { ...this.stats, memory: this.getMemoryInfo() };
+    }
+
+    /**
+     * Тензоры и память TensorFlow.js и счётчики пакетов
+     *
+     * Растущий numTensors между пакетами - утечка.
+     */
+    getMemoryInfo() {
+        if (typeof tf === 'undefined') {
+            return null;
+        }
+
+        const memory = tf.memory();
+        return {
+            backend: tf.getBackend(),
+            numTensors: memory.numTensors,
+            numDataBuffers: memory.numDataBuffers,
+            numBytes: memory.numBytes,
+            unreliable: Boolean(memory.unreliable),
+            ...this.batchStats
+        };
     }
 
     /**
@@ -1,13 +1,157 @@
 /**
  * Система сбора и анализа истории ходов
  * Записывает все ходы для обучения и адаптации
+ *
+ * Хранение - журнал в IndexedDB "KozelGames" (ai/kozel-db.js):
+ * - moves: каждый ход пишется один раз при recordMove (ключ seq растёт
+ *   по порядку ходов, индексы gameId и timestamp)
+ * - games: заголовок игры без ходов, пишется в endGame (индекс endTime)
+ * Стоимость записи не зависит от размера истории; старые игры и ходы
+ * брошенных игр удаляет фоновая компакция (compact).
+ *
+ * Аналитика (analyzeAIPerformance, findSuccessPatterns, getCardStatistics)
+ * читает готовые счётчики MoveAggregates по последним maxHistorySize ходам,
+ * а не перебирает ходы.
  */
 
+/**
+ * Счётчики по скользящему окну последних ходов
+ *
+ * Окно - кольцевой буфер кратких записей; ход, выпавший из окна,
+ * вычитается из счётчиков, поэтому добавление и запросы - O(1)
+ * независимо от длины истории.
+ */
+class MoveAggregates {
+    constructor(size) {
+        this.size = size;
+        this.window = new Array(size);
+        this.head = 0;  // Позиция следующей записи
+        this.length = 0;
+        // Рекомендация AI: следовал / не следовал (только ходы с рекомендацией)
+        this.followed = { total: 0, wins: 0 };
+        this.ignored = { total: 0, wins: 0 };
+        this.byCard = {};     // 'rank_suit' -> {total, wins, points}
+        this.firstLead = {};  // 'rank_suit' -> {wins, total} для первого хода во взятке
+    }
+
+    static cardKey(card) {
+        return `${card.rank}_${card.suit}`;
+    }
+
+    /**
+     * Добавить ход в окно (самый старый выпадает, если окно заполнено)
+     */
+    add(move) {
+        if (this.length === this.size) {
+            this._apply(this.window[this.head], -1);
+        } else {
+            this.length++;
+        }
+        const entry = {
+            card: MoveAggregates.cardKey(move.playedCard),
+            first: !!move.isFirstInTrick,
+            followed: move.aiRecommendation ? !!move.wasRecommended : null,
+            won: move.trickWon ? 1 : 0,
+            points: move.pointsGained || 0
+        };
+        this.window[this.head] = entry;
+        this.head = (this.head + 1) % this.size;
+        this._apply(entry, 1);
+    }
+
+    _apply(entry, sign) {
+        if (entry.followed !== null) {
+            const bucket = entry.followed ? this.followed : this.ignored;
+            bucket.total += sign;
+            bucket.wins += sign * entry.won;
+        }
+        MoveAggregates._count(this.byCard, entry.card, sign, entry.won, entry.points);
+        if (entry.first) {
+            MoveAggregates._count(this.firstLead, entry.card, sign, entry.won);
+        }
+    }
+
+    static _count(table, key, sign, won, points = null) {
+        let stats = table[key];
+        if (!stats) {
+            stats = table[key] = points === null ? { wins: 0, total: 0 } : { total: 0, wins: 0, points: 0 };
+        }
+        stats.total += sign;
+        stats.wins += sign * won;
+        if (points !== null) stats.points += sign * points;
+        if (stats.total === 0) {
+            delete table[key];
+        }
+    }
+}
+
 class MoveHistory {
-    constructor() {
+    constructor(db = new KozelDB()) {
+        this.db = db;
         this.currentGameMoves = [];
-        this.storageKey = 'kozel_move_history';
-        this.maxHistorySize = 500; // Последние 500 ходов
+        this.storageKey = 'kozel_move_history';  // Старая история в chrome.storage (для миграции)
+        this.maxHistorySize = 500; // Последние 500 ходов для анализа
+        this.retentionGames = 100;  // Сколько завершённых игр хранить (docs/ai-coding.md)
+        this.abandonedTtlMs = 7 * 24 * 60 * 60 * 1000;  // Ходы игр без endGame
+        this.compactionDelayMs = 10000;
+        this.readyPromise = null;
+        this.compactionTimer = null;
+        this.aggregates = new MoveAggregates(this.maxHistorySize);
+    }
+
+    /**
+     * Дождаться базы; при первом запуске перенести старую историю из
+     * chrome.storage, затем заполнить счётчики аналитики последними ходами
+     */
+    ready() {
+        if (!this.readyPromise) {
+            this.readyPromise = this._migrateFromStorage().catch(error => {
+                console.warn('[MoveHistory] Миграция истории не удалась:', error);
+            }).then(() => this._loadAggregates()).catch(error => {
+                console.warn('[MoveHistory] Не удалось прочитать историю для аналитики:', error);
+            });
+        }
+        return this.readyPromise;
+    }
+
+    /**
+     * Счётчики по последним maxHistorySize ходам журнала - один раз при старте
+     */
+    async _loadAggregates() {
+        for (const move of await this._readRecentMoves(this.maxHistorySize)) {
+            this.aggregates.add(move);
+        }
+    }
+
+    async _migrateFromStorage() {
+        const legacy = await new Promise((resolve) => {
+            chrome.storage.local.get([this.storageKey], (result) => resolve(result[this.storageKey]));
+        });
+        if (!legacy) return;
+
+        // Одна транзакция: либо переносится всё, либо ничего; игры, которые
+        // уже есть в базе (повторный запуск), пропускаются
+        const games = (legacy.games || []).slice().reverse();  // Старые первыми - seq по порядку
+        await this.db.transaction(['games', 'moves'], 'readwrite', tx => {
+            const gamesStore = tx.objectStore('games');
+            const movesStore = tx.objectStore('moves');
+            for (const game of games) {
+                const { moves = [], ...header } = game;
+                const existing = gamesStore.get(header.gameId);
+                existing.onsuccess = () => {
+                    if (existing.result) return;
+                    gamesStore.put({ ...header, moveCount: moves.length });
+                    for (const move of moves) {
+                        movesStore.add(move);
+                    }
+                };
+            }
+        });
+
+        await new Promise((resolve) => {
+            chrome.storage.local.remove([this.storageKey, 'kozel_current_game_moves'], resolve);
+        });
+        console.log(`[MoveHistory] ✓ История перенесена в IndexedDB: ${games.length} игр`);
     }
 
     /**
@@ -44,10 +188,10 @@ class MoveHistory {
 
         this.currentGameMoves.push(move);
 
-        // Сохраняем в storage периодически
-        if (this.currentGameMoves.length % 5 === 0) {
-            await this.saveToStorage();
-        }
+        // Один ход - одна запись в журнал
+        await this.ready();
+        await this.db.add('moves', move);
+        this.aggregates.add(move);
 
         return move;
     }
@@ -78,7 +222,7 @@ class MoveHistory {
             gameId: this.getCurrentGameId(),
             startTime: this.currentGameMoves[0]?.timestamp,
             endTime: Date.now(),
-            moves: this.currentGameMoves,
+            moveCount: this.currentGameMoves.length,  // Сами ходы уже в журнале
             result: result,  // 'win', 'loss', 'draw'
             finalScore: result.finalScore,
             partner: result.partner
@@ -86,115 +230,131 @@ class MoveHistory {
 
         await this.saveGame(gameData);
         this.startNewGame();
+        this.scheduleCompaction();
     }
 
     /**
-     * Сохранить игру в историю
+     * Сохранить заголовок игры (ходы пишет recordMove)
      */
     async saveGame(gameData) {
-        const history = await this.loadHistory();
-        history.games.unshift(gameData);
-
-        // Оставляем только последние 50 игр
-        if (history.games.length > 50) {
-            history.games = history.games.slice(0, 50);
-        }
+        await this.ready();
+        await this.db.put('games', gameData);
+    }
 
-        // Добавляем ходы в общую историю
-        history.allMoves.push(...gameData.moves);
+    /**
+     * Последние limit ходов журнала в порядке игры
+     */
+    async loadRecentMoves(limit = this.maxHistorySize) {
+        await this.ready();
+        return this._readRecentMoves(limit);
+    }
 
-        // Ограничиваем размер истории ходов
-        if (history.allMoves.length > this.maxHistorySize) {
-            history.allMoves = history.allMoves.slice(-this.maxHistorySize);
+    async _readRecentMoves(limit) {
+        const moves = [];
+        for await (const move of this.db.iterate('moves', { direction: 'prev', pageSize: limit })) {
+            moves.push(move);
+            if (moves.length >= limit) break;
         }
+        return moves.reverse();
+    }
 
-        await this.saveHistory(history);
+    /**
+     * Заголовки завершённых игр, новые первыми
+     */
+    async *iterateGames(limit = Infinity) {
+        await this.ready();
+        let count = 0;
+        for await (const game of this.db.iterate('games', { index: 'endTime', direction: 'prev', pageSize: 50 })) {
+            if (count++ >= limit) return;
+            yield game;
+        }
     }
 
     /**
-     * Загрузить историю из storage
+     * Ходы игры в порядке записи
      */
-    async loadHistory() {
-        return new Promise((resolve) => {
-            chrome.storage.local.get([this.storageKey], (result) => {
-                resolve(result[this.storageKey] || {
-                    games: [],
-                    allMoves: []
-                });
-            });
-        });
+    async *iterateGameMoves(gameId) {
+        yield* this.db.iterate('moves', { index: 'gameId', query: IDBKeyRange.only(gameId) });
     }
 
     /**
-     * Сохранить историю в storage
+     * Запланировать фоновую компакцию (после конца игры, не чаще раза в compactionDelayMs)
      */
-    async saveHistory(history) {
-        return new Promise((resolve) => {
-            chrome.storage.local.set({ [this.storageKey]: history }, resolve);
-        });
+    scheduleCompaction() {
+        if (this.compactionTimer) return;
+        this.compactionTimer = setTimeout(() => {
+            this.compactionTimer = null;
+            this.compact().catch(error => console.warn('[MoveHistory] Ошибка компакции:', error));
+        }, this.compactionDelayMs);
     }
 
     /**
-     * Сохранить текущие ходы
+     * Удалить игры сверх retentionGames (старые первыми) и ходы игр,
+     * которые не дошли до endGame за abandonedTtlMs
      */
-    async saveToStorage() {
-        // Временное сохранение текущих ходов
-        const tempKey = 'kozel_current_game_moves';
-        return new Promise((resolve) => {
-            chrome.storage.local.set({
-                [tempKey]: {
-                    gameId: this.currentGameId,
-                    moves: this.currentGameMoves
-                }
-            }, resolve);
-        });
+    async compact() {
+        await this.ready();
+        let removedGames = 0;
+        let removedMoves = 0;
+
+        const excess = await this.db.count('games') - this.retentionGames;
+        if (excess > 0) {
+            const expired = [];
+            for await (const game of this.db.iterate('games', { index: 'endTime', pageSize: Math.min(excess, 200) })) {
+                expired.push(game.gameId);
+                if (expired.length >= excess) break;
+            }
+            for (const gameId of expired) {
+                removedMoves += await this.db.deleteRange('moves', 'gameId', IDBKeyRange.only(gameId));
+                await this.db.transaction('games', 'readwrite', tx => tx.objectStore('games').delete(gameId));
+                removedGames++;
+            }
+        }
+
+        // Брошенные игры: старые ходы без заголовка
+        const abandoned = new Set();
+        const cutoff = IDBKeyRange.upperBound(Date.now() - this.abandonedTtlMs);
+        for await (const move of this.db.iterate('moves', { index: 'timestamp', query: cutoff })) {
+            if (move.gameId !== this.currentGameId && !abandoned.has(move.gameId) &&
+                !(await this.db.get('games', move.gameId))) {
+                abandoned.add(move.gameId);
+            }
+        }
+        for (const gameId of abandoned) {
+            removedMoves += await this.db.deleteRange('moves', 'gameId', IDBKeyRange.only(gameId));
+        }
+
+        if (removedGames || removedMoves) {
+            console.log(`[MoveHistory] Компакция: удалено игр ${removedGames}, ходов ${removedMoves}`);
+        }
+        return { removedGames, removedMoves };
     }
 
     /**
      * Анализ успешности рекомендаций AI
      */
     async analyzeAIPerformance() {
-        const history = await this.loadHistory();
-        const moves = history.allMoves;
+        await this.ready();
+        const { length, followed, ignored } = this.aggregates;
 
-        if (moves.length < 10) {
+        if (length < 10) {
             return {
                 confidence: 0,
                 message: 'Недостаточно данных'
             };
         }
 
-        let followedCount = 0;
-        let notFollowedCount = 0;
-        let followedWins = 0;
-        let notFollowedWins = 0;
-
-        for (const move of moves) {
-            if (move.aiRecommendation) {
-                const followed = move.wasRecommended;
-                const won = move.trickWon;
-
-                if (followed) {
-                    followedCount++;
-                    if (won) followedWins++;
-                } else {
-                    notFollowedCount++;
-                    if (won) notFollowedWins++;
-                }
-            }
-        }
-
-        const followedWinRate = followedCount > 0 ? (followedWins / followedCount) : 0;
-        const notFollowedWinRate = notFollowedCount > 0 ? (notFollowedWins / notFollowedCount) : 0;
+        const followedWinRate = followed.total > 0 ? (followed.wins / followed.total) : 0;
+        const notFollowedWinRate = ignored.total > 0 ? (ignored.wins / ignored.total) : 0;
 
         return {
-            totalMoves: moves.length,
-            followedAI: followedCount,
-            ignoredAI: notFollowedCount,
+            totalMoves: length,
+            followedAI: followed.total,
+            ignoredAI: ignored.total,
             followedWinRate: (followedWinRate * 100).toFixed(1),
             ignoredWinRate: (notFollowedWinRate * 100).toFixed(1),
             aiIsBetter: followedWinRate > notFollowedWinRate,
-            confidence: Math.min(followedCount / 50, 1.0)
+            confidence: Math.min(followed.total / 50, 1.0)
         };
     }
 
@@ -202,109 +362,95 @@ class MoveHistory {
      * Найти паттерны успешных ходов
      */
     async findSuccessPatterns() {
-        const history = await this.loadHistory();
-        const moves = history.allMoves;
+        await this.ready();
+        if (this.aggregates.length < 20) return null;
 
-        if (moves.length < 20) return null;
+        // Копия: счётчики живые, их меняет следующий recordMove
+        const bestFirstMoves = {};  // Лучшие карты для первого хода
+        for (const [cardKey, stats] of Object.entries(this.aggregates.firstLead)) {
+            bestFirstMoves[cardKey] = { ...stats };
+        }
 
-        const patterns = {
-            bestFirstMoves: {},      // Лучшие карты для первого хода
+        return {
+            bestFirstMoves,
             bestResponseCards: {},   // Лучшие карты для ответа
             aggressiveSuccess: 0,    // Успех агрессивной игры
             defensiveSuccess: 0      // Успех защитной игры
         };
-
-        for (const move of moves) {
-            const cardKey = `${move.playedCard.rank}_${move.playedCard.suit}`;
-
-            if (move.isFirstInTrick) {
-                if (!patterns.bestFirstMoves[cardKey]) {
-                    patterns.bestFirstMoves[cardKey] = { wins: 0, total: 0 };
-                }
-                patterns.bestFirstMoves[cardKey].total++;
-                if (move.trickWon) {
-                    patterns.bestFirstMoves[cardKey].wins++;
-                }
-            }
-        }
-
-        return patterns;
     }
 
     /**
      * Получить статистику по конкретной карте
      */
     async getCardStatistics(rank, suit) {
-        const history = await this.loadHistory();
-        const moves = history.allMoves.filter(m =>
-            m.playedCard.rank === rank && m.playedCard.suit === suit
-        );
-
-        if (moves.length === 0) return null;
+        await this.ready();
+        const stats = this.aggregates.byCard[MoveAggregates.cardKey({ rank, suit })];
 
-        const wins = moves.filter(m => m.trickWon).length;
-        const avgPoints = moves.reduce((sum, m) => sum + (m.pointsGained || 0), 0) / moves.length;
+        if (!stats) return null;
 
         return {
-            timesPlayed: moves.length,
-            winRate: (wins / moves.length * 100).toFixed(1),
-            avgPoints: avgPoints.toFixed(1)
+            timesPlayed: stats.total,
+            winRate: (stats.wins / stats.total * 100).toFixed(1),
+            avgPoints: (stats.points / stats.total).toFixed(1)
         };
     }
 
     /**
-     * ML: Подготовить обучающие данные из истории
+     * Награда за ход для обучения ML
      */
-    async prepareMLTrainingData() {
-        const history = await this.loadHistory();
-
-        if (!history.games || history.games.length === 0) {
-            return [];
+    _moveReward(move, gameReward) {
+        let reward = 0.5;  // Базовая награда
+
+        // Бонусы/штрафы
+        if (move.trickWon) {
+            reward += 0.2;  // Взяли взятку
+            if (move.pointsGained > 0) {
+                reward += Math.min(0.3, move.pointsGained / 30);  // Очки
+            }
         }
 
-        const trainingData = [];
-
-        // Используем только завершённые игры
-        for (const game of history.games) {
-            if (!game.moves || game.moves.length === 0) continue;
+        // Учитываем результат игры
+        return reward * 0.7 + gameReward * 0.3;
+    }
 
+    /**
+     * ML: Обучающие примеры потоком - курсором по играм (новые первыми) и
+     * их ходам, без загрузки всей истории в память
+     * @param {number} maxGames - сколько последних игр взять
+     */
+    async *iterateTrainingExamples(maxGames = Infinity) {
+        for await (const game of this.iterateGames(maxGames)) {
             // Определяем награду за игру
             const gameReward = game.result === 'win' ? 1.0 : 0.0;
 
             // Каждый ход - это обучающий пример
-            for (let i = 0; i < game.moves.length; i++) {
-                const move = game.moves[i];
-
-                // Рассчитываем награду для хода
-                let reward = 0.5;  // Базовая награда
-
-                // Бонусы/штрафы
-                if (move.trickWon) {
-                    reward += 0.2;  // Взяли взятку
-                    if (move.pointsGained > 0) {
-                        reward += Math.min(0.3, move.pointsGained / 30);  // Очки
-                    }
-                }
-
-                // Учитываем результат игры
-                reward = reward * 0.7 + gameReward * 0.3;
-
-                // Следовал ли игрок рекомендации AI
-                const followedAI = move.wasRecommended;
-
-                trainingData.push({
+            let moveIndex = 0;
+            for await (const move of this.iterateGameMoves(game.gameId)) {
+                yield {
                     gameId: game.gameId,
-                    moveIndex: i,
+                    moveIndex: moveIndex++,
                     state: move,  // Состояние до хода
                     action: move.playedCard,
-                    reward: reward,
-                    followedAI: followedAI,
+                    reward: this._moveReward(move, gameReward),
+                    followedAI: move.wasRecommended,  // Следовал ли игрок рекомендации AI
                     gameResult: game.result
-                });
+                };
             }
         }
+    }
+
+    /**
+     * ML: Подготовить обучающие данные из истории
+     */
+    async prepareMLTrainingData() {
+        const trainingData = [];
+        const games = new Set();
+        for await (const example of this.iterateTrainingExamples()) {
+            trainingData.push(example);
+            games.add(example.gameId);
+        }
 
-        console.log(`[MoveHistory ML] Подготовлено ${trainingData.length} обучающих примеров из ${history.games.length} игр`);
+        console.log(`[MoveHistory ML] Подготовлено ${trainingData.length} обучающих примеров из ${games.size} игр`);
 
         return trainingData;
     }
@@ -313,17 +459,20 @@ class MoveHistory {
      * ML: Экспортировать данные для анализа
      */
     async exportMLData() {
-        const history = await this.loadHistory();
+        const games = [];
+        for await (const game of this.iterateGames()) {
+            games.push(game);
+        }
         const trainingData = await this.prepareMLTrainingData();
 
         return {
             metadata: {
-                totalGames: history.games?.length || 0,
-                totalMoves: history.allMoves?.length || 0,
+                totalGames: games.length,
+                totalMoves: await this.db.count('moves'),
                 trainingExamples: trainingData.length,
                 exportDate: new Date().toISOString()
             },
-            games: history.games || [],
+            games: games,  // Заголовки; ходы - в trainingData[].state
             trainingData: trainingData
         };
     }
@@ -332,43 +481,14 @@ class MoveHistory {
      * ML: Получить последние N игр для обучения
      */
     async getRecentGamesForTraining(count = 10) {
-        const history = await this.loadHistory();
-
-        if (!history.games || history.games.length === 0) {
-            return [];
-        }
-
-        // Берём последние N игр
-        const recentGames = history.games.slice(0, count);
-
-        // Подготавливаем обучающие данные
         const trainingData = [];
-
-        for (const game of recentGames) {
-            if (!game.moves || game.moves.length === 0) continue;
-
-            const gameReward = game.result === 'win' ? 1.0 : 0.0;
-
-            for (const move of game.moves) {
-                let reward = 0.5;
-
-                if (move.trickWon) {
-                    reward += 0.2;
-                    if (move.pointsGained > 0) {
-                        reward += Math.min(0.3, move.pointsGained / 30);
-                    }
-                }
-
-                reward = reward * 0.7 + gameReward * 0.3;
-
-                trainingData.push({
-                    state: move,
-                    action: move.playedCard,
-                    reward: reward
-                });
-            }
+        for await (const example of this.iterateTrainingExamples(count)) {
+            trainingData.push({
+                state: example.state,
+                action: example.action,
+                reward: example.reward
+            });
         }
-
         return trainingData;
     }
 }
@@ -376,4 +496,5 @@ class MoveHistory {
 // Экспорт
 if (typeof module !== 'undefined' && module.exports) {
     module.exports = MoveHistory;
+    module.exports.MoveAggregates = MoveAggregates;
 }
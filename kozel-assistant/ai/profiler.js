@@ -1,46 +1,150 @@
 /**
  * Система профилирования игроков
  * Анализирует стиль игры и адаптирует стратегию
+ *
+ * Профили хранятся по одному в IndexedDB "KozelGames" (хранилище profiles,
+ * индекс lastUpdate). В памяти - LRU горячих профилей (игроки за столом):
+ * loadPlayers подгружает их перед анализом, recordMove меняет профиль в
+ * памяти, а изменённые профили пишутся пачкой одной транзакцией с
+ * задержкой saveDelayMs.
  */
 
 class PlayerProfiler {
-    constructor() {
-        this.profiles = {}; // {playerName: profile}
-        this.storageKey = 'kozel_player_profiles';
+    constructor(db = new KozelDB()) {
+        this.db = db;
+        this.cache = new Map();  // playerName -> profile, порядок - LRU
+        this.cacheSize = 32;
+        this.dirty = new Map();  // Изменённые, но ещё не записанные профили
+        this.saveDelayMs = 2000;
+        this.saveTimer = null;
+        this.storageKey = 'kozel_player_profiles';  // Старые профили в chrome.storage (для миграции)
+        this.maxAgeMs = 30 * 24 * 60 * 60 * 1000;
     }
 
     /**
-     * Получить профили из storage
+     * Подготовить хранилище: при первом запуске перенести профили из
+     * chrome.storage, затем в фоне удалить устаревшие
      */
     async loadProfiles() {
-        return new Promise((resolve) => {
-            chrome.storage.local.get([this.storageKey], (result) => {
-                this.profiles = result[this.storageKey] || {};
-                resolve(this.profiles);
-            });
+        try {
+            await this._migrateFromStorage();
+        } catch (error) {
+            console.warn('[PlayerProfiler] Миграция профилей не удалась:', error);
+        }
+        this.cleanOldProfiles().catch(error => {
+            console.warn('[PlayerProfiler] Ошибка очистки профилей:', error);
+        });
+    }
+
+    async _migrateFromStorage() {
+        const legacy = await new Promise((resolve) => {
+            chrome.storage.local.get([this.storageKey], (result) => resolve(result[this.storageKey]));
         });
+        if (!legacy) return;
+
+        const profiles = Object.values(legacy);
+        await this.db.transaction('profiles', 'readwrite', tx => {
+            const store = tx.objectStore('profiles');
+            for (const profile of profiles) {
+                store.put(profile);
+            }
+        });
+        await new Promise((resolve) => {
+            chrome.storage.local.remove([this.storageKey], resolve);
+        });
+        console.log(`[PlayerProfiler] ✓ Профили перенесены в IndexedDB: ${profiles.length}`);
     }
 
     /**
-     * Сохранить профили в storage
+     * Подгрузить профили игроков (например, сидящих за столом) в память
      */
-    async saveProfiles() {
-        return new Promise((resolve) => {
-            chrome.storage.local.set({ [this.storageKey]: this.profiles }, resolve);
-        });
+    async loadPlayers(playerNames) {
+        await Promise.all(playerNames.filter(Boolean).map(name => this.loadProfile(name)));
     }
 
     /**
-     * Получить или создать профиль игрока
+     * Профиль игрока из памяти или базы (новый, если игрока ещё нет)
      */
-    getProfile(playerName) {
+    async loadProfile(playerName) {
         if (!playerName) return null;
 
-        if (!this.profiles[playerName]) {
-            this.profiles[playerName] = this.createEmptyProfile(playerName);
+        let profile = this._touch(playerName);
+        if (!profile) {
+            profile = await this.db.get('profiles', playerName);
+            // Пока ждали базу, профиль мог загрузить параллельный вызов;
+            // несохранённая копия (вытесненная из LRU) новее копии в базе
+            profile = this._touch(playerName) ||
+                this._remember(this.dirty.get(playerName) || profile || this.createEmptyProfile(playerName));
+        }
+        return profile;
+    }
+
+    _touch(playerName) {
+        const profile = this.cache.get(playerName);
+        if (profile) {
+            this.cache.delete(playerName);
+            this.cache.set(playerName, profile);
+        }
+        return profile;
+    }
+
+    _remember(profile) {
+        this.cache.set(profile.name, profile);
+        if (this.cache.size > this.cacheSize) {
+            // Вытесняем самый давний; несохранённые изменения остаются в dirty
+            this.cache.delete(this.cache.keys().next().value);
+        }
+        return profile;
+    }
+
+    /**
+     * Сохранить изменённые профили (одной транзакцией)
+     */
+    async saveProfiles() {
+        if (this.saveTimer) {
+            clearTimeout(this.saveTimer);
+            this.saveTimer = null;
+        }
+        if (this.dirty.size === 0) return;
+
+        const profiles = [...this.dirty.values()];
+        this.dirty.clear();
+        try {
+            await this.db.transaction('profiles', 'readwrite', tx => {
+                const store = tx.objectStore('profiles');
+                for (const profile of profiles) {
+                    store.put(profile);
+                }
+            });
+        } catch (error) {
+            // Вернуть в очередь, если их не изменили заново
+            for (const profile of profiles) {
+                if (!this.dirty.has(profile.name)) this.dirty.set(profile.name, profile);
+            }
+            throw error;
         }
+    }
+
+    _scheduleSave() {
+        if (this.saveTimer) return;
+        this.saveTimer = setTimeout(() => {
+            this.saveTimer = null;
+            this.saveProfiles().catch(error => {
+                console.warn('[PlayerProfiler] Ошибка сохранения профилей:', error);
+            });
+        }, this.saveDelayMs);
+    }
+
+    /**
+     * Получить профиль игрока из памяти
+     *
+     * Синхронный: профиль, не подгруженный loadPlayers/loadProfile,
+     * возвращается пустым (и не кэшируется, чтобы не затереть данные базы)
+     */
+    getProfile(playerName) {
+        if (!playerName) return null;
 
-        return this.profiles[playerName];
+        return this.cache.get(playerName) || this.createEmptyProfile(playerName);
     }
 
     /**
@@ -85,7 +189,7 @@ class PlayerProfiler {
      * Записать ход игрока
      */
     async recordMove(playerName, moveData) {
-        const profile = this.getProfile(playerName);
+        const profile = await this.loadProfile(playerName);
         if (!profile) return;
 
         profile.moves.totalMoves++;
@@ -132,7 +236,8 @@ class PlayerProfiler {
 
         profile.lastUpdated = new Date().toISOString();
 
-        await this.saveProfiles();
+        this.dirty.set(playerName, profile);
+        this._scheduleSave();
     }
 
     /**
@@ -257,20 +362,20 @@ class PlayerProfiler {
     }
 
     /**
-     * Очистить старые профили (старше 30 дней)
+     * Очистить старые профили (старше 30 дней) - удаление диапазона индекса lastUpdate
      */
     async cleanOldProfiles() {
-        const now = Date.now();
-        const thirtyDaysAgo = now - (30 * 24 * 60 * 60 * 1000);
+        await this.saveProfiles();
 
-        for (const [name, profile] of Object.entries(this.profiles)) {
-            const lastUpdate = new Date(profile.lastUpdated).getTime();
-            if (lastUpdate < thirtyDaysAgo) {
-                delete this.profiles[name];
+        const cutoff = new Date(Date.now() - this.maxAgeMs).toISOString();
+        for (const [name, profile] of this.cache) {
+            if (profile.lastUpdated < cutoff) {
+                this.cache.delete(name);
             }
         }
 
-        await this.saveProfiles();
+        // ISO-строки lastUpdated сравниваются в порядке времени
+        return this.db.deleteRange('profiles', 'lastUpdate', IDBKeyRange.upperBound(cutoff, true));
     }
 }
 
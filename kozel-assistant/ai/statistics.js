@@ -1,22 +1,49 @@
 /**
  * Система статистики игр
+ *
+ * Все показатели - накопительные счётчики, которые recordGame обновляет
+ * в конце игры: суммы и количества, текущая серия и окно последних
+ * recentSize игр (кольцевой буфер с суммами). Чтение (getWinRate,
+ * getAverageScore, getCurrentStreak, getRecentStats) не перебирает историю.
  */
 
 class GameStatistics {
     constructor() {
         this.storageKey = 'kozel_assistant_stats';
+        this.version = 2;  // Версия формата stats (1 - без серии и окна)
+        this.recentSize = 100;
     }
 
     /**
      * Получить статистику из storage
      */
     async getStats() {
-        return new Promise((resolve) => {
+        const stats = await new Promise((resolve) => {
             chrome.storage.local.get([this.storageKey], (result) => {
-                const stats = result[this.storageKey] || this.createEmptyStats();
-                resolve(stats);
+                resolve(result[this.storageKey] || this.createEmptyStats());
             });
         });
+
+        if (stats.version !== this.version) {
+            this.migrateStats(stats);
+            await this.saveStats(stats);
+        }
+        return stats;
+    }
+
+    /**
+     * Перевести статистику версии 1 на текущую: серия и окно
+     * восстанавливаются из gamesHistory (один раз)
+     */
+    migrateStats(stats) {
+        stats.streak = { type: null, count: 0 };
+        stats.recent = this.createWindow();
+        for (const game of (stats.gamesHistory || []).slice().reverse()) {
+            this.updateStreak(stats.streak, game.result);
+            this.addToWindow(stats.recent, game);
+        }
+        stats.version = this.version;
+        return stats;
     }
 
     /**
@@ -44,10 +71,63 @@ class GameStatistics {
             gamesHistory: [],  // Последние 50 игр
             lastPlayed: null,
             bestWin: null,  // Лучшая победа (максимальная разница в очках)
-            worstLoss: null  // Худшее поражение
+            worstLoss: null,  // Худшее поражение
+            version: this.version,
+            streak: { type: null, count: 0 },  // Текущая серия
+            recent: this.createWindow()  // Последние recentSize игр
+        };
+    }
+
+    /**
+     * Пустое окно последних игр: кольцевой буфер и суммы по нему
+     */
+    createWindow() {
+        return {
+            size: this.recentSize,
+            games: [],  // {result, myScore, opponentScore}
+            head: 0,    // Место следующей записи, когда буфер заполнен
+            wins: 0,
+            losses: 0,
+            draws: 0,
+            myPoints: 0,
+            opponentPoints: 0
         };
     }
 
+    /**
+     * Добавить игру в окно; самая старая выпадает и вычитается из сумм
+     */
+    addToWindow(recent, game) {
+        const entry = { result: game.result, myScore: game.myScore, opponentScore: game.opponentScore };
+        if (recent.games.length < recent.size) {
+            recent.games.push(entry);
+        } else {
+            this.countInWindow(recent, recent.games[recent.head], -1);
+            recent.games[recent.head] = entry;
+            recent.head = (recent.head + 1) % recent.size;
+        }
+        this.countInWindow(recent, entry, 1);
+    }
+
+    countInWindow(recent, entry, sign) {
+        const field = entry.result === 'win' ? 'wins' : entry.result === 'loss' ? 'losses' : 'draws';
+        recent[field] += sign;
+        recent.myPoints += sign * entry.myScore;
+        recent.opponentPoints += sign * entry.opponentScore;
+    }
+
+    /**
+     * Продлить серию или начать новую
+     */
+    updateStreak(streak, result) {
+        if (streak.type === result) {
+            streak.count++;
+        } else {
+            streak.type = result;
+            streak.count = 1;
+        }
+    }
+
     /**
      * Записать результат игры
      */
@@ -85,7 +165,7 @@ class GameStatistics {
         }
 
         // Добавить в историю (последние 50 игр)
-        stats.gamesHistory.unshift({
+        const game = {
             date: stats.lastPlayed,
             myGames: gameData.myGames,
             opponentGames: gameData.opponentGames,
@@ -94,7 +174,10 @@ class GameStatistics {
             partner: gameData.partner,
             result: gameData.myGames > gameData.opponentGames ? 'win' :
                     gameData.myGames < gameData.opponentGames ? 'loss' : 'draw'
-        });
+        };
+        stats.gamesHistory.unshift(game);
+        this.updateStreak(stats.streak, game.result);
+        this.addToWindow(stats.recent, game);
 
         // Оставляем только последние 50 игр
         if (stats.gamesHistory.length > 50) {
@@ -128,22 +211,31 @@ class GameStatistics {
      * Получить серию побед/поражений
      */
     getCurrentStreak(stats) {
-        if (stats.gamesHistory.length === 0) return { type: null, count: 0 };
-
-        let streak = 0;
-        const firstResult = stats.gamesHistory[0].result;
+        return {
+            type: stats.streak.type,
+            count: stats.streak.count
+        };
+    }
 
-        for (const game of stats.gamesHistory) {
-            if (game.result === firstResult) {
-                streak++;
-            } else {
-                break;
-            }
+    /**
+     * Показатели по последним recentSize играм
+     */
+    getRecentStats(stats) {
+        const { games, wins, losses, draws, myPoints, opponentPoints } = stats.recent;
+        const count = games.length;
+        if (count === 0) {
+            return { games: 0, wins: 0, losses: 0, draws: 0, winRate: 0, averageScore: { my: 0, opponent: 0 } };
         }
-
         return {
-            type: firstResult,
-            count: streak
+            games: count,
+            wins,
+            losses,
+            draws,
+            winRate: ((wins / count) * 100).toFixed(1),
+            averageScore: {
+                my: Math.round(myPoints / count),
+                opponent: Math.round(opponentPoints / count)
+            }
         };
     }
 
@@ -79,7 +79,8 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     }
 
     // V2.0 Phase 3: ML запросы → перенаправляем в offscreen document
-    else if (request.action === 'mlPredict' || request.action === 'mlTrain' || request.action === 'mlStatus') {
+    else if (request.action === 'mlPredictBatch' ||
+             request.action === 'mlTrain' || request.action === 'mlStatus') {
         forwardToOffscreen(request)
             .then(result => sendResponse(result))
             .catch(error => sendResponse({ error: error.message }));
@@ -12,6 +12,13 @@ class KozelAssistant {
         this.stats = null;
         this.lastGameScore = null; // Для отслеживания конца игры
 
+        // Push-режим: состояние из inject.js приходит диффами полей
+        this.angularState = null;   // Кэш сырого состояния Angular
+        this.stateSeq = 0;          // seq последнего применённого диффа
+        this.pushMode = false;
+        this.resyncing = false;
+        this.stateQueue = Promise.resolve();
+
         // V2.0: Профилирование и история
         this.profiler = null;
         this.moveHistory = null;
@@ -22,6 +29,8 @@ class KozelAssistant {
         this.mlEnabled = false;
         this.mlInitialized = false;
         this.mlStats = null;
+        this.mlPending = [];          // Запросы предсказаний для следующего пакета
+        this.mlBatchInFlight = false;
 
         console.log('[Козёл Помощник] Инициализация...');
         this.init();
@@ -128,27 +137,51 @@ class KozelAssistant {
 
     /**
      * V2.0 Phase 3: ML предсказание через background
+     *
+     * Запросы собираются в пакет: пока пакет в пути, новые состояния ждут
+     * и уходят следующим одним сообщением mlPredictBatch (в offscreen -
+     * один вызов модели на пакет).
      */
-    async getMLPrediction(gameState, legalCards) {
+    getMLPrediction(gameState, legalCards) {
         // Используем ML только если модель обучена
         if (!this.mlEnabled || !this.mlInitialized) {
-            return null;
+            return Promise.resolve(null);
         }
 
+        return new Promise((resolve) => {
+            this.mlPending.push({ gameState, legalCards, resolve });
+            if (!this.mlBatchInFlight) {
+                this.sendMLBatch();
+            }
+        });
+    }
+
+    /**
+     * Отправить накопленные запросы одним mlPredictBatch
+     */
+    async sendMLBatch() {
+        const batch = this.mlPending;
+        this.mlPending = [];
+        this.mlBatchInFlight = true;
+
+        let predictions = [];
         try {
             const response = await chrome.runtime.sendMessage({
-                action: 'mlPredict',
-                data: { gameState, legalCards }
+                action: 'mlPredictBatch',
+                data: { requests: batch.map(({ gameState, legalCards }) => ({ gameState, legalCards })) }
             });
 
-            if (response && response.success && response.prediction) {
-                return response.prediction;
+            if (response && response.success && response.predictions) {
+                predictions = response.predictions;
             }
-
-            return null;
         } catch (error) {
             console.error('[Козёл Помощник ML] Ошибка ML предсказания:', error);
-            return null;
+        }
+        batch.forEach((request, i) => request.resolve(predictions[i] || null));
+
+        this.mlBatchInFlight = false;
+        if (this.mlPending.length > 0) {
+            this.sendMLBatch();
         }
     }
 
@@ -312,36 +345,113 @@ class KozelAssistant {
 
     /**
      * Запустить мониторинг игры
+     *
+     * Основной режим - push: inject.js сам присылает изменившиеся поля
+     * (GAME_STATE_DIFF), и состояние пересчитывается только при изменениях.
+     * Если подписка не ответила, опрашиваем страницу раз в секунду.
      */
     startMonitoring() {
+        window.addEventListener('message', (event) => {
+            if (event.source !== window || event.data.type !== 'GAME_STATE_DIFF') return;
+            this.pushMode = true;
+            // Обработка асинхронная - диффы применяются строго по очереди
+            this.stateQueue = this.stateQueue
+                .then(() => this.applyStateDiff(event.data))
+                .catch(error => console.error('[Козёл Помощник] Ошибка диффа:', error));
+        });
+        window.postMessage({ type: 'SUBSCRIBE_GAME_STATE' }, '*');
+
+        setTimeout(() => {
+            if (!this.pushMode) {
+                console.warn('[Козёл Помощник] Push-режим недоступен, опрос раз в секунду');
+                this.startPolling();
+            }
+        }, 3000);
+    }
+
+    /**
+     * Запасной режим: полный снимок состояния раз в секунду
+     */
+    startPolling() {
         setInterval(async () => {
             if (!this.enabled) return;
+            const angularState = await this.getGameStateFromAngular();
+            await this.handleAngularState(angularState, null);
+        }, 1000);
+    }
+
+    /**
+     * Применить дифф из inject.js к кэшу состояния
+     *
+     * Дифф без full применяется только поверх предыдущего (seq + 1); при
+     * пропуске просим полный снимок и ждём его.
+     */
+    async applyStateDiff(message) {
+        const complete = message.full || message.state === null;
+        if (!complete && (this.resyncing || message.seq !== this.stateSeq + 1)) {
+            if (!this.resyncing) {
+                console.warn(`[Козёл Помощник] Пропущен дифф (${this.stateSeq} -> ${message.seq}), запрашиваем снимок`);
+                this.resyncing = true;
+                window.postMessage({ type: 'RESYNC_GAME_STATE' }, '*');
+            }
+            return;
+        }
+        this.stateSeq = message.seq;
+        if (complete) {
+            this.resyncing = false;
+        }
 
-            const previousState = this.gameState;
-            await this.parseGameState();
+        if (message.state === null) {
+            this.angularState = null;
+        } else {
+            this.angularState = Object.assign(
+                message.full ? {} : Object.assign({}, this.angularState), message.changed
+            );
+        }
 
-            // V2.0: Детекция ходов и запись в историю
-            await this.detectAndRecordMoves(previousState);
+        if (!this.enabled) return;
+        await this.handleAngularState(
+            this.angularState, message.full || !message.changed ? null : Object.keys(message.changed)
+        );
+    }
 
-            this.updateRecommendations();
-        }, 1000);
+    /**
+     * Обработать новое состояние страницы: разбор, запись ходов, рекомендация
+     *
+     * @param {Object|null} angularState - сырое состояние из inject.js
+     * @param {string[]|null} changedFields - изменившиеся поля (null - все)
+     */
+    async handleAngularState(angularState, changedFields) {
+        const previousState = this.gameState;
+        await this.parseGameState(angularState, changedFields);
+
+        // V2.0: Детекция ходов и запись в историю
+        await this.detectAndRecordMoves(previousState);
+
+        this.updateRecommendations();
     }
 
     /**
      * Парсинг состояния игры
+     *
+     * Карты, которые не менялись (нет в changedFields), берутся из
+     * прошлого gameState без повторного разбора.
      */
-    async parseGameState() {
+    async parseGameState(angularState, changedFields = null) {
         try {
-            const angularState = await this.getGameStateFromAngular();
-
             if (!angularState) {
                 this.gameState = null;
                 return;
             }
 
+            const previous = changedFields ? this.gameState : null;
+            const reuse = (field) => previous && !changedFields.includes(field);
+
             // Парсим карты
-            const myCards = this.parseCards(angularState.myCards);
-            const tableCards = this.parseTableCards(angularState.tableCards);
+            const myCards = reuse('myCards') ? previous.myCards : this.parseCards(angularState.myCards);
+            const tableCards = reuse('tableCards')
+                ? previous.tableCards
+                : this.parseTableCards(angularState.tableCards);
 
             this.gameState = {
                 myCards: myCards,
@@ -415,7 +525,8 @@ class KozelAssistant {
 
         const { players, partner } = this.gameState;
 
-        // Получаем профили всех игроков
+        // Получаем профили всех игроков (подгружаем из базы при смене стола)
+        await this.profiler.loadPlayers(Object.values(players));
         this.playerProfiles = this.profiler.getGameSummary(players);
 
         // Добавляем профили в gameState для AI
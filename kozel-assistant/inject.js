@@ -6,6 +6,17 @@
 (function() {
     console.log('[Inject] Внедрение в контекст страницы...');
 
+    // Поля состояния, которые push-режим сравнивает и присылает по отдельности
+    const STATE_FIELDS = [
+        'myCards', 'tableCards', 'topCards', 'leftCards', 'rightCards',
+        'players', 'partner', 'scoreWindow', 'teams', 'myTurn'
+    ];
+    // Сверка по мутациям - не чаще раза в DIFF_INTERVAL_MS
+    const DIFF_INTERVAL_MS = 150;
+    // Поиск стола (лобби, новая партия) и страховочная сверка scope
+    // на случай изменений без изменений DOM
+    const HEARTBEAT_MS = 2000;
+
     window.__kozelGetGameState = function() {
         const gameTable = document.querySelector('game-table');
         if (!gameTable) return null;
@@ -84,6 +95,94 @@
         }
     };
 
+    /**
+     * Push-режим: следим за DOM стола и присылаем только изменившиеся поля
+     *
+     * Сообщение GAME_STATE_DIFF: {seq, full, changed: {поле: значение}} или
+     * {seq, state: null}, если стола нет. seq растёт на 1 с каждым
+     * сообщением; full - полный снимок (после подписки или RESYNC_GAME_STATE).
+     */
+    const push = {
+        seq: 0,
+        fields: null,       // JSON полей последнего отправленного снимка
+        observer: null,
+        table: null,        // Элемент game-table, за которым следит observer
+        timer: null,
+        heartbeat: null
+    };
+
+    function emitDiff(full) {
+        clearTimeout(push.timer);
+        push.timer = null;
+        const state = window.__kozelGetGameState();
+
+        if (!state) {
+            if (push.fields !== null || full) {
+                push.fields = null;
+                window.postMessage({ type: 'GAME_STATE_DIFF', seq: ++push.seq, state: null }, '*');
+            }
+            return;
+        }
+
+        const previous = full ? null : push.fields;
+        const fields = {};
+        const changed = {};
+        let count = 0;
+        for (const name of STATE_FIELDS) {
+            // JSON заодно убирает из значений функции Angular
+            const json = JSON.stringify(state[name]);
+            fields[name] = json;
+            if (!previous || previous[name] !== json) {
+                changed[name] = json === undefined ? undefined : JSON.parse(json);
+                count++;
+            }
+        }
+        push.fields = fields;
+        if (count > 0) {
+            window.postMessage({
+                type: 'GAME_STATE_DIFF', seq: ++push.seq, full: !previous, changed
+            }, '*');
+        }
+    }
+
+    // Мутации (анимация карт, перерисовка счёта) копятся до таймера:
+    // одна сверка на DIFF_INTERVAL_MS, сколько бы их ни было
+    function scheduleDiff() {
+        if (push.timer !== null) return;
+        push.timer = setTimeout(() => emitDiff(false), DIFF_INTERVAL_MS);
+    }
+
+    // Следим только за элементом стола; из атрибутов - только allow-click
+    // (какими картами можно ходить). Стол пропал или сменился - переключаемся
+    function attach() {
+        const table = document.querySelector('game-table');
+        if (table === push.table) return;
+        push.observer.disconnect();
+        push.table = table;
+        if (table) {
+            push.observer.observe(table, {
+                childList: true,
+                subtree: true,
+                characterData: true,
+                attributeFilter: ['allow-click']
+            });
+        }
+    }
+
+    function heartbeat() {
+        attach();
+        emitDiff(false);
+    }
+
+    function subscribe() {
+        if (!push.observer) {
+            push.observer = new MutationObserver(scheduleDiff);
+            push.heartbeat = setInterval(heartbeat, HEARTBEAT_MS);
+        }
+        attach();
+        emitDiff(true);
+    }
+
     // Обработчик сообщений для content script
     window.addEventListener('message', function(event) {
         if (event.data.type === 'GET_GAME_STATE') {
@@ -91,6 +190,9 @@
             // Глубокое клонирование через JSON для удаления всех функций
             const cleanState = JSON.parse(JSON.stringify(state));
             window.postMessage({ type: 'GAME_STATE_RESPONSE', state: cleanState }, '*');
+        } else if (event.data.type === 'SUBSCRIBE_GAME_STATE' ||
+                   event.data.type === 'RESYNC_GAME_STATE') {
+            subscribe();
         }
     });
 
@@ -105,9 +105,10 @@ async function initializeML() {
 }
 
 /**
- * Обработка предсказания
+ * Обработка пакета предсказаний: одно сообщение и один вызов модели
+ * на все состояния data.requests = [{gameState, legalCards}]
  */
-async function handlePredict(data) {
+async function handlePredictBatch(data) {
     try {
         await initializeML();
 
@@ -115,15 +116,12 @@ async function handlePredict(data) {
             return { error: 'ML модель не обучена' };
         }
 
-        const { gameState, legalCards } = data;
+        const predictions = await mlModel.predictBatch(data.requests || []);
 
-        // Получаем предсказание
-        const prediction = await mlModel.predict(gameState, legalCards);
-
-        return { success: true, prediction };
+        return { success: true, predictions };
 
     } catch (error) {
-        console.error('[ML Offscreen] ✗ Ошибка предсказания:', error);
+        console.error('[ML Offscreen] ✗ Ошибка пакетного предсказания:', error);
         return { error: error.message };
     }
 }
@@ -198,8 +196,8 @@ async function handleStatus() {
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     console.log('[ML Offscreen] Получено сообщение:', request.action);
 
-    if (request.action === 'mlPredict') {
-        handlePredict(request.data)
+    if (request.action === 'mlPredictBatch') {
+        handlePredictBatch(request.data)
             .then(result => sendResponse(result))
             .catch(error => sendResponse({ error: error.message }));
         return true; // Асинхронный ответ
@@ -95,17 +95,9 @@ function renderGameState(gameState, enabled, stats, playerProfiles, mlEnabled =
         const avgMyScore = Math.round(stats.totalPoints / stats.totalGames);
         const avgOppScore = Math.round(stats.totalOpponentPoints / stats.totalGames);
 
-        // Текущая серия
-        let streak = { type: null, count: 0 };
-        if (stats.gamesHistory && stats.gamesHistory.length > 0) {
-            const firstResult = stats.gamesHistory[0].result;
-            let count = 0;
-            for (const game of stats.gamesHistory) {
-                if (game.result === firstResult) count++;
-                else break;
-            }
-            streak = { type: firstResult, count };
-        }
+        // Текущая серия и последние игры - готовые счётчики GameStatistics
+        const streak = stats.streak || { type: null, count: 0 };
+        const recent = stats.recent;
 
         html += `
             <div class="status" style="background: rgba(0, 0, 0, 0.4); margin-top: 15px;">
@@ -128,6 +120,17 @@ function renderGameState(gameState, enabled, stats, playerProfiles, mlEnabled =
                 </div>
         `;
 
+        // Окно последних игр - когда игр больше, чем в окне
+        if (recent && recent.games.length > 0 && stats.totalGames > recent.games.length) {
+            const recentWinRate = ((recent.wins / recent.games.length) * 100).toFixed(1);
+            html += `
+                <div class="status-item">
+                    <span class="status-label">Последние ${recent.games.length}:</span>
+                    <span class="status-value">${recentWinRate}%</span>
+                </div>
+            `;
+        }
+
         // Серия
         if (streak.count > 1) {
             const streakEmoji = streak.type === 'win' ? '🔥' : '❄️';
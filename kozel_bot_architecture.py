@@ -3,6 +3,14 @@
 Полный гайд по созданию бота для https://kozel-online.com/
 """
 
+import time
+
+from kozel_engine import cards as engine_cards
+from kozel_engine import tricks as engine_tricks
+# Модель карты и состояния живёт в движке (симулятор и сервер берут её
+# оттуда без импорта этого файла); здесь - реэкспорт для старого кода
+from kozel_engine.model import Card, GameState
+
 # ============================================================================
 # ЭТАП 1: РАЗВЕДКА - ЧТО НУЖНО СДЕЛАТЬ НА СВОЕЙ МАШИНЕ
 # ============================================================================
@@ -151,22 +159,6 @@ class KozelBot:
         return driver
 
 
-class GameState:
-    """
-    Модель игрового состояния
-    """
-    def __init__(self):
-        self.my_cards = []          # Мои карты
-        self.table_cards = []       # Карты на столе (текущая взятка)
-        self.my_team_score = 0      # Счёт моей команды
-        self.opponent_score = 0     # Счёт соперника
-        self.current_player = None  # Чей ход
-        self.kon_number = 1         # Номер кона
-        self.last_kon_opener = None # Кто открывал прошлый кон
-        self.tricks_taken = 0       # Взяток взято в коне
-        self.points_in_kon = 0      # Очков набрано в текущем коне
-
-
 class VisionModule:
     """
     МОДУЛЬ РАСПОЗНАВАНИЯ - адаптируй под реальную структуру!
@@ -272,8 +264,38 @@ class KozelAI:
     МОЗГ БОТА - логика принятия решений
     """
     
-    def __init__(self):
+    def __init__(self, rules=None, evaluator=None, metrics=None):
+        """
+        Args:
+            rules: переопределение порогов из _load_rules, например
+                   {'need_90_from': 65} (для сравнения конфигураций)
+            evaluator: поиск вместо эвристик - объект с
+                       choose_card(game_state, legal_cards), например
+                       kozel_engine.pimc.PIMCEvaluator
+            metrics: kozel_engine.metrics.DecisionMetrics - замеры
+                     стратегий и фаз choose_card (см. set_metrics)
+        """
+        self.evaluator = evaluator
+        # Чем решён последний ход: имя стратегии, 'forced' или 'evaluator'
+        self.last_strategy = None
+        self.metrics = None
+        self.set_metrics(metrics)
         self.rules = self._load_rules()
+        if rules:
+            unknown = set(rules) - set(self.rules)
+            if unknown:
+                raise ValueError(f"Неизвестные параметры стратегии: {sorted(unknown)}")
+            self.rules.update(rules)
+    
+    def _load_rules(self):
+        """
+        Пороги стратегий (очки нашей команды в коне)
+        """
+        return {
+            'need_90_from': 70,      # С этих очков пробуем взять >90
+            'protect_60_from': 55,   # С этих очков защищаем >60
+            'strong_hand_trumps': 3, # Сильная рука - столько козырей и больше
+        }
         
     def choose_card(self, game_state):
         """
@@ -290,20 +312,75 @@ class KozelAI:
         legal_cards = self._get_legal_cards(game_state)
         
         if len(legal_cards) == 1:
+            self.last_strategy = 'forced'
             return legal_cards[0]
         
+        if self.evaluator is not None:
+            self.last_strategy = 'evaluator'
+            return self.evaluator.choose_card(game_state, legal_cards)
+        
         # 2. Оцениваем ситуацию
         situation = self._analyze_situation(game_state)
         
         # 3. Выбираем стратегию
+        self.last_strategy, strategy = self._pick_strategy(situation)
+        return strategy(game_state, legal_cards)
+    
+    def _pick_strategy(self, situation):
+        """
+        Стратегия по флагам _analyze_situation: (имя, метод)
+        """
         if situation['need_90']:
-            return self._strategy_go_for_90(game_state, legal_cards)
+            return 'go_for_90', self._strategy_go_for_90
         elif situation['protect_60']:
-            return self._strategy_protect_60(game_state, legal_cards)
+            return 'protect_60', self._strategy_protect_60
         elif situation['trap_queen']:
-            return self._strategy_trap_queen(game_state, legal_cards)
+            return 'trap_queen', self._strategy_trap_queen
         else:
-            return self._strategy_default(game_state, legal_cards)
+            return 'default', self._strategy_default
+    
+    def set_metrics(self, metrics):
+        """
+        Включить (DecisionMetrics) или выключить (None) замеры choose_card
+        
+        Включённые замеры подменяют choose_card экземпляра на
+        _choose_card_measured; выключенные возвращают метод класса, так
+        что без замеров решение не тратит на них ни одной проверки.
+        """
+        self.metrics = metrics
+        if metrics is None:
+            self.__dict__.pop('choose_card', None)
+        else:
+            self.choose_card = self._choose_card_measured
+    
+    def _choose_card_measured(self, game_state):
+        """
+        choose_card с замером фаз в self.metrics
+        """
+        clock = time.perf_counter_ns
+        start = clock()
+        legal_cards = self._get_legal_cards(game_state)
+        legal = clock()
+        
+        if len(legal_cards) == 1:
+            self.last_strategy = 'forced'
+            self.metrics.record('forced', legal - start)
+            return legal_cards[0]
+        
+        if self.evaluator is not None:
+            self.last_strategy = 'evaluator'
+            card = self.evaluator.choose_card(game_state, legal_cards)
+            end = clock()
+            self.metrics.record('evaluator', legal - start, None, end - legal, end - start)
+            return card
+        
+        situation = self._analyze_situation(game_state)
+        analyzed = clock()
+        self.last_strategy, strategy = self._pick_strategy(situation)
+        card = strategy(game_state, legal_cards)
+        end = clock()
+        self.metrics.record(self.last_strategy, legal - start, analyzed - legal, end - analyzed, end - start)
+        return card
     
     def _get_legal_cards(self, game_state):
         """
@@ -313,6 +390,8 @@ class KozelAI:
         - Если есть простая масть захода - ОБЯЗАТЕЛЬНО подкинуть
         - Валеты, дамы, трефы НЕ считаются простой
         - Нет простой - любая карта
+        
+        Считается на битовых масках kozel_engine.cards
         """
         my_cards = game_state.my_cards
         table_cards = game_state.table_cards
@@ -321,24 +400,13 @@ class KozelAI:
         if not table_cards:
             return self._filter_first_move_restrictions(my_cards, game_state)
         
-        # Определяем масть захода
-        lead_card = table_cards[0][1]
-        lead_suit = self._get_simple_suit(lead_card)
-        
-        if lead_suit is None:  # Зашли козырем
-            # Можно любую карту
+        # Масть захода определяет первая карта на столе;
+        # зашли козырем - маска пустая, можно любую карту
+        follow = engine_cards.FOLLOW_MASK[table_cards[0][1].index]
+        if not follow:
             return my_cards
-        
-        # Есть ли у нас простая карта этой масти?
-        simple_cards_of_suit = [
-            card for card in my_cards
-            if self._get_simple_suit(card) == lead_suit
-        ]
-        
-        if simple_cards_of_suit:
-            return simple_cards_of_suit
-        else:
-            return my_cards  # Нет простой - любая
+        # Нет простой масти захода - любая
+        return [card for card in my_cards if follow >> card.index & 1] or my_cards
     
     def _filter_first_move_restrictions(self, cards, game_state):
         """
@@ -346,34 +414,71 @@ class KozelAI:
         
         - В 1-м кону: НЕЛЬЗЯ козырять вообще
         - В остальных: команда открывавшая прошлый кон не может козырять
-        """
-        if game_state.kon_number == 1:
-            # Запрет на козыри
-            return [c for c in cards if not self._is_trump(c)]
-        
-        # Проверка ограничения для команды
-        if game_state.my_team_opened_last_kon and game_state.tricks_taken == 0:
-            # Это наш первый ход в коне - нельзя козырять
-            return [c for c in cards if not self._is_trump(c)]
-        
-        return cards
+        - Если на руке только козыри - ходить придётся козырем
+        """
+        no_trump_lead = (
+            game_state.kon_number == 1
+            # Это первый заход нашей команды в коне - нельзя козырять
+            or (game_state.my_team_opened_last_kon and not game_state.my_team_led_in_kon)
+        )
+        if not no_trump_lead:
+            return cards
+        trumps = engine_cards.TRUMP_MASK
+        return [card for card in cards if not trumps >> card.index & 1] or cards
     
     def _is_trump(self, card):
         """Проверка козырности"""
         # Все валеты, дамы и все трефы - козыри
-        if card.rank in ['J', 'Q']:
-            return True
-        if card.suit == 'clubs':
-            return True
-        return False
+        return bool(engine_cards.TRUMP_MASK >> card.index & 1)
     
     def _get_simple_suit(self, card):
         """
         Получить простую масть (или None если козырь)
         """
-        if self._is_trump(card):
+        suit = engine_cards.CARD_SIMPLE_SUIT[card.index]
+        if suit == engine_cards.NO_CARD:
             return None
-        return card.suit
+        return engine_cards.SUITS[suit]
+    
+    def _current_trick_winner(self, game_state):
+        """
+        Кто сейчас забирает взятку на столе
+        
+        Returns:
+            (позиция игрока, карта) или (None, None) для пустого стола
+        """
+        table_cards = game_state.table_cards
+        if not table_cards:
+            return None, None
+        offset, _ = engine_tricks.trick_winner([card.index for _, card in table_cards])
+        return table_cards[offset]
+    
+    def _is_partner_winning_trick(self, game_state):
+        """Партнёр (top) сейчас забирает взятку"""
+        player, _ = self._current_trick_winner(game_state)
+        return player == 'top'
+    
+    def _is_opponent_winning_trick(self, game_state):
+        """Соперник (left/right) сейчас забирает взятку"""
+        player, _ = self._current_trick_winner(game_state)
+        return player in ('left', 'right')
+    
+    def _are_we_winning(self, game_state):
+        """
+        Можем ли мы забрать взятку
+        
+        Стол пуст (наш заход) или на руке есть карта,
+        которая бьёт текущую старшую
+        """
+        table_cards = game_state.table_cards
+        if not table_cards:
+            return True
+        _, winner = self._current_trick_winner(game_state)
+        lead = table_cards[0][1].index
+        return any(
+            engine_tricks.beats(card.index, winner.index, lead)
+            for card in self._get_legal_cards(game_state)
+        )
     
     def _analyze_situation(self, game_state):
         """
@@ -382,10 +487,12 @@ class KozelAI:
         Возвращает словарь с флагами стратегии
         """
         points_collected = game_state.points_in_kon
+        need_90_from = self.rules['need_90_from']
+        protect_60_from = self.rules['protect_60_from']
         
         return {
-            'need_90': points_collected >= 70 and self._has_strong_hand(game_state),
-            'protect_60': points_collected >= 55 and points_collected < 70,
+            'need_90': points_collected >= need_90_from and self._has_strong_hand(game_state),
+            'protect_60': points_collected >= protect_60_from and points_collected < need_90_from,
             'trap_queen': self._has_seven_clubs(game_state) and self._queen_clubs_not_played(game_state),
             'partner_has_lead': self._is_partner_winning_trick(game_state)
         }
@@ -468,6 +575,122 @@ class KozelAI:
         # Соперник берёт - минимизируем урон
         return self._get_cheapest_card(legal_cards)
 
+    # ------------------------------------------------------------------------
+    # Оценка карт и ситуации
+    # ------------------------------------------------------------------------
+    
+    def _card_power(self, card):
+        """
+        Сила карты: любой козырь старше любой простой,
+        простые сравниваются по старшинству внутри своей масти
+        """
+        index = card.index
+        return engine_tricks.STRENGTH[engine_tricks.LEAD_CONTEXT[index] * 32 + index]
+    
+    def _get_strongest_card(self, cards):
+        """Самая сильная карта"""
+        return max(cards, key=self._card_power)
+    
+    def _get_weakest_card(self, cards):
+        """Самая слабая карта (при равной силе - с меньшими очками)"""
+        return min(cards, key=lambda c: (self._card_power(c), c.get_points()))
+    
+    def _get_cheapest_card(self, cards):
+        """Карта с наименьшими очками (при равенстве - самая слабая)"""
+        return min(cards, key=lambda c: (c.get_points(), self._card_power(c)))
+    
+    def _get_reasonable_card(self, cards):
+        """Средняя по силе карта"""
+        ordered = sorted(cards, key=self._card_power, reverse=True)
+        return ordered[len(ordered) // 2]
+    
+    def _winning_cards(self, game_state, legal_cards):
+        """Легальные карты, которые бьют текущую старшую на столе"""
+        table_cards = game_state.table_cards
+        if not table_cards:
+            return list(legal_cards)
+        _, winner = self._current_trick_winner(game_state)
+        lead = table_cards[0][1].index
+        return [
+            card for card in legal_cards
+            if engine_tricks.beats(card.index, winner.index, lead)
+        ]
+    
+    def _get_card_to_win_trick(self, game_state, legal_cards):
+        """Перебить наверняка - самой сильной бьющей картой, иначе сбросить дешёвую"""
+        winning = self._winning_cards(game_state, legal_cards)
+        if winning:
+            return self._get_strongest_card(winning)
+        return self._get_cheapest_card(legal_cards)
+    
+    def _get_minimum_card_to_win(self, game_state, legal_cards):
+        """Взять экономно - самой слабой бьющей картой, иначе сбросить дешёвую"""
+        if not game_state.table_cards:
+            return self._get_reasonable_card(legal_cards)
+        winning = self._winning_cards(game_state, legal_cards)
+        if winning:
+            return self._get_weakest_card(winning)
+        return self._get_cheapest_card(legal_cards)
+    
+    def _support_partner(self, game_state, legal_cards):
+        """Партнёр берёт - кладём простую карту с максимумом очков, козыри бережём"""
+        simple = [c for c in legal_cards if not self._is_trump(c)]
+        if simple:
+            return max(simple, key=lambda c: (c.get_points(), -self._card_power(c)))
+        return self._get_weakest_card(legal_cards)
+    
+    def _has_strong_hand(self, game_state):
+        """Сильная рука - достаточно козырей для борьбы за >90"""
+        trumps = engine_cards.hand_mask(game_state.my_cards) & engine_cards.TRUMP_MASK
+        return engine_cards.count(trumps) >= self.rules['strong_hand_trumps']
+    
+    def _has_seven_clubs(self, game_state):
+        """У нас 7 треф"""
+        return any(c.index == engine_cards.SEVEN_CLUBS for c in game_state.my_cards)
+    
+    def _queen_clubs_not_played(self, game_state):
+        """Дама треф ещё у соперников или партнёра (не у нас и не вышла в прошлых взятках)"""
+        tracker = game_state.tracker
+        if tracker is not None:
+            return not (tracker.hand | tracker.closed) >> engine_cards.QUEEN_CLUBS & 1
+        seen = game_state.my_cards + game_state.played_cards
+        return all(c.index != engine_cards.QUEEN_CLUBS for c in seen)
+    
+    def _is_queen_clubs_on_table_from_opponent(self, game_state):
+        """Дама треф на столе и её положил соперник"""
+        return any(
+            card.index == engine_cards.QUEEN_CLUBS and player in ('left', 'right')
+            for player, card in game_state.table_cards
+        )
+    
+    def _get_provocative_card(self, game_state, legal_cards):
+        """
+        Провокация дамы треф
+        
+        Заходим младшей картой самой длинной простой масти:
+        у соперников она быстрее кончится, и им придётся подкладывать козыри.
+        С учётом карт (game_state.tracker) сначала масти, в которых
+        соперник уже показал пустоту. 7 треф бережём до поимки.
+        """
+        candidates = [c for c in legal_cards if c.index != engine_cards.SEVEN_CLUBS] or legal_cards
+        hand = engine_cards.hand_mask(game_state.my_cards)
+        simple = [c for c in candidates if not self._is_trump(c)]
+        if not simple:
+            return self._get_weakest_card(candidates)
+        
+        def suit_length(card):
+            suit = engine_cards.CARD_SIMPLE_SUIT[card.index]
+            return engine_cards.count(hand & engine_cards.SIMPLE_SUIT_MASK[suit])
+        
+        tracker = game_state.tracker
+        
+        def opponent_void(card):
+            if tracker is None:
+                return False
+            return tracker.has_void(1, card.index) or tracker.has_void(3, card.index)
+        
+        return min(simple, key=lambda c: (-opponent_void(c), -suit_length(c), self._card_power(c)))
+
 
 class ActionModule:
     """
@@ -514,61 +737,48 @@ class ActionModule:
         time.sleep(random.uniform(0.2, 0.5))
 
 
-class Card:
-    """Модель карты"""
-    
-    def __init__(self, rank, suit):
-        self.rank = rank  # '7', '8', '9', '10', 'J', 'Q', 'K', 'A'
-        self.suit = suit  # 'clubs', 'spades', 'hearts', 'diamonds'
-        
-    def get_points(self):
-        """Очки карты"""
-        points = {
-            '7': 0, '8': 0, '9': 0,
-            'J': 2, 'Q': 3, 'K': 4,
-            '10': 10, 'A': 11
-        }
-        return points[self.rank]
-    
-    def is_trump(self):
-        """Козырь ли?"""
-        return self.rank in ['J', 'Q'] or self.suit == 'clubs'
-    
-    def get_trump_order(self):
-        """
-        Порядок козыря (для сравнения силы)
-        Чем больше - тем старше
-        """
-        if not self.is_trump():
-            return -1
-        
-        order = {
-            ('7', 'clubs'): 0,
-            ('Q', 'clubs'): 1,
-            ('Q', 'spades'): 2,
-            ('Q', 'hearts'): 3,
-            ('Q', 'diamonds'): 4,
-            ('J', 'clubs'): 5,
-            ('J', 'spades'): 6,
-            ('J', 'hearts'): 7,
-            ('J', 'diamonds'): 8,
-            ('A', 'clubs'): 9,
-            ('10', 'clubs'): 10,
-            ('K', 'clubs'): 11,
-            ('9', 'clubs'): 12,
-            ('8', 'clubs'): 13,
-        }
-        
-        return order.get((self.rank, self.suit), -1)
-    
-    def __repr__(self):
-        return f"{self.rank}{self.suit[0].upper()}"
-
-
 # ============================================================================
 # ПРИМЕР ИСПОЛЬЗОВАНИЯ
 # ============================================================================
 
+def update_game_state(game_state, vision):
+    """
+    Догнать состояние снимком страницы - на каждом опросе, а не только в
+    наш ход, чтобы карты, сыгранные после нашей, не пропускались
+
+    Новая раздача узнаётся по карте на руке, которой не было: тогда кон
+    закрывается end_kon. С нуля состояние собирается только в начале
+    партии и если снимок стола не сходится с историей.
+
+    Returns:
+        (game_state, собрано ли с нуля)
+    """
+    table_cards = vision.parse_table_state()
+    try:
+        if game_state is None:
+            raise ValueError("Нет состояния")
+        hand = vision.parse_my_cards()
+        known = {card.index for card in game_state.my_cards}
+        if any(card.index not in known for card in hand):
+            # Последняя взятка прошлого кона закрывается, если видна целиком
+            if len(game_state.table_cards) == 4:
+                game_state.close_trick()
+            scores = vision.get_scores()
+            game_state.end_kon(scores['my'], scores['opponent'], hand)
+        game_state.observe_table(table_cards)
+        return game_state, False
+    except ValueError:
+        rebuilt = GameState()
+        rebuilt.my_cards = vision.parse_my_cards()
+        rebuilt.table_cards = table_cards
+        scores = vision.get_scores()
+        rebuilt.my_team_score = scores['my']
+        rebuilt.opponent_score = scores['opponent']
+        if game_state is not None:
+            rebuilt.kon_number = game_state.kon_number
+        return rebuilt, True
+
+
 def main_loop():
     """
     Главный цикл бота
@@ -584,15 +794,11 @@ def main_loop():
     # Логинимся, ждём старта игры и т.д.
     # ...
     
+    game_state = None
     while True:
-        # 1. Парсим состояние
-        game_state = GameState()
-        game_state.my_cards = vision.parse_my_cards()
-        game_state.table_cards = vision.parse_table_state()
-        scores = vision.get_scores()
-        game_state.my_team_score = scores['my']
-        game_state.opponent_score = scores['opponent']
-        
+        # 1. Обновляем состояние событиями на каждом опросе
+        game_state, _ = update_game_state(game_state, vision)
+
         # 2. Проверяем, наш ли ход
         if not vision.is_my_turn():
             time.sleep(1)
@@ -603,6 +809,7 @@ def main_loop():
         
         # 4. Играем карту
         action.play_card(card_to_play)
+        game_state.play_card('bottom', card_to_play)
         
         # 5. Ждём следующий ход
         time.sleep(2)
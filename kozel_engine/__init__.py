@@ -0,0 +1,32 @@
+"""
+ДВИЖОК КОЗЛА - быстрое ядро для офлайн-анализа
+
+Карты - номера битов 0..31, рука - целое число-маска.
+Подробности в kozel_engine/README.md
+"""
+
+from .cards import (
+    RANKS,
+    SUITS,
+    NUM_CARDS,
+    FULL_DECK,
+    NO_CARD,
+    TRUMP_MASK,
+    SIMPLE_MASK,
+    SUIT_MASK,
+    SIMPLE_SUIT_MASK,
+    FOLLOW_MASK,
+    CARD_POINTS,
+    POINT_MASK,
+    SEVEN_CLUBS,
+    QUEEN_CLUBS,
+    ACE_DIAMONDS,
+    card_index,
+    card_name,
+    hand_mask,
+    iter_cards,
+    mask_to_list,
+    count,
+    mask_points,
+    legal_moves,
+)
@@ -0,0 +1,401 @@
+"""
+Двоичный архив партий с индексом для произвольного доступа
+
+Партия - заголовок GAME и коны; кон - заголовок KON фиксированного
+размера (номер, открывающий, очки, исход, маски четырёх рук), байты
+взяток (заходящий и число известных карт) и поток 5-битных кодов карт
+всех взяток подряд. Полный кон самоигры - 54 байта против ~720 байт
+даже в компактном JSON (game_to_dict, карты именами) - в 13 раз меньше.
+
+Места - относительно записавшего игрока: 0 - он сам (bottom), дальше по
+часовой, как в симуляторе. У записанных партий известна только своя
+рука и часть карт взятки - взятка хранит заходящего и столько карт,
+сколько известно подряд от захода; неизвестные руки - 0, неизвестные
+очки и исход - UNKNOWN.
+
+Рядом с архивом лежит индекс <архив>.idx - смещения начала партий
+(uint64), поэтому партия i читается через mmap без просмотра файла:
+
+    with ArchiveWriter('games.kzga') as writer:
+        writer.add(play_game(policies, rng))
+    archive = Archive('games.kzga')
+    game = archive[123456]
+
+Конвертеры: play_game (самоигра симулятора), games_from_move_history
+(MoveHistory.exportMLData расширения), games_from_kon_records (записи
+wslog.py), game_to_dict/game_from_dict (JSON).
+
+    python -m kozel_engine.archive self-play games.kzga --games 10000
+    python -m kozel_engine.archive convert export.json games.kzga
+    python -m kozel_engine.archive show games.kzga 42
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from .cards import card_name, iter_cards
+from .model import parse_card
+from .simulator import POSITIONS, KozelSimulator, RandomPolicy, game_rng
+
+MAGIC = b'KZGA'
+INDEX_MAGIC = b'KZGI'
+VERSION = 1
+UNKNOWN = 255
+EGGS = 2                 # исход кона "яйца" в поле winner
+
+FILE_HEADER = struct.Struct('<4sH2x')
+INDEX_HEADER = struct.Struct('<4sH2xQ')       # magic, версия, число партий
+OFFSET = struct.Struct('<Q')
+# Число конов, победитель, открытые очки команд, источник
+GAME_HEADER = struct.Struct('<HBBBB')
+# Номер кона, открывающий, взяток, карт, очки команд, победитель, поймавшая
+# команда, штраф, маски рук четырёх мест
+KON_HEADER = struct.Struct('<BBBBBBBBBx4I')
+
+SELF_PLAY, RECORDED = 0, 1
+
+# tricks - ArchiveTrick; winner - команда, EGGS или UNKNOWN;
+# caught - команда, поймавшая даму, или None
+ArchiveKon = namedtuple(
+    'ArchiveKon', 'kon_number opener hands tricks points winner caught penalty'
+)
+# leader - место первой карты, cards - номера карт подряд от него
+ArchiveTrick = namedtuple('ArchiveTrick', 'leader cards')
+# winner - команда или UNKNOWN, score - открытые очки команд
+ArchiveGame = namedtuple('ArchiveGame', 'kons winner score source')
+
+
+# ============================================================================
+# КОДИРОВАНИЕ
+# ============================================================================
+
+def pack_cards(cards):
+    """Номера карт -> 5 бит на карту, младшие биты первыми"""
+    value = 0
+    for i, card in enumerate(cards):
+        value |= card << 5 * i
+    return value.to_bytes((5 * len(cards) + 7) // 8, 'little')
+
+
+def unpack_cards(data, n):
+    """Обратное к pack_cards: n номеров карт"""
+    value = int.from_bytes(data, 'little')
+    return [value >> 5 * i & 31 for i in range(n)]
+
+
+def encode_game(game):
+    """Байты партии (без смещения в индексе)"""
+    parts = [GAME_HEADER.pack(len(game.kons), game.winner,
+                              game.score[0], game.score[1], game.source)]
+    for kon in game.kons:
+        cards = [card for trick in kon.tricks for card in trick.cards]
+        parts.append(KON_HEADER.pack(
+            kon.kon_number, kon.opener, len(kon.tricks), len(cards),
+            kon.points[0], kon.points[1], kon.winner,
+            UNKNOWN if kon.caught is None else kon.caught, kon.penalty,
+            *kon.hands
+        ))
+        parts.append(bytes(trick.leader << 3 | len(trick.cards) for trick in kon.tricks))
+        parts.append(pack_cards(cards))
+    return b''.join(parts)
+
+
+def decode_game(data, pos=0):
+    """Партия из байтов data, начиная с pos"""
+    n_kons, winner, score0, score1, source = GAME_HEADER.unpack_from(data, pos)
+    pos += GAME_HEADER.size
+    kons = []
+    for _ in range(n_kons):
+        (number, opener, n_tricks, n_cards, points0, points1, kon_winner,
+         caught, penalty, *hands) = KON_HEADER.unpack_from(data, pos)
+        pos += KON_HEADER.size
+        sizes = data[pos:pos + n_tricks]
+        pos += n_tricks
+        length = (5 * n_cards + 7) // 8
+        cards = unpack_cards(data[pos:pos + length], n_cards)
+        pos += length
+        tricks = []
+        start = 0
+        for byte in sizes:
+            count = byte & 7
+            tricks.append(ArchiveTrick(byte >> 3, tuple(cards[start:start + count])))
+            start += count
+        kons.append(ArchiveKon(
+            number, opener, tuple(hands), tuple(tricks), (points0, points1),
+            kon_winner, None if caught == UNKNOWN else caught, penalty
+        ))
+    return ArchiveGame(tuple(kons), winner, (score0, score1), source)
+
+
+# ============================================================================
+# ЗАПИСЬ И ЧТЕНИЕ
+# ============================================================================
+
+class ArchiveWriter:
+    """Дописывает партии в архив и смещения в индекс"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._data = open(path, 'wb')
+        self._index = open(path + '.idx', 'wb')
+        self._data.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self._index.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, 0))
+
+    def add(self, game):
+        self._index.write(OFFSET.pack(self._data.tell()))
+        self._data.write(encode_game(game))
+        self.count += 1
+
+    def close(self):
+        # Последнее смещение - конец файла: длина партии i = off[i+1] - off[i]
+        self._index.write(OFFSET.pack(self._data.tell()))
+        self._index.seek(0)
+        self._index.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, self.count))
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Archive:
+    """Архив партий, открытый через mmap; archive[i] - партия i"""
+
+    def __init__(self, path):
+        self.path = path
+        self._files = [open(path, 'rb'), open(path + '.idx', 'rb')]
+        self._data, self._index = (
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in self._files
+        )
+        magic, version = FILE_HEADER.unpack_from(self._data, 0)
+        index_magic, index_version, self.count = INDEX_HEADER.unpack_from(self._index, 0)
+        if (magic, version, index_magic, index_version) != (MAGIC, VERSION, INDEX_MAGIC, VERSION):
+            self.close()
+            raise ValueError(f"{path}: не архив партий версии {VERSION}")
+
+    def close(self):
+        for handle in (self._data, self._index, *self._files):
+            handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, i):
+        return OFFSET.unpack_from(self._index, INDEX_HEADER.size + i * OFFSET.size)[0]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(f"Нет партии {i}, в архиве {self.count}")
+        return decode_game(self._data[self.offset(i):self.offset(i + 1)])
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+def write_archive(path, games):
+    """Записать партии в архив; число партий"""
+    with ArchiveWriter(path) as writer:
+        for game in games:
+            writer.add(game)
+    return writer.count
+
+
+# ============================================================================
+# КОНВЕРТЕРЫ
+# ============================================================================
+
+def play_game(policies, rng=None):
+    """Сыграть партию в симуляторе и записать её целиком (руки всех мест)"""
+    sim = KozelSimulator(policies, rng=rng)
+    kons = []
+    while not sim.game_over:
+        hands = tuple(sim.hands)
+        opener = sim.opener
+        tricks = []
+        result = None
+        while result is None:
+            if not sim.trick:
+                leader = sim.leader
+            card = sim.choose()
+            trick = sim.trick + [card]
+            result = sim.step(card)
+            if not sim.trick or result is not None:
+                tricks.append(ArchiveTrick(leader, tuple(trick)))
+        kons.append(ArchiveKon(
+            result.kon_number, opener, hands, tuple(tricks), result.points,
+            EGGS if result.winner is None else result.winner, result.caught,
+            result.penalty
+        ))
+    return ArchiveGame(tuple(kons), sim.winner, tuple(sim.score), SELF_PLAY)
+
+
+def games_from_move_history(export):
+    """
+    Партии из MoveHistory.exportMLData (или {games: [...]})
+
+    Ход хранит стол до нашего хода и нашу карту - взятка записывается от
+    заходящего до нашей карты. Новый кон - рука из 8 карт. Очки и исход
+    конов неизвестны; исход партии - из result ('win' / 'loss').
+    """
+    for game in export.get('games', []):
+        kons = []
+        hand = None
+        tricks = []
+        for move in game.get('moves', []):
+            try:
+                mine = [parse_card(c) for c in move.get('myCards', [])]
+                table = [parse_card(c) for c in move.get('tableCards', [])]
+                played = parse_card(move['playedCard'])
+            except (ValueError, KeyError, TypeError):
+                continue
+            mask = sum(1 << card.index for card in mine)
+            if len(mine) == 8 and mask != hand:
+                if tricks:
+                    kons.append(_recorded_kon(len(kons) + 1, hand, tricks))
+                hand = mask
+                tricks = []
+            if hand is None:
+                continue            # история начата посреди кона
+            tricks.append(ArchiveTrick(
+                -len(table) % 4, tuple(card.index for card in table) + (played.index,)
+            ))
+        if tricks:
+            kons.append(_recorded_kon(len(kons) + 1, hand, tricks))
+
+        result = game.get('result')
+        if isinstance(result, dict):
+            result = result.get('result')
+        winner = {'win': 0, 'loss': 1}.get(result, UNKNOWN)
+        score = game.get('finalScore')
+        if not (isinstance(score, list) and len(score) == 2):
+            score = (UNKNOWN, UNKNOWN)
+        yield ArchiveGame(tuple(kons), winner, tuple(score), RECORDED)
+
+
+def _recorded_kon(number, hand, tricks):
+    # Известна только своя рука; очки и исход кона - неизвестны
+    return ArchiveKon(number, UNKNOWN, (hand, 0, 0, 0), tuple(tricks),
+                      (UNKNOWN, UNKNOWN), UNKNOWN, None, 0)
+
+
+def games_from_kon_records(records):
+    """
+    Партии из записей конов wslog.py (кон 1 или новый дамп - новая партия)
+    """
+    kons = []
+    source = object()
+
+    def finish():
+        return ArchiveGame(tuple(kons), UNKNOWN, (UNKNOWN, UNKNOWN), RECORDED)
+
+    for record in records:
+        if kons and (record['kon'] == 1 or record['source'] != source):
+            yield finish()
+            kons = []
+        source = record['source']
+        hand = sum(1 << parse_card(name).index for name in record['hand'])
+        tricks = tuple(
+            ArchiveTrick(POSITIONS.index(trick['leader']),
+                         tuple(parse_card(name).index for name in trick['cards']))
+            for trick in record['tricks']
+        )
+        caught = record.get('caught')
+        points = record['points']
+        kons.append(ArchiveKon(
+            record['kon'], tricks[0].leader if tricks else UNKNOWN, (hand, 0, 0, 0),
+            tricks, (points['us'], points['them']), UNKNOWN,
+            None if caught is None else ('us', 'them').index(caught), 0
+        ))
+    if kons:
+        yield finish()
+
+
+def game_to_dict(game):
+    """Партия в JSON-совместимый dict (карты - имена вида 'QC')"""
+    return {
+        'winner': game.winner, 'score': list(game.score), 'source': game.source,
+        'kons': [{
+            'kon': kon.kon_number, 'opener': kon.opener,
+            'hands': [[card_name(c) for c in iter_cards(hand)] for hand in kon.hands],
+            'tricks': [{'leader': t.leader, 'cards': [card_name(c) for c in t.cards]}
+                       for t in kon.tricks],
+            'points': list(kon.points), 'winner': kon.winner,
+            'caught': kon.caught, 'penalty': kon.penalty,
+        } for kon in game.kons],
+    }
+
+
+def game_from_dict(data):
+    """Обратное к game_to_dict"""
+    return ArchiveGame(
+        tuple(ArchiveKon(
+            kon['kon'], kon['opener'],
+            tuple(sum(1 << parse_card(name).index for name in hand) for hand in kon['hands']),
+            tuple(ArchiveTrick(t['leader'], tuple(parse_card(n).index for n in t['cards']))
+                  for t in kon['tricks']),
+            tuple(kon['points']), kon['winner'], kon['caught'], kon['penalty'],
+        ) for kon in data['kons']),
+        data['winner'], tuple(data['score']), data['source'],
+    )
+
+
+def _self_play(path, games, seed):
+    policies = [RandomPolicy()] * 4
+    return write_archive(path, (play_game(policies, game_rng(seed, i)) for i in range(games)))
+
+
+def _convert(source, path):
+    with open(source, encoding='utf-8') as f:
+        if source.endswith('.jsonl'):
+            games = games_from_kon_records(json.loads(line) for line in f if line.strip())
+            return write_archive(path, games)
+        return write_archive(path, games_from_move_history(json.load(f)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Двоичный архив партий")
+    commands = parser.add_subparsers(dest='command', required=True)
+    self_play = commands.add_parser('self-play', help="партии случайных политик")
+    self_play.add_argument('out')
+    self_play.add_argument('--games', type=int, default=1000)
+    self_play.add_argument('--seed', type=int, default=0)
+    convert = commands.add_parser(
+        'convert', help="экспорт MoveHistory (.json) или коны wslog (.jsonl)")
+    convert.add_argument('source')
+    convert.add_argument('out')
+    show = commands.add_parser('show', help="партия архива в JSON")
+    show.add_argument('archive')
+    show.add_argument('index', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        with Archive(args.archive) as archive:
+            print(json.dumps(game_to_dict(archive[args.index]), ensure_ascii=False, indent=1))
+        return
+    if args.command == 'self-play':
+        count = _self_play(args.out, args.games, args.seed)
+    else:
+        count = _convert(args.source, args.out)
+    size = os.path.getsize(args.out)
+    print(f"{args.out}: {count} партий, {size} байт")
+
+
+if __name__ == '__main__':
+    main()
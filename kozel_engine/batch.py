@@ -0,0 +1,134 @@
+"""
+Пакетная оценка позиций на NumPy
+
+Те же правила, что legal_moves (cards.py) и trick_winner/trick_points
+(tricks.py), но для N позиций сразу: таблицы мастей, силы и очков -
+массивы, позиции - строки массивов, и вся работа - индексация таблиц и
+поэлементные операции без цикла Python по позициям. Нужна генерации
+обучающих данных и доигрышам, где позиций миллионы.
+
+Позиция задаётся маской руки (uint32) и взяткой - 4 номерами карт в
+порядке хода, свободные места - NO_CARD (-1):
+
+    legal = legal_masks(hands, tricks[:, 0], no_trump_lead)
+    offsets, winners = trick_winners(tricks)
+    points = trick_points(tricks)
+
+NumPy - необязательная зависимость: движок без неё работает, этот модуль
+её требует.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .cards import FOLLOW_MASK, NUM_CARDS, SIMPLE_MASK
+from .tricks import LEAD_CONTEXT, POINTS, STRENGTH
+
+# legal - маски легальных ходов; winner_offset/winner - старшая карта
+# взятки (смещение от заходившего и номер, -1 для пустой); points - очки
+BatchResult = namedtuple('BatchResult', 'legal winner_offset winner points')
+
+
+# ============================================================================
+# ТАБЛИЦЫ
+# ============================================================================
+
+# Лишний последний элемент - для NO_CARD: индекс -1 попадает в него
+_FOLLOW = np.array(FOLLOW_MASK + (0,), dtype=np.uint32)
+_CONTEXT = np.array(LEAD_CONTEXT + (0,), dtype=np.intp)
+_POINTS = np.array(tuple(POINTS) + (0,), dtype=np.int16)
+
+# Сила карты в контексте захода: _STRENGTH[context, card], пустое место - -1
+_STRENGTH = np.full((4, NUM_CARDS + 1), -1, dtype=np.int8)
+_STRENGTH[:, :NUM_CARDS] = np.frombuffer(STRENGTH, dtype=np.uint8).reshape(4, NUM_CARDS)
+
+_BITS = np.uint32(1) << np.arange(NUM_CARDS, dtype=np.uint32)
+
+
+# ============================================================================
+# ОЦЕНКА
+# ============================================================================
+
+def legal_masks(hands, leads, no_trump_lead=False):
+    """
+    Маски легальных ходов N позиций (как legal_moves)
+
+    Args:
+        hands: маски рук, (N,)
+        leads: карта захода или NO_CARD для своего захода, (N,)
+        no_trump_lead: запрет козырного захода - bool или (N,)
+
+    Returns:
+        uint32 (N,)
+    """
+    hands = np.asarray(hands, dtype=np.uint32)
+    leads = np.asarray(leads, dtype=np.intp)
+    must = hands & _FOLLOW[leads]
+    legal = np.where(must != 0, must, hands)
+    simple = hands & np.uint32(SIMPLE_MASK)
+    banned = (leads < 0) & np.asarray(no_trump_lead, dtype=bool) & (simple != 0)
+    return np.where(banned, simple, legal)
+
+
+def trick_winners(tricks):
+    """
+    Старшая карта N неполных или полных взяток (как trick_winner)
+
+    Args:
+        tricks: номера карт в порядке хода, NO_CARD на пустых местах, (N, 4)
+
+    Returns:
+        (смещения int8 (N,), номера карт int8 (N,)); -1 для пустой взятки
+    """
+    tricks = np.asarray(tricks, dtype=np.intp)
+    context = _CONTEXT[tricks[:, 0]]
+    strength = _STRENGTH[context[:, None], tricks]
+    # Сила карт одной взятки различна, кроме нулей "не в масть" -
+    # первый максимум совпадает с тем, что даёт trick_winner
+    offsets = strength.argmax(axis=1)
+    empty = tricks[:, 0] < 0
+    winners = tricks[np.arange(len(tricks)), offsets]
+    return (np.where(empty, -1, offsets).astype(np.int8),
+            np.where(empty, -1, winners).astype(np.int8))
+
+
+def trick_points(tricks):
+    """Очки карт N взяток, int16 (N,)"""
+    return _POINTS[np.asarray(tricks, dtype=np.intp)].sum(axis=1, dtype=np.int16)
+
+
+def evaluate(hands, tricks, no_trump_lead=False):
+    """
+    Легальные ходы, старшая карта и очки стола для N позиций
+
+    Args:
+        hands: маски рук того, кто ходит, (N,)
+        tricks: карты на столе, NO_CARD на пустых местах, (N, 4)
+        no_trump_lead: запрет козырного захода - bool или (N,)
+
+    Returns:
+        BatchResult
+    """
+    tricks = np.asarray(tricks, dtype=np.intp)
+    offsets, winners = trick_winners(tricks)
+    return BatchResult(
+        legal=legal_masks(hands, tricks[:, 0], no_trump_lead),
+        winner_offset=offsets,
+        winner=winners,
+        points=trick_points(tricks),
+    )
+
+
+# ============================================================================
+# МАСКИ И БИТЫ
+# ============================================================================
+
+def masks_to_bits(masks):
+    """Маски (N,) -> bool (N, 32): столбец - номер карты"""
+    return (np.asarray(masks, dtype=np.uint32)[:, None] & _BITS) != 0
+
+
+def bits_to_masks(bits):
+    """bool (N, 32) -> маски uint32 (N,)"""
+    return (np.asarray(bits, dtype=bool) * _BITS).sum(axis=1, dtype=np.uint32)
@@ -0,0 +1,369 @@
+"""
+Замеры скорости горячих путей с сохранённой базой
+
+Каждый замер - операция над фикстурами с фиксированным seed (позиции из
+партий симулятора, случайные взятки), поэтому прогоны сравнимы между
+собой. Операция сначала калибруется: пачка растёт вдвое, пока не займёт
+SAMPLE_TIME; дальше snимается samples пачек, время операции - время
+пачки, делённое на её размер. Итог по замеру - операций в секунду и
+перцентили p50/p90/p99 времени операции в микросекундах.
+
+    legal_cards              KozelAI._get_legal_cards
+    resolve_trick            tricks.resolve_trick на полной взятке
+    choose_card[стратегия]   KozelAI.choose_card на позициях, которые
+                             уходят в _strategy_<стратегия>
+    simulate_game[политика]  партия симулятора целиком
+    recommend_http[cold|cached]
+                             POST /recommend через HTTP к RecommendServer
+                             (kozelai в текущем процессе): без кэша и из кэша
+
+Результат сравнивается с базой (bench_baseline.json рядом с модулем):
+замер, чья медиана выросла больше чем на threshold, - регрессия, и
+код выхода 1. База зависит от машины - после смены железа её снимают
+заново:
+
+    python -m kozel_engine.bench                       # сравнить с базой
+    python -m kozel_engine.bench --only 'choose_card*' --out run.json
+    python -m kozel_engine.bench --save-baseline       # переписать базу
+"""
+
+import argparse
+import asyncio
+import copy
+import fnmatch
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+from kozel_bot_architecture import KozelAI
+
+from .server import RecommendServer
+from .simulator import KozelSimulator, RandomPolicy, game_rng
+from .tricks import resolve_trick
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+DEFAULT_SAMPLES = 30
+DEFAULT_THRESHOLD = 0.25
+SAMPLE_TIME = 0.005
+SEED = 2024
+FIXTURE_GAMES = 40
+FIXTURE_TRICKS = 4096
+
+STRATEGIES = ('go_for_90', 'protect_60', 'trap_queen', 'default')
+
+
+# ============================================================================
+# ФИКСТУРЫ
+# ============================================================================
+
+def fixture_states(games=FIXTURE_GAMES, seed=SEED):
+    """GameState всех ходов партий KozelAI против KozelAI"""
+    ai = KozelAI()
+    states = []
+    for index in range(games):
+        sim = KozelSimulator([ai] * 4, rng=game_rng(seed, index))
+        while not sim.game_over:
+            states.append(sim.game_state(sim.to_move))
+            sim.step(sim.choose())
+    return states
+
+
+def strategy_states(states, ai=None):
+    """
+    Позиции по стратегиям, в которые их отправит choose_card
+
+    У каждой позиции пробуются очки кона 0 и пороги protect_60_from и
+    need_90_from, иначе стратегии крупного счёта почти не встречаются.
+    Позиции с единственным легальным ходом пропускаются - choose_card
+    возвращает его без стратегии.
+    """
+    ai = ai or KozelAI()
+    buckets = {name: [] for name in STRATEGIES}
+    for state in states:
+        if len(ai._get_legal_cards(state)) < 2:
+            continue
+        for points in (0, ai.rules['protect_60_from'], ai.rules['need_90_from']):
+            variant = copy.copy(state)
+            variant.points_in_kon = points
+            name, _ = ai._pick_strategy(ai._analyze_situation(variant))
+            buckets[name].append(variant)
+    return buckets
+
+
+def fixture_tricks(n=FIXTURE_TRICKS, seed=SEED):
+    """Полные взятки из 4 разных карт"""
+    rng = random.Random(seed)
+    return [tuple(rng.sample(range(32), 4)) for _ in range(n)]
+
+
+def state_to_json(state):
+    """gameState для /recommend из GameState"""
+    def card(c):
+        return {'rank': c.rank, 'suit': c.suit}
+
+    return {
+        'myCards': [card(c) for c in state.my_cards],
+        'tableCards': [dict(card(c), position=p) for p, c in state.table_cards],
+        'konNumber': state.kon_number,
+        'myScore': state.my_team_score,
+        'opponentScore': state.opponent_score,
+        'pointsInKon': state.points_in_kon,
+        'playedCards': [card(c) for c in state.played_cards],
+        'myTeamOpenedLastKon': state.my_team_opened_last_kon,
+        'myTeamLedInKon': state.my_team_led_in_kon,
+        'opponentsLedInKon': state.opponents_led_in_kon,
+    }
+
+
+# ============================================================================
+# ЗАМЕРЫ
+# ============================================================================
+
+# Замер: setup() -> (op(i), close или None); op делает одну операцию над
+# фикстурой i (по кругу)
+
+def _bench_legal_cards():
+    ai = KozelAI()
+    states = fixture_states()
+    return (lambda i: ai._get_legal_cards(states[i % len(states)])), None
+
+
+def _bench_resolve_trick():
+    tricks = fixture_tricks()
+    return (lambda i: resolve_trick(*tricks[i % len(tricks)])), None
+
+
+def _bench_choose_card(strategy):
+    def setup():
+        ai = KozelAI()
+        states = strategy_states(fixture_states(), ai)[strategy]
+        if not states:
+            raise ValueError(f"Нет позиций для стратегии {strategy}")
+        return (lambda i: ai.choose_card(states[i % len(states)])), None
+    return setup
+
+
+def _bench_simulate_game(policy):
+    def setup():
+        sim = KozelSimulator([policy()] * 4)
+
+        def op(i):
+            sim.reset(game_rng(SEED, i))
+            sim.play_game()
+        return op, None
+    return setup
+
+
+def _bench_recommend_http(cached):
+    def setup():
+        states = [state_to_json(s) for s in fixture_states(games=4)]
+        bodies = [json.dumps({'gameState': s}).encode() for s in states]
+        if cached:
+            bodies = bodies[:1]
+        # cache_size=0: каждый ответ вытесняется сразу, всегда расчёт
+        server = RecommendServer('kozelai', workers=0, cache_size=len(bodies) if cached else 0)
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(server.start(port=0), loop).result()
+        connection = http.client.HTTPConnection('127.0.0.1', server.port)
+
+        def op(i):
+            connection.request('POST', '/recommend', body=bodies[i % len(bodies)],
+                               headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            payload = response.read()
+            if response.status != 200:
+                raise RuntimeError(f"/recommend: {response.status} {payload[:200]!r}")
+
+        async def shutdown():
+            server.close()
+            # Обработчик соединения дочитывает EOF после connection.close()
+            current = asyncio.current_task()
+            await asyncio.gather(*(t for t in asyncio.all_tasks() if t is not current))
+
+        def close():
+            connection.close()
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        return op, close
+    return setup
+
+
+BENCHMARKS = {
+    'legal_cards': _bench_legal_cards,
+    'resolve_trick': _bench_resolve_trick,
+    **{f'choose_card[{name}]': _bench_choose_card(name) for name in STRATEGIES},
+    'simulate_game[random]': _bench_simulate_game(RandomPolicy),
+    'simulate_game[kozelai]': _bench_simulate_game(KozelAI),
+    'recommend_http[cold]': _bench_recommend_http(cached=False),
+    'recommend_http[cached]': _bench_recommend_http(cached=True),
+}
+
+
+def _percentile(values, p):
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def measure(op, samples=DEFAULT_SAMPLES, sample_time=SAMPLE_TIME):
+    """
+    Время операции op(i)
+
+    Returns:
+        {'ops_per_sec', 'p50_us', 'p90_us', 'p99_us', 'batch', 'samples'}
+    """
+    timer = time.perf_counter
+    batch = 1
+    i = 0
+    # Калибровка (заодно прогрев): пачка не короче sample_time
+    while True:
+        start = timer()
+        for _ in range(batch):
+            op(i)
+            i += 1
+        if timer() - start >= sample_time or batch >= 1 << 20:
+            break
+        batch *= 2
+
+    per_op = []
+    total = 0.0
+    for _ in range(samples):
+        start = timer()
+        for _ in range(batch):
+            op(i)
+            i += 1
+        elapsed = timer() - start
+        total += elapsed
+        per_op.append(elapsed / batch * 1e6)
+    per_op.sort()
+    return {
+        'ops_per_sec': round(samples * batch / total, 1),
+        'p50_us': round(_percentile(per_op, 0.50), 3),
+        'p90_us': round(_percentile(per_op, 0.90), 3),
+        'p99_us': round(_percentile(per_op, 0.99), 3),
+        'batch': batch,
+        'samples': samples,
+    }
+
+
+def select(patterns=None):
+    """Имена замеров по шаблонам fnmatch (None - все)"""
+    if not patterns:
+        return list(BENCHMARKS)
+    names = [name for name in BENCHMARKS
+             if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+    if not names:
+        raise ValueError(f"Нет замеров по {patterns}, есть: {', '.join(BENCHMARKS)}")
+    return names
+
+
+def run_benchmarks(names=None, samples=DEFAULT_SAMPLES, sample_time=SAMPLE_TIME, log=None):
+    """
+    Прогнать замеры
+
+    Returns:
+        {'meta': {...}, 'benchmarks': {имя: результат measure}}
+    """
+    results = {}
+    for name in names or list(BENCHMARKS):
+        op, close = BENCHMARKS[name]()
+        try:
+            results[name] = measure(op, samples, sample_time)
+        finally:
+            if close is not None:
+                close()
+        if log is not None:
+            log(f"{name}: {results[name]['ops_per_sec']:.1f} оп/с, "
+                f"p50 {results[name]['p50_us']:.1f} мкс")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'system': platform.system(),
+            'cpu_count': os.cpu_count(),
+            'seed': SEED,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Регрессии относительно базы
+
+    Сравнивается медиана времени операции: она устойчивее к случайным
+    паузам машины, чем среднее (ops_per_sec).
+
+    Returns:
+        [(имя, p50 базы, p50 сейчас, изменение)] замеров, замедлившихся
+        больше чем на threshold (доля)
+    """
+    regressions = []
+    base = baseline.get('benchmarks', {})
+    for name, result in report['benchmarks'].items():
+        if name not in base:
+            continue
+        before = base[name]['p50_us']
+        after = result['p50_us']
+        change = after / before - 1
+        if change > threshold:
+            regressions.append((name, before, after, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры скорости с базой")
+    parser.add_argument('--only', nargs='+', help="шаблоны имён замеров (fnmatch)")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="допустимое замедление p50, доля (0.25 - 25%%)")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="записать результат в базу вместо сравнения")
+    parser.add_argument('--out', help="файл для JSON (по умолчанию - stdout)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(select(args.only), args.samples,
+                            log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    if args.save_baseline:
+        baseline = {'meta': report['meta'], 'benchmarks': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        # Замеры не из --only остаются в базе как были
+        baseline['meta'] = report['meta']
+        baseline['benchmarks'].update(report['benchmarks'])
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=1)
+            f.write('\n')
+        print(f"База: {args.baseline}", file=sys.stderr)
+        return 0
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if not os.path.exists(args.baseline):
+        print(f"Нет базы {args.baseline} - сравнивать не с чем", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    for name, before, after, change in regressions:
+        print(f"РЕГРЕССИЯ {name}: p50 {before:.1f} -> {after:.1f} мкс ({change:+.0%})",
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Битовое представление карт для движка Козла
+
+Каждая из 32 карт - номер бита 0..31 (масть * 8 + ранг), рука - одно целое
+число-маска. Козыри, простые масти и очки посчитаны заранее в маски и
+таблицы, поэтому генерация легальных ходов - это несколько AND/OR.
+
+Раскладка битов: младший байт - трефы, дальше пики, черви, бубны.
+Внутри байта ранги идут в порядке RANKS.
+"""
+
+RANKS = ('7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+SUITS = ('clubs', 'spades', 'hearts', 'diamonds')
+
+CLUBS, SPADES, HEARTS, DIAMONDS = range(4)
+
+NUM_CARDS = 32
+FULL_DECK = (1 << NUM_CARDS) - 1
+NO_CARD = -1
+
+RANK_POINTS = {
+    '7': 0, '8': 0, '9': 0,
+    'J': 2, 'Q': 3, 'K': 4,
+    '10': 10, 'A': 11
+}
+
+
+# ============================================================================
+# ИНДЕКСЫ КАРТ
+# ============================================================================
+
+CARD_INDEX = {
+    (rank, suit): suit_i * 8 + rank_i
+    for suit_i, suit in enumerate(SUITS)
+    for rank_i, rank in enumerate(RANKS)
+}
+
+CARD_RANK = tuple(RANKS[i % 8] for i in range(NUM_CARDS))
+CARD_SUIT = tuple(SUITS[i // 8] for i in range(NUM_CARDS))
+
+
+def card_index(rank, suit):
+    """Номер бита карты по рангу и масти"""
+    return CARD_INDEX[(rank, suit)]
+
+
+def card_name(index):
+    """Короткое имя карты в формате Card.__repr__ (например 'QC')"""
+    return f"{CARD_RANK[index]}{CARD_SUIT[index][0].upper()}"
+
+
+SEVEN_CLUBS = card_index('7', 'clubs')
+QUEEN_CLUBS = card_index('Q', 'clubs')
+ACE_DIAMONDS = card_index('A', 'diamonds')
+
+
+# ============================================================================
+# ПРЕДПОСЧИТАННЫЕ МАСКИ
+# ============================================================================
+
+def _is_trump(index):
+    # Все валеты, дамы и все трефы - козыри
+    return CARD_RANK[index] in ('J', 'Q') or CARD_SUIT[index] == 'clubs'
+
+
+TRUMP_MASK = sum(1 << i for i in range(NUM_CARDS) if _is_trump(i))
+SIMPLE_MASK = FULL_DECK & ~TRUMP_MASK
+
+SUIT_MASK = tuple(0xFF << (8 * s) for s in range(4))
+
+# Простые карты каждой масти (у треф простых нет)
+SIMPLE_SUIT_MASK = tuple(SUIT_MASK[s] & SIMPLE_MASK for s in range(4))
+
+# Простая масть карты или NO_CARD для козыря
+CARD_SIMPLE_SUIT = tuple(
+    NO_CARD if _is_trump(i) else i // 8
+    for i in range(NUM_CARDS)
+)
+
+# Какие карты обязан подложить игрок, если этой картой зашли.
+# Для козырного захода - 0: подкладывать можно любую карту.
+FOLLOW_MASK = tuple(
+    0 if _is_trump(i) else SIMPLE_SUIT_MASK[i // 8]
+    for i in range(NUM_CARDS)
+)
+
+CARD_POINTS = tuple(RANK_POINTS[CARD_RANK[i]] for i in range(NUM_CARDS))
+POINT_MASK = sum(1 << i for i in range(NUM_CARDS) if CARD_POINTS[i])
+
+# Очки одного байта маски: ранги в каждом байте одинаковые,
+# поэтому одна таблица на 256 значений подходит для всех мастей
+_BYTE_POINTS = tuple(
+    sum(RANK_POINTS[RANKS[r]] for r in range(8) if b >> r & 1)
+    for b in range(256)
+)
+
+
+# ============================================================================
+# ОПЕРАЦИИ С МАСКАМИ
+# ============================================================================
+
+def hand_mask(cards):
+    """
+    Маска руки из карт
+
+    Принимает Card (номер бита берётся из card.index, без поиска по
+    словарю) или пары (rank, suit).
+    """
+    mask = 0
+    for card in cards:
+        if isinstance(card, tuple):
+            mask |= 1 << CARD_INDEX[card]
+        else:
+            mask |= 1 << card.index
+    return mask
+
+
+def iter_cards(mask):
+    """Номера карт маски по возрастанию"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def mask_to_list(mask):
+    """Список номеров карт маски"""
+    return list(iter_cards(mask))
+
+
+def count(mask):
+    """Количество карт в маске"""
+    return mask.bit_count()
+
+
+def mask_points(mask):
+    """Сумма очков карт маски"""
+    return (_BYTE_POINTS[mask & 0xFF]
+            + _BYTE_POINTS[mask >> 8 & 0xFF]
+            + _BYTE_POINTS[mask >> 16 & 0xFF]
+            + _BYTE_POINTS[mask >> 24 & 0xFF])
+
+
+def legal_moves(hand, lead=NO_CARD, no_trump_lead=False):
+    """
+    Маска легальных ходов
+
+    Правила (как в KozelAI._get_legal_cards):
+    - Зашли простой мастью - обязательно подложить простую этой масти
+    - Валеты, дамы, трефы простой не считаются
+    - Зашли козырем или простой нет - любая карта
+    - Свой заход при запрете (no_trump_lead) - без козырей,
+      если на руке есть хоть одна простая
+
+    Args:
+        hand: маска руки
+        lead: номер карты захода или NO_CARD, если стол пуст
+        no_trump_lead: действует запрет на козырный заход
+    """
+    if lead == NO_CARD:
+        if no_trump_lead:
+            return hand & SIMPLE_MASK or hand
+        return hand
+    return hand & FOLLOW_MASK[lead] or hand
@@ -0,0 +1,396 @@
+"""
+Признаки состояния для нейросети расширения на NumPy
+
+Та же раскладка, что MLStateEncoder.encodeGameState
+(kozel-assistant/ai/ml-encoder.js), но для N состояний сразу и в заранее
+выделенный массив float32 (N, 92):
+
+    0..35   рука, one-hot по колоде из 36 карт (масти hearts, diamonds,
+            clubs, spades; ранги 6..A - шестёрок в игре нет)
+    36..71  карты стола, one-hot
+    72..75  позиция - всегда bottom (1, 0, 0, 0)
+    76..77  очки команд / 120
+    78      мой ход
+    79..81  кто берёт взятку: никто / мы или партнёр / соперник
+    82..91  карт на руке / 9, карт на столе / 4, партии команд / 3, резерв
+
+Вместо indexOf по картам - перестановка столбцов: биты маски руки
+(batch.masks_to_bits) сразу кладутся в столбцы кодировщика; старшая
+карта стола - batch.trick_winners.
+
+Состояния задаются столбцами States; их дают states_from_game_states
+(gameState расширения) и examples_from_games (наши ходы из партий
+archive.py, с действием и наградой как у MoveHistory.prepareMLTrainingData).
+write_shards пишет обучающий набор осколками .npy с manifest.json, и
+open_shards открывает их через mmap:
+
+    python -m kozel_engine.features games.kzga --out dataset/ --workers 4
+
+NumPy - необязательная зависимость, как у batch.py.
+"""
+
+import argparse
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .archive import Archive
+from .batch import masks_to_bits, trick_winners
+from .cards import NO_CARD, NUM_CARDS, RANKS, SUITS
+from .model import parse_card
+from .simulator import POSITIONS
+from .tricks import resolve_trick
+
+ENCODER_SUITS = ('hearts', 'diamonds', 'clubs', 'spades')
+ENCODER_RANKS = ('6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+DECK_SIZE = len(ENCODER_SUITS) * len(ENCODER_RANKS)
+
+# Начала блоков вектора
+HAND, TABLE, POSITION, SCORE, MY_TURN, WINNER, EXTRA = 0, 36, 72, 76, 78, 79, 82
+INPUT_SIZE = 92
+OUTPUT_SIZE = DECK_SIZE
+
+SHARD_SIZE = 1 << 16
+CHUNK_GAMES = 256
+
+# Индекс карты у кодировщика (getCardIndex) по номеру карты движка
+ENCODER_INDEX = tuple(
+    ENCODER_SUITS.index(SUITS[i // 8]) * len(ENCODER_RANKS) + ENCODER_RANKS.index(RANKS[i % 8])
+    for i in range(NUM_CARDS)
+)
+
+# hands - маски рук uint32 (N,); tables - карты стола в порядке хода,
+# NO_CARD на пустых местах (N, 4); seats - места этих карт (0 - мы, как
+# в симуляторе), -1 - неизвестно (N, 4); scores - очки кона нас и
+# соперников (N, 2); my_turn - bool (N,); games - партии команд (N, 2)
+States = namedtuple('States', 'hands tables seats scores my_turn games')
+# Осколок набора: x (N, 92), action - индекс карты кодировщика (N,),
+# reward (N,)
+Shard = namedtuple('Shard', 'x action reward')
+
+
+# ============================================================================
+# КОДИРОВАНИЕ
+# ============================================================================
+
+_HAND_COLUMNS = HAND + np.array(ENCODER_INDEX)
+_TABLE_COLUMNS = TABLE + np.array(ENCODER_INDEX)
+# Бит карты, последний элемент - для NO_CARD
+_CARD_BIT = np.append(np.uint32(1) << np.arange(NUM_CARDS, dtype=np.uint32), np.uint32(0))
+
+
+def encode_states(states, out=None):
+    """
+    Векторы MLStateEncoder для N состояний
+
+    Args:
+        states: States
+        out: float32 (N, 92) для записи на месте или None
+
+    Returns:
+        out
+    """
+    tables = np.asarray(states.tables, dtype=np.intp)
+    n = len(tables)
+    if out is None:
+        out = np.empty((n, INPUT_SIZE), dtype=np.float32)
+    out.fill(0)
+
+    hand_bits = masks_to_bits(states.hands)
+    out[:, _HAND_COLUMNS] = hand_bits
+    table_mask = np.bitwise_or.reduce(_CARD_BIT[tables], axis=1)
+    out[:, _TABLE_COLUMNS] = masks_to_bits(table_mask)
+    out[:, POSITION] = 1
+
+    # Деление в float64 и округление при записи - как Float32Array из
+    # чисел JS
+    scores = np.asarray(states.scores)
+    out[:, SCORE] = scores[:, 0] / 120
+    out[:, SCORE + 1] = scores[:, 1] / 120
+    out[:, MY_TURN] = states.my_turn
+
+    on_table = (tables >= 0).sum(axis=1)
+    offsets, _ = trick_winners(tables)
+    seats = np.asarray(states.seats)[np.arange(n), np.maximum(offsets, 0)]
+    # getTrickWinner: bottom или top - наши, любое другое место - соперник
+    ours = (seats == 0) | (seats == 2)
+    out[:, WINNER] = on_table == 0
+    out[:, WINNER + 1] = (on_table > 0) & ours
+    out[:, WINNER + 2] = (on_table > 0) & ~ours
+
+    games = np.asarray(states.games)
+    out[:, EXTRA] = hand_bits.sum(axis=1) / 9
+    out[:, EXTRA + 1] = on_table / 4
+    out[:, EXTRA + 2] = games[:, 0] / 3
+    out[:, EXTRA + 3] = games[:, 1] / 3
+    return out
+
+
+def _slice(states, start, stop):
+    return States(*(column[start:stop] for column in states))
+
+
+# ============================================================================
+# СОСТОЯНИЯ
+# ============================================================================
+
+def _card_index(data):
+    try:
+        return parse_card(data).index
+    except ValueError:
+        return None
+
+
+def states_from_game_states(game_states):
+    """
+    States из gameState расширения (как их видит encodeGameState)
+
+    Карта стола - {player, card} (parseTableCards) или сама карта с
+    position; неразборчивые карты пропускаются, как в parseCards.
+    """
+    n = len(game_states)
+    hands = np.zeros(n, dtype=np.uint32)
+    tables = np.full((n, 4), NO_CARD, dtype=np.int8)
+    seats = np.full((n, 4), -1, dtype=np.int8)
+    scores = np.zeros((n, 2), dtype=np.int16)
+    my_turn = np.zeros(n, dtype=bool)
+    games = np.zeros((n, 2), dtype=np.int16)
+
+    for row, state in enumerate(game_states):
+        for data in state.get('myCards') or []:
+            index = _card_index(data)
+            if index is not None:
+                hands[row] |= np.uint32(1 << index)
+        column = 0
+        for item in (state.get('tableCards') or [])[:4]:
+            index = _card_index(item.get('card', item) if isinstance(item, dict) else item)
+            if index is None:
+                continue
+            tables[row, column] = index
+            if isinstance(item, dict):
+                position = item.get('player', item.get('position'))
+                if position in POSITIONS:
+                    seats[row, column] = POSITIONS.index(position)
+            column += 1
+        scores[row] = state.get('myTeamScore') or 0, state.get('opponentScore') or 0
+        my_turn[row] = bool(state.get('myTurn'))
+        teams = state.get('teams') or {}
+        games[row] = teams.get('myGames') or 0, teams.get('opponentGames') or 0
+    return States(hands, tables, seats, scores, my_turn, games)
+
+
+class _Rows:
+    """Столбцы примеров, копящиеся списками до перевода в массивы"""
+
+    def __init__(self):
+        self.hands = []
+        self.tables = []
+        self.seats = []
+        self.scores = []
+        self.games = []
+        self.actions = []
+        self.rewards = []
+
+    def arrays(self):
+        n = len(self.actions)
+        states = States(
+            np.array(self.hands, dtype=np.uint32),
+            np.array(self.tables, dtype=np.int8).reshape(n, 4),
+            np.array(self.seats, dtype=np.int8).reshape(n, 4),
+            np.array(self.scores, dtype=np.int16).reshape(n, 2),
+            np.ones(n, dtype=bool),
+            np.array(self.games, dtype=np.int16).reshape(n, 2),
+        )
+        return (states, np.array(self.actions, dtype=np.int16),
+                np.array(self.rewards, dtype=np.float32))
+
+
+def _reward(trick_won, points, game_won):
+    # MoveHistory.prepareMLTrainingData
+    reward = 0.5
+    if trick_won:
+        reward += 0.2
+        if points > 0:
+            reward += min(0.3, points / 30)
+    return reward * 0.7 + (1.0 if game_won else 0.0) * 0.3
+
+
+def _add_game(rows, game):
+    game_won = game.winner == 0
+    games = [0, 0]
+    for kon in game.kons:
+        hand = kon.hands[0]
+        points = [0, 0]
+        for trick in kon.tricks:
+            cards = trick.cards
+            # Наша карта - на месте (0 - заходящий) от заходящего
+            mine = -trick.leader % 4
+            complete = len(cards) == 4
+            if complete:
+                offset, trick_points = resolve_trick(*cards)
+                winner = (trick.leader + offset) % 4
+            if mine < len(cards):
+                table = cards[:mine]
+                rows.hands.append(hand)
+                rows.tables.extend(table + (NO_CARD,) * (4 - mine))
+                rows.seats.extend([(trick.leader + i) % 4 for i in range(mine)]
+                                  + [-1] * (4 - mine))
+                rows.scores.extend(points)
+                rows.games.extend(games)
+                rows.actions.append(ENCODER_INDEX[cards[mine]])
+                won = complete and winner == 0
+                rows.rewards.append(_reward(won, trick_points if won else 0, game_won))
+                hand &= ~(1 << cards[mine])
+            if complete:
+                points[winner & 1] += trick_points
+        if kon.winner in (0, 1):
+            games[1 - kon.winner] += kon.penalty
+
+
+def examples_from_games(games):
+    """
+    Наши ходы из партий archive.py: (States, действия, награды)
+
+    Состояние - перед нашей картой: рука, стол от заходящего, очки кона
+    по уже закрытым взяткам, партии команд до кона. Взятка, записанная
+    не до конца, считается не взятой.
+    """
+    rows = _Rows()
+    for game in games:
+        _add_game(rows, game)
+    return rows.arrays()
+
+
+# ============================================================================
+# ОСКОЛКИ
+# ============================================================================
+
+class _ShardWriter:
+    """Заранее выделенные буферы осколка; полный буфер уходит в .npy"""
+
+    def __init__(self, out_dir, prefix, shard_size):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.x = np.empty((shard_size, INPUT_SIZE), dtype=np.float32)
+        self.action = np.empty(shard_size, dtype=np.int16)
+        self.reward = np.empty(shard_size, dtype=np.float32)
+        self.rows = 0
+        self.shards = []
+
+    def add(self, states, actions, rewards):
+        start = 0
+        while start < len(actions):
+            stop = min(len(actions), start + len(self.action) - self.rows)
+            end = self.rows + stop - start
+            encode_states(_slice(states, start, stop), out=self.x[self.rows:end])
+            self.action[self.rows:end] = actions[start:stop]
+            self.reward[self.rows:end] = rewards[start:stop]
+            self.rows = end
+            start = stop
+            if self.rows == len(self.action):
+                self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        name = f'{self.prefix}-{len(self.shards):05d}'
+        entry = {'rows': self.rows}
+        for field in Shard._fields:
+            entry[field] = f'{name}.{field}.npy'
+            np.save(os.path.join(self.out_dir, entry[field]), getattr(self, field)[:self.rows])
+        self.shards.append(entry)
+        self.rows = 0
+
+
+def _write_part(task):
+    archive_path, start, stop, out_dir, prefix, shard_size = task
+    writer = _ShardWriter(out_dir, prefix, shard_size)
+    with Archive(archive_path) as archive:
+        for chunk in range(start, stop, CHUNK_GAMES):
+            games = [archive[i] for i in range(chunk, min(stop, chunk + CHUNK_GAMES))]
+            writer.add(*examples_from_games(games))
+    writer.flush()
+    return writer.shards
+
+
+def write_shards(games, out_dir, shard_size=SHARD_SIZE, prefix='part'):
+    """
+    Записать наши ходы из партий осколками .npy и manifest.json
+
+    Returns:
+        число примеров
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    writer = _ShardWriter(out_dir, prefix, shard_size)
+    chunk = []
+    for game in games:
+        chunk.append(game)
+        if len(chunk) == CHUNK_GAMES:
+            writer.add(*examples_from_games(chunk))
+            chunk = []
+    if chunk:
+        writer.add(*examples_from_games(chunk))
+    writer.flush()
+    return _write_manifest(out_dir, writer.shards)
+
+
+def build_dataset(archive_path, out_dir, shard_size=SHARD_SIZE, workers=None):
+    """
+    Обучающий набор из архива партий в пуле процессов
+
+    Каждый процесс берёт свой диапазон партий и пишет свои осколки.
+
+    Returns:
+        число примеров
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with Archive(archive_path) as archive:
+        total = len(archive)
+    workers = max(1, min(workers or os.cpu_count(), total))
+    bounds = [total * part // workers for part in range(workers + 1)]
+    tasks = [(archive_path, bounds[part], bounds[part + 1], out_dir, f'part{part:03d}', shard_size)
+             for part in range(workers)]
+    if workers == 1:
+        parts = map(_write_part, tasks)
+        return _write_manifest(out_dir, [s for shards in parts for s in shards])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_write_part, tasks))
+    return _write_manifest(out_dir, [s for shards in parts for s in shards])
+
+
+def _write_manifest(out_dir, shards):
+    manifest = {'input_size': INPUT_SIZE, 'output_size': OUTPUT_SIZE, 'shards': shards}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    return sum(shard['rows'] for shard in shards)
+
+
+def open_shards(out_dir, mmap_mode='r'):
+    """Осколки набора (Shard), массивы открыты через mmap"""
+    with open(os.path.join(out_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('input_size') != INPUT_SIZE:
+        raise ValueError(f"Набор с вектором {manifest.get('input_size')}, нужен {INPUT_SIZE}")
+    return [
+        Shard(*(np.load(os.path.join(out_dir, shard[field]), mmap_mode=mmap_mode)
+                for field in Shard._fields))
+        for shard in manifest['shards']
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Архив партий -> признаки MLStateEncoder (.npy)")
+    parser.add_argument('archive', help="архив archive.py")
+    parser.add_argument('--out', default='dataset', help="каталог осколков")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    rows = build_dataset(args.archive, args.out, args.shard_size, args.workers)
+    print(f"{args.out}: {rows} примеров")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""
+Поиск по дереву Монте-Карло на информационных множествах (SO-ISMCTS)
+
+Одно дерево с точки зрения игрока: узел - последовательность сыгранных
+карт, ребро - карта, которую сыграло место. Каждая итерация:
+1. раздать скрытые карты (pimc.sample_hands)
+2. спуститься по дереву, выбирая по UCB только ходы, легальные в этой
+   раздаче; у всех легальных детей растёт счётчик доступности
+3. добавить один новый ход
+4. доиграть кон жадной политикой (pimc._rollout_card)
+5. записать каждому узлу долю очков кона команды, сделавшей ход
+
+Легальность - та же, что в KozelAI._get_legal_cards (маски решателя).
+
+Дерево не строится заново на каждом ходу: на следующем вызове корень
+спускается по картам, сыгранным с прошлого поиска (наш ход и конец
+прошлой взятки из GameState.last_trick, затем текущий стол), и
+статистика этого поддерева сохраняется. Спуск возможен, только если
+прошлый поиск был ровно на взятку раньше: единственный легальный ход
+KozelAI и симулятор делают без поиска, и тогда дерево строится заново.
+Вне симулятора карты можно передавать по одной через observe_card.
+
+    engine = ISMCTSEngine(time_ms=300)
+    ai = KozelAI(evaluator=engine)
+
+Места в расчёте - относительно игрока, как в pimc.py.
+"""
+
+import math
+import random
+import time
+from collections import namedtuple
+
+from .cards import NO_CARD, count, iter_cards, legal_moves, mask_to_list
+from .pimc import _rollout_card, observe, sample_hands, world_played
+from .solver import DoubleDummySolver
+
+DEFAULT_TIME_MS = 300
+DEFAULT_EXPLORATION = 0.7
+TOTAL_POINTS = 120
+
+# Результат поиска: visits - {карта: посещения}, iterations - итераций
+# этого вызова, reused - посещений корня, унаследованных от прошлого хода
+ISMCTSResult = namedtuple('ISMCTSResult', 'best_move visits iterations reused elapsed')
+
+
+class Node:
+    """Узел дерева: ход card места seat (относительно игрока)"""
+
+    __slots__ = ('card', 'seat', 'parent', 'children', 'visits', 'reward', 'avails')
+
+    def __init__(self, card=NO_CARD, seat=NO_CARD, parent=None):
+        self.card = card
+        self.seat = seat
+        self.parent = parent
+        self.children = {}
+        self.visits = 0
+        self.reward = 0.0
+        self.avails = 1
+
+
+class ISMCTSEngine:
+    """
+    ISMCTS с переиспользованием дерева между ходами
+
+    Args:
+        iterations: максимум итераций на ход (None - без ограничения)
+        time_ms: ограничение времени на ход (None - без ограничения)
+        exploration: коэффициент исследования UCB
+        seed: зерно раздач и доигрышей
+    """
+
+    def __init__(self, iterations=None, time_ms=DEFAULT_TIME_MS,
+                 exploration=DEFAULT_EXPLORATION, seed=None):
+        if iterations is None and time_ms is None:
+            raise ValueError("Нужно ограничение: iterations и/или time_ms")
+        self.iterations = iterations
+        self.time_ms = time_ms
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.solver = DoubleDummySolver()
+        self.root = None
+        self._kon_key = None
+        self._root_cards = None
+
+    def reset(self):
+        """Забыть дерево (новый кон)"""
+        self.root = None
+        self._kon_key = None
+        self._root_cards = None
+
+    # ------------------------------------------------------------------------
+    # Дерево
+    # ------------------------------------------------------------------------
+
+    def observe_card(self, card):
+        """Перевести корень в узел после хода card (любого места)"""
+        if self.root is None:
+            return
+        child = self.root.children.get(card)
+        if child is None:
+            self.root = None
+            return
+        child.parent = None
+        self.root = child
+
+    @staticmethod
+    def _cards_in_hands(observation):
+        # Карт на руках у всех мест: уменьшается на 1 с каждым ходом кона
+        return 4 * count(observation.hand) - len(observation.trick)
+
+    def _sync(self, game_state, observation):
+        """Спуститься по картам, сыгранным после нашего прошлого хода"""
+        kon_key = (game_state.kon_number, game_state.my_team_score,
+                   game_state.opponent_score)
+        if kon_key != self._kon_key or self.root is None:
+            self._kon_key = kon_key
+            self.root = None
+            return
+
+        # Корень - позиция нашего прошлого хода, он был в прошлой взятке:
+        # наш ход, остаток той взятки, текущий стол
+        our = [i for i, (position, _) in enumerate(game_state.last_trick)
+               if position == 'bottom']
+        if not our:
+            self.root = None
+            return
+        seen = [card.index for _, card in game_state.last_trick[our[0]:]]
+        seen.extend(card.index for _, card in game_state.table_cards)
+        # Прошлый поиск был не на этой взятке (вынужденный ход без поиска) -
+        # корень устарел, спуск привёл бы в чужую позицию
+        if self._root_cards != self._cards_in_hands(observation) + len(seen):
+            self.root = None
+            return
+        for card in seen:
+            self.observe_card(card)
+
+    # ------------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------------
+
+    def search(self, game_state, legal_cards=None, forbidden=None):
+        """
+        Поиск из позиции игрока, который сейчас ходит
+
+        Returns:
+            ISMCTSResult
+        """
+        start = time.perf_counter()
+        observation = observe(game_state)
+        if forbidden is None and game_state.tracker is not None:
+            forbidden = game_state.tracker.forbidden()
+        self._sync(game_state, observation)
+        if self.root is None:
+            self.root = Node()
+        self._root_cards = self._cards_in_hands(observation)
+        root = self.root
+        reused = root.visits
+
+        if legal_cards is not None:
+            moves = [card.index for card in legal_cards]
+        else:
+            lead = observation.trick[0] if observation.trick else NO_CARD
+            no_trump_lead = observation.first_kon or bool(observation.ban & 1)
+            moves = list(iter_cards(legal_moves(observation.hand, lead, no_trump_lead)))
+
+        # Награда - доля очков всего кона, поэтому статистика узлов
+        # сопоставима после переноса корня
+        base = game_state.points_in_kon
+
+        deadline = start + self.time_ms / 1000 if self.time_ms is not None else None
+        iterations = 0
+        if len(moves) > 1:
+            while True:
+                hands = sample_hands(observation, self.rng, forbidden)
+                self.solver.load(
+                    hands, observation.leader, observation.trick,
+                    banned=(observation.ban & 1, observation.ban >> 1 & 1),
+                    first_kon=observation.first_kon, played=world_played(observation, hands)
+                )
+                self._iterate(root, base)
+                iterations += 1
+                if self.iterations is not None and iterations >= self.iterations:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+
+        visits = {
+            card: root.children[card].visits if card in root.children else 0
+            for card in moves
+        }
+        best_move = max(moves, key=visits.__getitem__)
+        return ISMCTSResult(best_move, visits, iterations, reused,
+                            time.perf_counter() - start)
+
+    def _iterate(self, root, base):
+        solver = self.solver
+        rng = self.rng
+        c = self.exploration
+        node = root
+        path = []
+        made = []
+        value = 0
+        terminal = None
+
+        # Выбор и расширение
+        while solver.trick or solver.hands[solver.leader]:
+            seat = solver.to_move
+            legal = mask_to_list(solver.legal_mask())
+            untried = [card for card in legal if card not in node.children]
+            for card in legal:
+                child = node.children.get(card)
+                if child is not None:
+                    child.avails += 1
+            if untried:
+                card = rng.choice(untried)
+                child = Node(card, seat, node)
+                node.children[card] = child
+            else:
+                child = max(
+                    (node.children[card] for card in legal),
+                    key=lambda n: n.reward / n.visits + c * math.sqrt(math.log(n.avails) / n.visits)
+                )
+            gained, terminal = solver.make(child.card)
+            made.append(child.card)
+            path.append(child)
+            node = child
+            if terminal is not None:
+                value += terminal
+                break
+            value += gained
+            if untried:
+                break
+
+        # Доигрыш
+        if terminal is None:
+            while solver.trick or solver.hands[solver.leader]:
+                card = _rollout_card(solver, rng)
+                gained, terminal = solver.make(card)
+                made.append(card)
+                if terminal is not None:
+                    value += terminal
+                    break
+                value += gained
+
+        for card in reversed(made):
+            solver.unmake(card)
+
+        # Доля очков кона команды, сделавшей ход
+        share = (base + value) / TOTAL_POINTS
+        root.visits += 1
+        for child in path:
+            child.visits += 1
+            child.reward += share if child.seat & 1 == 0 else 1 - share
+
+    def choose_card(self, game_state, legal_cards=None):
+        """Лучшая карта (объект Card из руки) - для KozelAI(evaluator=...)"""
+        result = self.search(game_state, legal_cards)
+        return next(card for card in game_state.my_cards if card.index == result.best_move)
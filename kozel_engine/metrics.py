@@ -0,0 +1,136 @@
+"""
+Замеры решений KozelAI.choose_card
+
+DecisionMetrics считает, какая стратегия сработала, и копит гистограммы
+времени фаз решения:
+
+    legal      _get_legal_cards
+    analyze    _analyze_situation
+    strategy   выбранная _strategy_* (или поиск evaluator)
+    total      choose_card целиком
+
+Стратегии - go_for_90, protect_60, trap_queen, default, а также forced
+(единственный легальный ход) и evaluator (ход выбрал поиск).
+
+Гистограмма - счётчики по степеням двойки наносекунд: запись - одно
+bit_length и два сложения, без списков значений, и гистограммы разных
+процессов складываются поэлементно. Выключенные замеры ничего не стоят:
+KozelAI(metrics=None) вызывает исходный choose_card без проверок.
+
+    metrics = DecisionMetrics()
+    ai = KozelAI(metrics=metrics)
+    ...
+    print(metrics.snapshot())     # текст в формате Prometheus
+"""
+
+PHASES = ('legal', 'analyze', 'strategy', 'total')
+
+# Корзина i - длительности меньше 2**i нс; последняя - всё, что дольше
+# 2**38 нс (~4.6 мин)
+BUCKETS = 40
+
+PREFIX = 'kozel_ai'
+
+
+class Histogram:
+    """Гистограмма длительностей (нс) по степеням двойки"""
+
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+
+    def observe(self, ns):
+        self.counts[min(ns.bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += ns
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q):
+        """Верхняя граница (нс) корзины с q-й долей замеров (0 - если пусто)"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return 1 << i
+        return 1 << (BUCKETS - 1)
+
+
+class DecisionMetrics:
+    """Счётчики стратегий и гистограммы фаз choose_card"""
+
+    def __init__(self):
+        self.decisions = {}
+        # (фаза, стратегия) -> Histogram
+        self.histograms = {}
+
+    def _observe(self, phase, strategy, ns):
+        histogram = self.histograms.get((phase, strategy))
+        if histogram is None:
+            histogram = self.histograms[phase, strategy] = Histogram()
+        histogram.observe(ns)
+
+    def record(self, strategy, legal_ns, analyze_ns=None, strategy_ns=None, total_ns=None):
+        """Одно решение: длительности фаз в нс (None - фазы не было)"""
+        self.decisions[strategy] = self.decisions.get(strategy, 0) + 1
+        self._observe('legal', strategy, legal_ns)
+        if analyze_ns is not None:
+            self._observe('analyze', strategy, analyze_ns)
+        if strategy_ns is not None:
+            self._observe('strategy', strategy, strategy_ns)
+        self._observe('total', strategy, legal_ns if total_ns is None else total_ns)
+
+    def merge(self, other):
+        """Добавить замеры другого DecisionMetrics (например, из воркера)"""
+        for strategy, n in other.decisions.items():
+            self.decisions[strategy] = self.decisions.get(strategy, 0) + n
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].merge(histogram)
+
+    def drain(self):
+        """Замеры с прошлого drain (новый DecisionMetrics); свои - обнуляются"""
+        drained = DecisionMetrics()
+        drained.decisions, self.decisions = self.decisions, {}
+        drained.histograms, self.histograms = self.histograms, {}
+        return drained
+
+    def snapshot(self):
+        """Текстовый снимок в формате Prometheus (text exposition 0.0.4)"""
+        lines = [
+            f'# HELP {PREFIX}_decisions_total Решения choose_card по стратегиям',
+            f'# TYPE {PREFIX}_decisions_total counter',
+        ]
+        for strategy in sorted(self.decisions):
+            lines.append(f'{PREFIX}_decisions_total{{strategy="{strategy}"}} '
+                         f'{self.decisions[strategy]}')
+
+        lines += [
+            f'# HELP {PREFIX}_phase_seconds Длительность фаз choose_card',
+            f'# TYPE {PREFIX}_phase_seconds histogram',
+        ]
+        order = {phase: i for i, phase in enumerate(PHASES)}
+        for phase, strategy in sorted(self.histograms, key=lambda k: (order[k[0]], k[1])):
+            histogram = self.histograms[phase, strategy]
+            labels = f'phase="{phase}",strategy="{strategy}"'
+            # Пустые корзины по краям не выводятся: счётчики накопительные
+            used = [i for i, n in enumerate(histogram.counts) if n]
+            seen = 0
+            for i in range(used[0], min(used[-1] + 1, BUCKETS - 1)):
+                seen += histogram.counts[i]
+                lines.append(f'{PREFIX}_phase_seconds_bucket{{{labels},le="{(1 << i) / 1e9:.9g}"}} {seen}')
+            lines.append(f'{PREFIX}_phase_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{PREFIX}_phase_seconds_sum{{{labels}}} {histogram.total / 1e9:.9g}')
+            lines.append(f'{PREFIX}_phase_seconds_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,258 @@
+"""
+Модель карты и игрового состояния
+
+Card и GameState нужны и ИИ (kozel_bot_architecture.py), и движку
+(симулятор, сервер), поэтому живут здесь; kozel_bot_architecture
+реэкспортирует их для старого кода. Здесь же разбор карт в формате
+расширения (parse_card): им пользуются сервер, логи и архив партий, и
+ради него не нужно тянуть сервер и ИИ.
+"""
+
+from .cards import CARD_POINTS, NUM_CARDS, RANKS, SUITS, card_index
+from .tricks import TRUMP_ORDER, resolve_trick
+
+POSITIONS = ('bottom', 'left', 'top', 'right')  # по часовой, bottom - мы
+OUR_POSITIONS = ('bottom', 'top')
+
+# Поля кона: end_kon заменяет их новыми объектами, undo возвращает старые
+KON_FIELDS = (
+    'my_cards', 'table_cards', 'my_team_score', 'opponent_score',
+    'current_player', 'kon_number', 'last_kon_opener', 'my_team_opened_last_kon',
+    'my_team_led_in_kon', 'opponents_led_in_kon', 'cards_left', 'played_cards',
+    'last_trick', 'tricks_taken', 'points_in_kon', 'kon_opener',
+)
+
+
+class GameState:
+    """
+    Модель игрового состояния
+
+    Состояние можно собрать с нуля (парсер, симулятор), а можно вести
+    событиями: play_card, close_trick, end_kon. Событие меняет только то,
+    что затронуло (O(1) на ход), производные поля - points_in_kon,
+    tricks_taken, played_cards, last_trick, флаги заходов - считаются по
+    ходу, а каждое событие ложится в history и откатывается undo().
+
+    history хранит события только текущего и прошлого кона: end_kon
+    отбрасывает более старые, чтобы долго работающий бот не копил их.
+    """
+    def __init__(self):
+        self.my_cards = []          # Мои карты
+        self.table_cards = []       # Карты на столе (текущая взятка)
+        self.my_team_score = 0      # Счёт моей команды
+        self.opponent_score = 0     # Счёт соперника
+        self.current_player = None  # Чей ход
+        self.kon_number = 1         # Номер кона
+        self.last_kon_opener = None # Кто открывал прошлый кон
+        self.my_team_opened_last_kon = False  # Наша команда открывала прошлый кон
+        self.my_team_led_in_kon = False       # Наша команда уже заходила в этом коне
+        self.opponents_led_in_kon = False     # Соперники уже заходили в этом коне
+        self.cards_left = {}        # Карт на руках у других: {'left': n, 'top': n, 'right': n}
+        self.tracker = None         # kozel_engine.tracker.CardTracker игрока, если ведётся
+        self.played_cards = []      # Карты прошлых взяток текущего кона
+        self.last_trick = []        # Прошлая взятка кона: [(позиция, карта)] в порядке хода
+        self.tricks_taken = 0       # Взяток взято в коне
+        self.points_in_kon = 0      # Очков набрано в текущем коне
+        self.kon_opener = None      # Кто открыл текущий кон (ведётся событиями)
+        self.history = []           # События для undo: (вид, сохранённые поля, данные)
+
+    # ------------------------------------------------------------------------
+    # События
+    # ------------------------------------------------------------------------
+
+    def _save(self, *names):
+        return {name: getattr(self, name) for name in names}
+
+    def play_card(self, position, card):
+        """
+        Карта card сыграна местом position ('bottom' - нами)
+
+        Наша карта уходит с руки, у остальных уменьшается cards_left
+        (если известно). Первая карта взятки отмечает заход команды.
+        """
+        saved = self._save('current_player', 'my_team_led_in_kon',
+                           'opponents_led_in_kon', 'kon_opener')
+        hand_index = None
+        if position == 'bottom':
+            hand_index = next((i for i, c in enumerate(self.my_cards) if c.index == card.index), None)
+            if hand_index is None:
+                raise ValueError(f"Карты {card} нет на руке")
+            del self.my_cards[hand_index]
+        elif position in self.cards_left:
+            self.cards_left[position] -= 1
+
+        if not self.table_cards:
+            if self.kon_opener is None and not self.played_cards:
+                self.kon_opener = position
+            if position in OUR_POSITIONS:
+                self.my_team_led_in_kon = True
+            else:
+                self.opponents_led_in_kon = True
+        self.table_cards.append((position, card))
+        self.current_player = POSITIONS[(POSITIONS.index(position) + 1) % 4]
+        self.history.append(('play', saved, (position, card, hand_index)))
+
+    def close_trick(self):
+        """
+        Закрыть взятку из 4 карт на столе
+
+        Returns:
+            (позиция взявшего, очки взятки)
+        """
+        if len(self.table_cards) != 4:
+            raise ValueError(f"Во взятке {len(self.table_cards)} карт, нужно 4")
+        saved = self._save('table_cards', 'last_trick', 'current_player',
+                           'tricks_taken', 'points_in_kon')
+        trick = self.table_cards
+        offset, points = resolve_trick(*(card.index for _, card in trick))
+        taker = trick[offset][0]
+        if taker in OUR_POSITIONS:
+            self.tricks_taken += 1
+            self.points_in_kon += points
+        self.played_cards.extend(card for _, card in trick)
+        self.last_trick = trick
+        self.table_cards = []
+        self.current_player = taker
+        self.history.append(('close', saved, len(trick)))
+        return taker, points
+
+    def end_kon(self, my_team_score, opponent_score, hand=(), opener=None):
+        """
+        Кон закончен, начинается следующий
+
+        Args:
+            my_team_score, opponent_score: счёт партии после кона
+            hand: карты новой раздачи
+            opener: кто открывает новый кон (если известно)
+        """
+        saved = self._save(*KON_FIELDS)
+        if self.kon_opener is not None:
+            self.last_kon_opener = self.kon_opener
+            self.my_team_opened_last_kon = self.kon_opener in OUR_POSITIONS
+        self.my_team_score = my_team_score
+        self.opponent_score = opponent_score
+        self.kon_number += 1
+        self.my_cards = list(hand)
+        self.table_cards = []
+        self.played_cards = []
+        self.last_trick = []
+        self.tricks_taken = 0
+        self.points_in_kon = 0
+        self.my_team_led_in_kon = False
+        self.opponents_led_in_kon = False
+        self.kon_opener = None
+        self.current_player = opener
+        self.cards_left = {p: len(self.my_cards) for p in POSITIONS[1:]} if self.my_cards else {}
+        # Откат - не дальше начала закончившегося кона
+        start = next((i for i in range(len(self.history) - 1, -1, -1)
+                      if self.history[i][0] == 'kon'), 0)
+        del self.history[:start]
+        self.history.append(('kon', saved, None))
+
+    def undo(self):
+        """Откатить последнее событие; IndexError - если событий нет"""
+        kind, saved, data = self.history.pop()
+        if kind == 'play':
+            position, card, hand_index = data
+            self.table_cards.pop()
+            if hand_index is not None:
+                self.my_cards.insert(hand_index, card)
+            elif position in self.cards_left:
+                self.cards_left[position] += 1
+        elif kind == 'close':
+            del self.played_cards[-data:]
+        self.__dict__.update(saved)
+
+    def observe_table(self, table_cards):
+        """
+        Догнать снимок стола [(позиция, карта)] событиями
+
+        Новые карты той же взятки - play_card; если на столе была полная
+        взятка, а в снимке другая - сначала close_trick.
+
+        Returns:
+            число применённых событий
+
+        Raises:
+            ValueError: снимок нельзя получить событиями (пропущены карты) -
+                        состояние тогда собирают с нуля
+        """
+        def same(a, b):
+            return a[0] == b[0] and a[1].index == b[1].index
+
+        applied = 0
+        current = self.table_cards
+        if len(table_cards) < len(current) or not all(map(same, current, table_cards)):
+            if len(current) != 4:
+                raise ValueError("Стол не продолжает текущую взятку")
+            self.close_trick()
+            applied += 1
+        for position, card in table_cards[len(self.table_cards):]:
+            self.play_card(position, card)
+            applied += 1
+        return applied
+
+
+class Card:
+    """Модель карты"""
+
+    def __init__(self, rank, suit):
+        self.rank = rank  # '7', '8', '9', '10', 'J', 'Q', 'K', 'A'
+        self.suit = suit  # 'clubs', 'spades', 'hearts', 'diamonds'
+        self.index = card_index(rank, suit)  # бит карты в маске руки
+        
+    def get_points(self):
+        """Очки карты"""
+        return CARD_POINTS[self.index]
+
+    def is_trump(self):
+        """Козырь ли?"""
+        return self.rank in ['J', 'Q'] or self.suit == 'clubs'
+
+    def get_trump_order(self):
+        """
+        Порядок козыря (для сравнения силы)
+        Чем больше - тем старше, -1 для простой карты
+        
+        Порядок по ADR-0002 (от младшего к старшему):
+        8♣, 9♣, K♣, 10♣, A♣, J♦, J♥, J♠, J♣, Q♦, Q♥, Q♠, Q♣, 7♣
+        """
+        return TRUMP_ORDER[self.index]
+
+    def __repr__(self):
+        return f"{self.rank}{self.suit[0].upper()}"
+
+
+# ============================================================================
+# КАРТЫ В ФОРМАТЕ РАСШИРЕНИЯ
+# ============================================================================
+
+# Объекты Card, по одному на карту: и симулятор, и parse_card отдают эти же
+CARDS = tuple(Card(RANKS[i % 8], SUITS[i // 8]) for i in range(NUM_CARDS))
+
+SUIT_NAMES = {
+    'clubs': 'clubs', 'c': 'clubs', '♣': 'clubs',
+    'spades': 'spades', 's': 'spades', '♠': 'spades',
+    'hearts': 'hearts', 'h': 'hearts', '♥': 'hearts',
+    'diamonds': 'diamonds', 'd': 'diamonds', '♦': 'diamonds',
+}
+RANK_NAMES = {
+    '7': '7', '8': '8', '9': '9', '10': '10', 't': '10',
+    'j': 'J', 'jack': 'J', 'q': 'Q', 'queen': 'Q',
+    'k': 'K', 'king': 'K', 'a': 'A', 'ace': 'A',
+}
+CARD_BY_NAME = {(card.rank, card.suit): card for card in CARDS}
+
+
+def parse_card(data):
+    """Card из {rank, suit} или строки "10H" / "Q♣" """
+    if isinstance(data, dict):
+        rank = str(data.get('rank', data.get('val', '')))
+        suit = str(data.get('suit', ''))
+    else:
+        text = str(data).strip()
+        rank, suit = text[:-1], text[-1:]
+    card = CARD_BY_NAME.get((RANK_NAMES.get(rank.lower()), SUIT_NAMES.get(suit.lower())))
+    if card is None:
+        raise ValueError(f"Неизвестная карта: {data!r}")
+    return card
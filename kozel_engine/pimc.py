@@ -0,0 +1,372 @@
+"""
+Оценка ходов методом Монте-Карло с детерминизацией (PIMC)
+
+Чужие руки неизвестны, поэтому ход оценивается по выборкам: скрытые карты
+(все, кроме своей руки, стола и вышедших) раздаются случайно по известному
+числу карт у каждого места (topCards/leftCards/rightCards), каждая раздача
+решается в открытую, очки хода усредняются по раздачам.
+
+Полный кон в открытую решается от секунд до минут, поэтому в каждой
+раздаче после оцениваемого хода взятки доигрываются быстрой жадной
+политикой, пока не останется solve_tricks взяток, а хвост решается точно
+(solver.py). Все ходы одной раздачи доигрываются с одинаковым зерном -
+разница между ходами меньше шумит.
+
+Оценка "в любой момент": выборки идут, пока не истечёт budget_ms; с
+workers > 1 выборки параллельно набирают процессы пула. Пул запускается
+в warm() (его зовёт with и сервер) - старт процессов не входит в бюджет
+хода; без warm() его оплатит первый evaluate, но тоже вне budget_ms.
+
+    with PIMCEvaluator(budget_ms=300, workers=4) as evaluator:
+        ai = KozelAI(evaluator=evaluator)
+        card = ai.choose_card(game_state)
+
+Места в расчёте - относительно игрока: 0 - игрок, 1 - слева, 2 - партнёр,
+3 - справа (как POSITIONS симулятора); команда 0 - команда игрока.
+"""
+
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .cards import (
+    FULL_DECK,
+    NO_CARD,
+    count,
+    hand_mask,
+    iter_cards,
+    legal_moves,
+    mask_to_list,
+)
+from .solver import DoubleDummySolver
+from .tricks import LEAD_CONTEXT, POINTS, STRENGTH, trick_winner
+
+POSITIONS = ('bottom', 'left', 'top', 'right')
+
+DEFAULT_BUDGET_MS = 300
+DEFAULT_SOLVE_TRICKS = 3
+MAX_REJECTIONS = 50   # Попыток раздачи с учётом запретов до жадной раздачи
+
+# Что известно игроку (места относительно игрока):
+# hand - маска своей руки, trick - карты стола в порядке хода,
+# leader - место, зашедшее во взятку, played - маска вышедших карт кона,
+# counts - карт на руках по местам, ban - запреты козырного захода
+# по командам (бит 0 - наша), first_kon - первый кон
+Observation = namedtuple(
+    'Observation', 'hand trick leader played counts ban first_kon'
+)
+
+# Результат оценки: scores - {номер карты: средние очки нашей команды до
+# конца кона после хода}, samples - число раздач, elapsed - секунды
+PIMCResult = namedtuple('PIMCResult', 'best_move scores samples elapsed')
+
+
+# ============================================================================
+# НАБЛЮДЕНИЕ
+# ============================================================================
+
+def observe(game_state):
+    """
+    Observation из GameState игрока, который сейчас ходит
+
+    Число карт у других берётся из game_state.cards_left, а если его нет -
+    выводится из стола (все начинали взятку с одинаковым числом карт).
+
+    Если сыгранные карты не переданы (played_cards пуст, а скрытых карт
+    больше, чем на руках у других), лишние скрытые карты считаются
+    вышедшими из игры: выборка раздаёт другим ровно их число карт, остаток
+    в этом мире - сыгранные карты.
+    """
+    hand = hand_mask(game_state.my_cards)
+    trick = [card.index for _, card in game_state.table_cards]
+    leader = POSITIONS.index(game_state.table_cards[0][0]) if trick else 0
+    played = hand_mask(game_state.played_cards)
+
+    if (leader + len(trick)) % 4 != 0:
+        raise ValueError("Оценивать можно только ход игрока, который сейчас ходит")
+
+    size = count(hand)
+    if game_state.cards_left:
+        counts = (size,) + tuple(
+            game_state.cards_left[POSITIONS[seat]] for seat in (1, 2, 3)
+        )
+    else:
+        # У положивших карту во взятку на одну карту меньше, чем у нас
+        in_trick = {(leader + i) % 4 for i in range(len(trick))}
+        counts = (size,) + tuple(size - (seat in in_trick) for seat in (1, 2, 3))
+
+    first_kon = game_state.kon_number == 1
+    ban = 0
+    if not first_kon:
+        if game_state.my_team_opened_last_kon:
+            ban = 0 if game_state.my_team_led_in_kon else 1
+        else:
+            ban = 0 if game_state.opponents_led_in_kon else 2
+
+    observation = Observation(hand, trick, leader, played, counts, ban, first_kon)
+    unseen = count(_unseen(observation))
+    held = sum(counts[1:])
+    if held > unseen or (held < unseen and game_state.played_cards):
+        raise ValueError(
+            f"Несогласованное число карт: у других {counts[1:]}, скрытых карт {unseen}"
+        )
+    return observation
+
+
+def _unseen(observation):
+    return FULL_DECK & ~(observation.hand | observation.played | _table_mask(observation))
+
+
+def _table_mask(observation):
+    table = 0
+    for card in observation.trick:
+        table |= 1 << card
+    return table
+
+
+def world_played(observation, hands):
+    """Маска сыгранных карт в раздаче hands: всё, чего нет на руках и на столе"""
+    return FULL_DECK & ~(hands[0] | hands[1] | hands[2] | hands[3] | _table_mask(observation))
+
+
+# ============================================================================
+# ВЫБОРКИ
+# ============================================================================
+
+def sample_hands(observation, rng, forbidden=None):
+    """
+    Случайная раздача скрытых карт, согласованная с наблюдением
+
+    Args:
+        observation: Observation
+        rng: random.Random
+        forbidden: необязательные маски карт, которых точно нет у мест
+                   1..3 (например, пропущенные масти), {место: маска}
+
+    Returns:
+        маски рук четырёх мест; если запреты не выполнить - раздача без них
+    """
+    unseen = mask_to_list(_unseen(observation))
+    counts = observation.counts
+    forbidden = forbidden or {}
+
+    for _ in range(MAX_REJECTIONS if forbidden else 1):
+        rng.shuffle(unseen)
+        hands = [observation.hand, 0, 0, 0]
+        pos = 0
+        for seat in (1, 2, 3):
+            for card in unseen[pos:pos + counts[seat]]:
+                hands[seat] |= 1 << card
+            pos += counts[seat]
+        if all(not hands[seat] & mask for seat, mask in forbidden.items()):
+            return hands
+
+    # Жадно: сначала места с самым узким выбором
+    left = _unseen(observation)
+    hands = [observation.hand, 0, 0, 0]
+    seats = sorted((1, 2, 3), key=lambda s: count(left & ~forbidden.get(s, 0)))
+    for seat in seats:
+        allowed = mask_to_list(left & ~forbidden.get(seat, 0))
+        if len(allowed) < counts[seat]:
+            return sample_hands(observation, rng)
+        for card in rng.sample(allowed, counts[seat]):
+            hands[seat] |= 1 << card
+            left ^= 1 << card
+    return hands
+
+
+def _rollout_card(solver, rng):
+    # Жадная политика доигрыша: партнёру отдаём очки, соперника перебиваем
+    # самой слабой картой, иначе сбрасываем самую дешёвую; заход случайный
+    cards = mask_to_list(solver.legal_mask())
+    trick = solver.trick
+    if len(cards) == 1:
+        return cards[0]
+    if not trick:
+        return rng.choice(cards)
+    context = LEAD_CONTEXT[trick[0]] * 32
+    offset, winner = trick_winner(trick)
+    if ((solver.leader + offset) ^ solver.to_move) & 1 == 0:
+        return max(cards, key=lambda c: (POINTS[c], -STRENGTH[context + c]))
+    win_strength = STRENGTH[context + winner]
+    beating = [c for c in cards if STRENGTH[context + c] > win_strength]
+    if beating:
+        return min(beating, key=lambda c: STRENGTH[context + c])
+    return min(cards, key=lambda c: (POINTS[c], STRENGTH[context + c]))
+
+
+def _playout(solver, rng, solve_tricks):
+    """Доиграть позицию решателя: жадно до хвоста, хвост точно; очки команды 0"""
+    made = []
+    value = 0
+    while solver.trick or count(solver.hands[solver.leader]) > solve_tricks:
+        card = _rollout_card(solver, rng)
+        gained, terminal = solver.make(card)
+        made.append(card)
+        if terminal is not None:
+            value += terminal
+            break
+        value += gained
+    else:
+        value += solver.value()
+    for card in reversed(made):
+        solver.unmake(card)
+    return value
+
+
+def run_samples(observation, moves, deadline, seed, solve_tricks=DEFAULT_SOLVE_TRICKS,
+                max_samples=None, forbidden=None):
+    """
+    Набирать выборки до deadline (time.time()), минимум одну
+
+    Returns:
+        (суммы очков нашей команды по ходам moves, число выборок)
+    """
+    rng = random.Random(seed)
+    solver = DoubleDummySolver()
+    totals = [0] * len(moves)
+    samples = 0
+    started = time.time()
+    while True:
+        hands = sample_hands(observation, rng, forbidden)
+        solver.load(
+            hands, observation.leader, observation.trick,
+            banned=(observation.ban & 1, observation.ban >> 1 & 1),
+            first_kon=observation.first_kon, played=world_played(observation, hands)
+        )
+        playout_seed = rng.getrandbits(32)
+        for i, card in enumerate(moves):
+            gained, terminal = solver.make(card)
+            if terminal is not None:
+                totals[i] += terminal
+            else:
+                totals[i] += gained + _playout(solver, random.Random(playout_seed), solve_tricks)
+            solver.unmake(card)
+        samples += 1
+        # Таблица транспозиций от другой раздачи бесполезна
+        solver.clear()
+
+        if max_samples is not None and samples >= max_samples:
+            break
+        now = time.time()
+        # Не начинать выборку, которая не успеет закончиться
+        if now + (now - started) / samples > deadline:
+            break
+    return totals, samples
+
+
+def _run_samples_task(task):
+    return run_samples(*task)
+
+
+def _warm_worker():
+    # Процесс пула поднят и импортировал модуль
+    return os.getpid()
+
+
+# ============================================================================
+# ОЦЕНЩИК
+# ============================================================================
+
+class PIMCEvaluator:
+    """
+    Оценщик ходов с бюджетом времени
+
+    Args:
+        budget_ms: ограничение времени на один ход
+        workers: процессов для выборок (1 - в текущем процессе)
+        solve_tricks: со скольких оставшихся взяток решать точно
+        max_samples: потолок выборок на процесс (для воспроизводимых тестов)
+        seed: зерно выборок
+    """
+
+    def __init__(self, budget_ms=DEFAULT_BUDGET_MS, workers=1,
+                 solve_tricks=DEFAULT_SOLVE_TRICKS, max_samples=None, seed=None):
+        if budget_ms <= 0:
+            raise ValueError(f"budget_ms должен быть > 0, получено {budget_ms}")
+        self.budget_ms = budget_ms
+        self.workers = workers or os.cpu_count()
+        self.solve_tricks = solve_tricks
+        self.max_samples = max_samples
+        self.rng = random.Random(seed)
+        self._pool = None
+
+    def __enter__(self):
+        return self.warm()
+
+    def warm(self):
+        """Запустить процессы пула заранее, чтобы первый ход не ждал их старта"""
+        if self.workers > 1 and self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            # Одновременные задачи поднимают все процессы пула
+            futures = [self._pool.submit(_warm_worker) for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Остановить пул процессов"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def evaluate(self, game_state, legal_cards=None, forbidden=None):
+        """
+        Оценить легальные ходы игрока
+
+        Args:
+            game_state: GameState игрока, который сейчас ходит
+            legal_cards: легальные карты (по умолчанию - по правилам захода)
+            forbidden: {место: маска} карт, которых точно нет у мест 1..3
+
+        Returns:
+            PIMCResult
+        """
+        self.warm()
+        start = time.time()
+        observation = observe(game_state)
+        if forbidden is None and game_state.tracker is not None:
+            forbidden = game_state.tracker.forbidden()
+        if legal_cards is not None:
+            moves = [card.index for card in legal_cards]
+        else:
+            lead = observation.trick[0] if observation.trick else NO_CARD
+            no_trump_lead = observation.first_kon or bool(observation.ban & 1)
+            moves = list(iter_cards(legal_moves(observation.hand, lead, no_trump_lead)))
+        if not moves:
+            raise ValueError("Нет легальных ходов")
+
+        if len(moves) == 1:
+            return PIMCResult(moves[0], {moves[0]: 0.0}, 0, time.time() - start)
+
+        deadline = start + self.budget_ms / 1000
+        seeds = [self.rng.getrandbits(64) for _ in range(self.workers)]
+        tasks = [
+            (observation, moves, deadline, seed, self.solve_tricks,
+             self.max_samples, forbidden)
+            for seed in seeds
+        ]
+        if self.workers == 1:
+            results = [run_samples(*tasks[0])]
+        else:
+            results = list(self._pool.map(_run_samples_task, tasks))
+
+        totals = [0] * len(moves)
+        samples = 0
+        for worker_totals, worker_samples in results:
+            samples += worker_samples
+            for i, total in enumerate(worker_totals):
+                totals[i] += total
+        scores = {card: totals[i] / samples for i, card in enumerate(moves)}
+        best_move = max(moves, key=scores.__getitem__)
+        return PIMCResult(best_move, scores, samples, time.time() - start)
+
+    def choose_card(self, game_state, legal_cards=None):
+        """Лучшая карта (объект Card из руки) - для KozelAI(evaluator=...)"""
+        result = self.evaluate(game_state, legal_cards)
+        return next(card for card in game_state.my_cards if card.index == result.best_move)
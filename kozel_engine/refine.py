@@ -0,0 +1,219 @@
+"""
+Уточнение рекомендаций языковой моделью в пределах дедлайна
+
+Ответ всегда даёт быстрый локальный движок (server.py). Языковая модель -
+второй, медленный уровень: она запускается, только если до дедлайна
+запроса осталось не меньше min_budget_ms, и её ответ заменяет локальный,
+если успел к дедлайну и назвал легальную карту. Не успевший запрос не
+отменяется: он доигрывается в фоне, и ответ попадает в память уточнений
+по каноническому ключу состояния (server.state_key) - расширение
+спрашивает одно и то же состояние несколько раз, и следующий опрос
+получит уточнённый ход сразу.
+
+Правила читаются с диска один раз, статическая часть промпта (роль,
+правила, формат ответа) собирается при создании Refiner и уходит
+системным блоком с cache_control - в запросе меняется только описание
+позиции.
+
+Клиент - Messages API через urllib, без SDK; url можно направить на
+локальную заглушку (так устроены тесты).
+
+    refiner = Refiner(ModelClient(api_key=os.environ['ANTHROPIC_API_KEY']))
+    server = RecommendServer('kozelai', refiner=refiner, deadline_ms=800)
+"""
+
+import asyncio
+import functools
+import json
+import os
+import re
+import urllib.request
+from collections import OrderedDict
+from pathlib import Path
+
+from kozel_bot_architecture import KozelAI
+
+from .model import parse_card
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent / 'правила игры и гайд'
+DEFAULT_API_URL = 'https://api.anthropic.com/v1/messages'
+DEFAULT_MODEL = 'claude-sonnet-4-20250514'
+API_VERSION = '2023-06-01'
+DEFAULT_MAX_TOKENS = 300
+DEFAULT_TIMEOUT = 20.0
+MIN_BUDGET_MS = 150
+DEFAULT_MEMO_SIZE = 4096
+
+PROMPT_PREFIX = """Ты эксперт в игре "Козёл". Тебе дают позицию и ход, который предложил
+быстрый локальный движок. Проверь его и, если есть ход лучше, предложи его.
+
+Правила игры:
+{rules}
+
+Ответь только JSON: {{"card": "<карта>", "reasoning": "<кратко почему>"}}
+Карта записывается рангом и первой буквой масти: 7C, 10H, QS, AD."""
+
+JSON_OBJECT = re.compile(r'\{.*\}', re.S)
+
+
+def build_prompt_prefix(rules_text):
+    """Статическая часть промпта: одна на всё время работы сервера"""
+    return PROMPT_PREFIX.format(rules=rules_text.strip())
+
+
+def describe_state(state, local):
+    """Переменная часть промпта: позиция и ход локального движка"""
+    table = ', '.join(f"{position}: {card!r}" for position, card in state.table_cards)
+    card = local['card']
+    return (
+        f"Мои карты: {' '.join(repr(c) for c in state.my_cards)}\n"
+        f"Стол: {table or 'пусто (мой заход)'}\n"
+        f"Вышли в этом коне: {' '.join(repr(c) for c in state.played_cards) or 'нет'}\n"
+        f"Кон {state.kon_number}, очков в коне: {state.points_in_kon}\n"
+        f"Счёт: {state.my_team_score} - {state.opponent_score}\n"
+        f"Локальный движок: {card['rank']}{card['suit'][0].upper()} "
+        f"({local.get('reasoning', '')})"
+    )
+
+
+def parse_answer(text, legal_cards):
+    """
+    Карта и объяснение из ответа модели
+
+    Raises:
+        ValueError: в ответе нет JSON или карта не из legal_cards
+    """
+    match = JSON_OBJECT.search(text)
+    if match is None:
+        raise ValueError(f"В ответе модели нет JSON: {text[:80]!r}")
+    answer = json.loads(match.group(0))
+    card = parse_card(answer.get('card', ''))
+    if all(card.index != c.index for c in legal_cards):
+        raise ValueError(f"Модель предложила нелегальную карту {card!r}")
+    return card, str(answer.get('reasoning', ''))
+
+
+# ============================================================================
+# КЛИЕНТ
+# ============================================================================
+
+class ModelClient:
+    """
+    Синхронный клиент Messages API (один запрос - один вызов complete)
+
+    Args:
+        api_key: ключ API (по умолчанию ANTHROPIC_API_KEY)
+        url: адрес /v1/messages (или локальной заглушки)
+        model: имя модели
+        max_tokens: потолок длины ответа
+        timeout: таймаут сокета, с - фоновое уточнение дольше не живёт
+    """
+
+    def __init__(self, api_key=None, url=DEFAULT_API_URL, model=DEFAULT_MODEL,
+                 max_tokens=DEFAULT_MAX_TOKENS, timeout=DEFAULT_TIMEOUT):
+        self.api_key = api_key if api_key is not None else os.environ.get('ANTHROPIC_API_KEY', '')
+        self.url = url
+        self.model = model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+
+    def complete(self, system, prompt):
+        """Текст ответа модели на prompt с системным блоком system"""
+        body = {
+            'model': self.model,
+            'max_tokens': self.max_tokens,
+            # Системный блок одинаков во всех запросах - кэшируется на стороне API
+            'system': [{'type': 'text', 'text': system,
+                        'cache_control': {'type': 'ephemeral'}}],
+            'messages': [{'role': 'user', 'content': prompt}],
+        }
+        request = urllib.request.Request(
+            self.url, data=json.dumps(body).encode(), method='POST',
+            headers={'content-type': 'application/json', 'x-api-key': self.api_key,
+                     'anthropic-version': API_VERSION},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read())
+        return ''.join(block.get('text', '') for block in data.get('content', [])
+                       if block.get('type') == 'text')
+
+
+# ============================================================================
+# УТОЧНЕНИЕ
+# ============================================================================
+
+class Refiner:
+    """
+    Второй уровень рекомендаций: модель с памятью ответов
+
+    Args:
+        client: объект с complete(system, prompt) -> текст (ModelClient)
+        rules_path: файл правил (читается один раз)
+        min_budget_ms: меньше этого до дедлайна - модель не спрашивается
+        memo_size: уточнённых ответов в LRU
+    """
+
+    def __init__(self, client, rules_path=DEFAULT_RULES_PATH, min_budget_ms=MIN_BUDGET_MS,
+                 memo_size=DEFAULT_MEMO_SIZE):
+        self.client = client
+        self.min_budget_ms = min_budget_ms
+        self.memo_size = memo_size
+        self.prefix = build_prompt_prefix(Path(rules_path).read_text(encoding='utf-8'))
+        self.memo = OrderedDict()
+        self.in_flight = {}
+        self.counters = {'refine_hits': 0, 'refined': 0, 'refine_late': 0,
+                         'refine_skipped': 0, 'refine_rejected': 0, 'refine_errors': 0}
+        self._rules = KozelAI()
+
+    async def refine(self, key, state, local, timeout):
+        """
+        Уточнённый ответ {card, reasoning} или None (остаётся локальный)
+
+        Args:
+            key: канонический ключ состояния (server.state_key)
+            state: GameState
+            local: ответ локального движка
+            timeout: сколько секунд осталось до дедлайна запроса
+        """
+        refined = self.memo.get(key)
+        if refined is not None:
+            self.memo.move_to_end(key)
+            self.counters['refine_hits'] += 1
+            return refined
+
+        task = self.in_flight.get(key)
+        if task is None:
+            if timeout * 1000 < self.min_budget_ms:
+                self.counters['refine_skipped'] += 1
+                return None
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(None, self._ask, state, local)
+            self.in_flight[key] = task
+            task.add_done_callback(functools.partial(self._answered, key))
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), max(timeout, 0))
+        except asyncio.TimeoutError:
+            # Ответ доберётся в фоне и пригодится следующему опросу
+            self.counters['refine_late'] += 1
+            return None
+        except Exception:
+            return None
+
+    def _ask(self, state, local):
+        text = self.client.complete(self.prefix, describe_state(state, local))
+        card, reasoning = parse_answer(text, self._rules._get_legal_cards(state))
+        return {'card': {'rank': card.rank, 'suit': card.suit}, 'reasoning': reasoning}
+
+    def _answered(self, key, task):
+        del self.in_flight[key]
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self.counters['refine_rejected' if isinstance(exc, ValueError)
+                          else 'refine_errors'] += 1
+            return
+        self.counters['refined'] += 1
+        self.memo[key] = task.result()
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
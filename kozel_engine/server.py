@@ -0,0 +1,436 @@
+"""
+Асинхронный бэкенд рекомендаций для расширения
+
+Расширение опрашивает POST /recommend, пока состояние игры не меняется,
+поэтому сервер:
+- принимает запросы в asyncio (без Flask, только стандартная библиотека)
+- считает рекомендацию в пуле процессов, не блокируя приём запросов
+- склеивает одинаковые запросы "в полёте": пока состояние считается,
+  повторные запросы ждут тот же результат
+- кэширует ответы в LRU по каноническому хешу состояния
+- с --refine спрашивает языковую модель (refine.py), если до дедлайна
+  запроса остаётся время; локальный ответ не ждёт модель дольше дедлайна
+
+    python -m kozel_engine.server --port 5000 --engine pimc --budget-ms 300
+    python -m kozel_engine.server --refine --deadline-ms 800
+
+POST /recommend  {"gameState": {...}}  ->  {"card": {"rank", "suit"}, "reasoning", "cached", "tier"}
+GET  /stats      счётчики, попадания в кэш, задержки p50/p99
+GET  /metrics    стратегии и фазы choose_card в формате Prometheus (--metrics)
+GET  /health     {"ok": true}
+
+Формат gameState - как у kozel-assistant/inject.js: myCards и tableCards
+(объекты {rank, suit} или строки вида "10H"; у карт стола можно указать
+position), konNumber, myScore/opponentScore (или teams), pointsInKon,
+playedCards, topCards/leftCards/rightCards. Расширение не шлёт playedCards:
+тогда поиск (pimc, ismcts) считает ранее сыгранные карты неизвестными -
+скрытые карты сверх числа карт у других вышли из игры.
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from kozel_bot_architecture import KozelAI
+
+from .metrics import DecisionMetrics
+from .model import GameState, parse_card
+from .simulator import POSITIONS
+
+DEFAULT_PORT = 5000
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_BUDGET_MS = 300
+DEFAULT_DEADLINE_MS = 800
+MAX_BODY = 1 << 20
+LATENCY_WINDOW = 2048
+
+ENGINES = ('kozelai', 'pimc', 'ismcts')
+
+
+# ============================================================================
+# СОСТОЯНИЕ ИГРЫ ИЗ JSON
+# ============================================================================
+
+def parse_game_state(data):
+    """
+    GameState из gameState расширения
+
+    Карты стола без position раздаются по порядку хода: последняя карта -
+    от соседа справа (мы ходим следующими).
+    """
+    if not isinstance(data, dict):
+        raise ValueError("gameState должен быть объектом")
+    state = GameState()
+    state.my_cards = [parse_card(c) for c in data.get('myCards', [])]
+    if not state.my_cards:
+        raise ValueError("Нет карт на руке")
+
+    table = data.get('tableCards', [])
+    state.table_cards = []
+    for i, item in enumerate(table):
+        position = item.get('position') if isinstance(item, dict) else None
+        if position is None:
+            position = POSITIONS[(i - len(table)) % 4]
+        elif position not in POSITIONS:
+            raise ValueError(f"Неизвестная позиция: {position!r}")
+        state.table_cards.append((position, parse_card(item)))
+
+    teams = data.get('teams') or {}
+    state.my_team_score = int(data.get('myScore', teams.get('myGames', 0)))
+    state.opponent_score = int(data.get('opponentScore', teams.get('opponentGames', 0)))
+    state.kon_number = int(data.get('konNumber', 1))
+    state.points_in_kon = int(data.get('pointsInKon', teams.get('myScore', 0)))
+    state.current_player = 'bottom'
+    state.played_cards = [parse_card(c) for c in data.get('playedCards', [])]
+    state.my_team_opened_last_kon = bool(data.get('myTeamOpenedLastKon', False))
+    state.my_team_led_in_kon = bool(data.get('myTeamLedInKon', False))
+    state.opponents_led_in_kon = bool(data.get('opponentsLedInKon', False))
+    counts = {position: data.get(f'{position}Cards') for position in ('left', 'top', 'right')}
+    if all(isinstance(n, int) for n in counts.values()):
+        state.cards_left = counts
+    return state
+
+
+def state_key(state):
+    """Канонический хеш состояния: порядок карт на руке не важен, порядок стола - важен"""
+    canonical = (
+        sorted(card.index for card in state.my_cards),
+        [(position, card.index) for position, card in state.table_cards],
+        sorted(card.index for card in state.played_cards),
+        sorted(state.cards_left.items()),
+        state.kon_number, state.my_team_score, state.opponent_score,
+        state.points_in_kon, state.my_team_opened_last_kon,
+        state.my_team_led_in_kon, state.opponents_led_in_kon,
+    )
+    return hashlib.blake2b(json.dumps(canonical).encode(), digest_size=16).hexdigest()
+
+
+# ============================================================================
+# ВОРКЕРЫ
+# ============================================================================
+
+_engine = None
+
+
+def make_engine(name, budget_ms=DEFAULT_BUDGET_MS, metrics=False):
+    """KozelAI с выбранным поиском (metrics - с замерами choose_card)"""
+    metrics = DecisionMetrics() if metrics else None
+    if name == 'pimc':
+        from .pimc import PIMCEvaluator
+        return KozelAI(evaluator=PIMCEvaluator(budget_ms=budget_ms).warm(), metrics=metrics)
+    if name == 'ismcts':
+        from .ismcts import ISMCTSEngine
+        return KozelAI(evaluator=ISMCTSEngine(time_ms=budget_ms), metrics=metrics)
+    if name == 'kozelai':
+        return KozelAI(metrics=metrics)
+    raise ValueError(f"Неизвестный движок {name!r}, есть: {', '.join(ENGINES)}")
+
+
+def _init_worker(name, budget_ms, metrics):
+    global _engine
+    _engine = make_engine(name, budget_ms, metrics)
+
+
+def recommend(data, engine=None):
+    """Рекомендация для gameState (в процессе пула - движком воркера)"""
+    engine = engine or _engine
+    state = parse_game_state(data)
+    card = engine.choose_card(state)
+    # Стратегию выбрал сам choose_card - повторно ситуацию не разбираем
+    if engine.last_strategy == 'evaluator':
+        reasoning = f"{type(engine.evaluator).__name__}: лучший ход по оценке поиска"
+    elif engine.last_strategy == 'forced':
+        reasoning = "Единственный легальный ход"
+    else:
+        reasoning = f"Стратегия: {engine.last_strategy}"
+    result = {'card': {'rank': card.rank, 'suit': card.suit}, 'reasoning': reasoning}
+    if engine.metrics is not None:
+        # Замеры воркера уезжают с ответом и складываются в сервере
+        result['metrics'] = engine.metrics.drain()
+    return result
+
+
+# ============================================================================
+# СЕРВЕР
+# ============================================================================
+
+class RecommendServer:
+    """
+    HTTP-сервер рекомендаций на asyncio
+
+    Args:
+        engine: 'kozelai', 'pimc' или 'ismcts'
+        budget_ms: бюджет поиска на ход (pimc, ismcts)
+        workers: процессов пула (0 - поток в текущем процессе)
+        cache_size: ответов в LRU
+        refiner: refine.Refiner - уточнение ответа моделью (необязательно)
+        deadline_ms: дедлайн запроса с уточнением, от прихода запроса
+        metrics: замерять стратегии и фазы choose_card (GET /metrics)
+    """
+
+    def __init__(self, engine='kozelai', budget_ms=DEFAULT_BUDGET_MS, workers=None,
+                 cache_size=DEFAULT_CACHE_SIZE, refiner=None, deadline_ms=DEFAULT_DEADLINE_MS,
+                 metrics=False):
+        if engine not in ENGINES:
+            raise ValueError(f"Неизвестный движок {engine!r}, есть: {', '.join(ENGINES)}")
+        self.engine = engine
+        self.budget_ms = budget_ms
+        self.workers = os.cpu_count() if workers is None else workers
+        self.cache_size = cache_size
+        self.refiner = refiner
+        self.deadline_ms = deadline_ms
+        self.metrics = DecisionMetrics() if metrics else None
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {'requests': 0, 'cache_hits': 0, 'coalesced': 0,
+                         'computed': 0, 'errors': 0}
+        self._pool = None
+        self._local_engine = None
+        self._server = None
+        self.port = None
+
+    # ------------------------------------------------------------------------
+    # Рекомендации
+    # ------------------------------------------------------------------------
+
+    async def recommend(self, data):
+        """Рекомендация: локальный движок, затем уточнение, если есть время"""
+        start = time.perf_counter()
+        self.counters['requests'] += 1
+        state = parse_game_state(data)
+        key = state_key(state)
+        result = await self._local(key, data)
+        if self.refiner is None:
+            return dict(result, tier='local')
+        timeout = self.deadline_ms / 1000 - (time.perf_counter() - start)
+        refined = await self.refiner.refine(key, state, result, timeout)
+        if refined is None:
+            return dict(result, tier='local')
+        return dict(result, **refined, tier='refined')
+
+    async def _local(self, key, data):
+        """Ответ локального движка с кэшем и склейкой одинаковых запросов"""
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return dict(cached, cached=True)
+
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.counters['coalesced'] += 1
+            return dict(await asyncio.shield(task), cached=True)
+
+        # Расчёт - отдельная задача: отключение первого клиента не отменяет
+        # его для склеенных запросов
+        task = asyncio.ensure_future(self._compute(data))
+        self.in_flight[key] = task
+        task.add_done_callback(functools.partial(self._computed, key))
+        return dict(await asyncio.shield(task), cached=False)
+
+    def _computed(self, key, task):
+        del self.in_flight[key]
+        # exception() забирает исключение задачи, даже если его никто не ждёт
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.counters['computed'] += 1
+        self.cache[key] = task.result()
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _start_pool(self):
+        # spawn, а не fork: форк процесса с работающим циклом событий и
+        # потоками пула может унести в воркер захваченную блокировку
+        if self.workers and self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.engine, self.budget_ms, self.metrics is not None),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+
+    async def _compute(self, data):
+        loop = asyncio.get_running_loop()
+        if self.workers:
+            self._start_pool()
+            try:
+                result = await loop.run_in_executor(self._pool, recommend, data)
+            except BrokenProcessPool:
+                # Упавший воркер ломает весь пул - следующий запрос создаст новый
+                self._pool = None
+                raise
+        else:
+            if self._local_engine is None:
+                self._local_engine = make_engine(self.engine, self.budget_ms,
+                                                 self.metrics is not None)
+            result = await loop.run_in_executor(None, recommend, data, self._local_engine)
+        metrics = result.pop('metrics', None)
+        if metrics is not None:
+            self.metrics.merge(metrics)
+        return result
+
+    def stats(self):
+        """Счётчики и задержки (мс) последних запросов"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        counters = dict(self.counters)
+        if self.refiner is not None:
+            counters.update(self.refiner.counters, refine_memo=len(self.refiner.memo))
+        return dict(
+            counters,
+            cache_size=len(self.cache),
+            in_flight=len(self.in_flight),
+            p50_ms=percentile(0.50),
+            p99_ms=percentile(0.99),
+        )
+
+    # ------------------------------------------------------------------------
+    # HTTP
+    # ------------------------------------------------------------------------
+
+    async def _route(self, method, path, body):
+        if method == 'OPTIONS':
+            return 204, None
+        if method == 'GET' and path == '/health':
+            return 200, {'ok': True}
+        if method == 'GET' and path == '/stats':
+            return 200, self.stats()
+        if method == 'GET' and path == '/metrics' and self.metrics is not None:
+            return 200, self.metrics.snapshot()
+        if method == 'POST' and path == '/recommend':
+            start = time.perf_counter()
+            try:
+                data = json.loads(body or b'{}')
+                result = await self.recommend(data.get('gameState', data))
+            except (ValueError, KeyError, TypeError, AttributeError) as exc:
+                self.counters['errors'] += 1
+                return 400, {'error': str(exc)}
+            except Exception as exc:
+                # Ошибка движка или пула: клиент получает ответ, сервер работает дальше
+                self.counters['errors'] += 1
+                return 500, {'error': f"{type(exc).__name__}: {exc}"}
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            return 200, result
+        return 404, {'error': f"Нет маршрута {method} {path}"}
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, path, _ = line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    self._respond(writer, 413, {'error': "Слишком большой запрос"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, payload = await self._route(method, path.split('?')[0], body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _respond(writer, status, payload, keep_alive):
+        # Строка - текст как есть (/metrics), остальное - JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body = b'' if payload is None else json.dumps(payload, ensure_ascii=False).encode()
+            content_type = 'application/json'
+        reason = {200: 'OK', 204: 'No Content', 400: 'Bad Request',
+                  404: 'Not Found', 413: 'Payload Too Large',
+                  500: 'Internal Server Error'}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            # Расширение ходит с другого origin
+            "Access-Control-Allow-Origin: *\r\n"
+            "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+            "Access-Control-Allow-Headers: Content-Type\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n".encode('latin-1') + body
+        )
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """Начать приём запросов (port=0 - свободный порт, см. self.port)"""
+        self._start_pool()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self, host='127.0.0.1', port=DEFAULT_PORT):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бэкенд рекомендаций для расширения")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--engine', choices=ENGINES, default='kozelai')
+    parser.add_argument('--budget-ms', type=int, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    parser.add_argument('--metrics', action='store_true',
+                        help="замеры стратегий choose_card на GET /metrics")
+    parser.add_argument('--refine', action='store_true',
+                        help="уточнять ответ моделью (ключ в ANTHROPIC_API_KEY)")
+    parser.add_argument('--deadline-ms', type=int, default=DEFAULT_DEADLINE_MS)
+    parser.add_argument('--api-url', default=None, help="адрес /v1/messages")
+    parser.add_argument('--model', default=None)
+    args = parser.parse_args(argv)
+
+    refiner = None
+    if args.refine:
+        from .refine import DEFAULT_API_URL, DEFAULT_MODEL, ModelClient, Refiner
+        refiner = Refiner(ModelClient(url=args.api_url or DEFAULT_API_URL,
+                                      model=args.model or DEFAULT_MODEL))
+    server = RecommendServer(args.engine, args.budget_ms, args.workers, args.cache_size,
+                             refiner, args.deadline_ms, args.metrics)
+    print(f"Рекомендации: http://{args.host}:{args.port}/recommend ({args.engine})")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
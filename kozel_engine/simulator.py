@@ -0,0 +1,347 @@
+"""
+Безголовый симулятор партии Козла
+
+Раздаёт карты, ведёт взятки на 4 места и считает партию по правилам
+из гайда, без браузера и Selenium:
+- 8 карт каждому, первый кон открывает владелец туза бубен,
+  дальше открывает следующий по часовой стрелке
+- в первом кону заходить козырем нельзя никому; в следующих конах
+  команда, открывавшая прошлый кон, не заходит козырем своим первым заходом
+- поимка дамы: Q♣ и 7♣ в одной взятке от разных команд - кон заканчивается,
+  команда с 7♣ выигрывает кон, сопернику открываются две пары [по умолчанию]
+- >60 - пара сопернику, >90 - две пары, все взятки - шестерых (12 очков),
+  60:60 - "яйца", лишняя пара победителю следующего кона
+- партия до 12 открытых очков у одной из команд
+
+"Отойтись от козырей" не моделируется.
+
+Места 0..3 по часовой стрелке, команды: места 0, 2 и места 1, 3.
+
+Политика места - любой объект с choose_card(game_state) (например KozelAI):
+ей передаётся GameState с точки зрения места. Быстрые политики вместо этого
+реализуют choose_index(sim, seat, legal) и работают прямо с масками.
+"""
+
+import random
+from collections import namedtuple
+
+from .cards import (
+    ACE_DIAMONDS,
+    CARD_INDEX,
+    FOLLOW_MASK,
+    NUM_CARDS,
+    QUEEN_CLUBS,
+    SEVEN_CLUBS,
+    SIMPLE_MASK,
+    card_name,
+    count,
+    iter_cards,
+    mask_to_list,
+)
+from .model import CARDS, GameState
+from .tracker import CardTracker
+from .tricks import resolve_trick
+
+# Позиции других мест относительно игрока, по часовой стрелке
+POSITIONS = ('bottom', 'left', 'top', 'right')
+
+CARDS_PER_HAND = 8
+TRICKS_PER_KON = 8
+PAIR = 2              # Открытая пара - 2 очка
+CATCH_PENALTY = 2 * PAIR  # Поимка дамы: "4 очка к результату кона" - две пары сопернику
+LOSING_SCORE = 12     # Команда с 12+ открытыми очками проигрывает партию
+MAX_KONS = 200        # Страховка от бесконечной цепочки "яиц"
+
+# Один кон:
+# points/tricks - по командам, winner - команда или None ("яйца"),
+# penalty - очки, открытые проигравшей команде, caught - команда, поймавшая даму
+KonResult = namedtuple(
+    'KonResult', 'kon_number opener points tricks winner penalty caught'
+)
+
+# Партия: winner - команда-победитель, score - открытые очки по командам
+GameResult = namedtuple('GameResult', 'winner score kons')
+
+def game_rng(seed, index):
+    """Независимый воспроизводимый поток случайных чисел для партии index"""
+    return random.Random(f"{seed}:{index}")
+
+
+class RandomPolicy:
+    """Случайный легальный ход (через ГСЧ симулятора - партии воспроизводимы)"""
+
+    def choose_index(self, sim, seat, legal):
+        return sim.rng.choice(mask_to_list(legal))
+
+
+class KozelSimulator:
+    """
+    Партия Козла на 4 места
+
+    Пошаговый API:
+        sim = KozelSimulator([KozelAI(), RandomPolicy(), KozelAI(), RandomPolicy()])
+        while not sim.game_over:
+            legal = sim.legal_mask()     # маска легальных ходов места sim.to_move
+            result = sim.step(card)      # KonResult, если кон закончился
+
+    Или целиком: sim.play_game() / play_n_games(...)
+    """
+
+    def __init__(self, policies, rng=None, track_cards=False):
+        if len(policies) != 4:
+            raise ValueError(f"Нужно 4 политики, получено {len(policies)}")
+        self.policies = list(policies)
+        # Учёт карт каждого места (GameState.tracker) - по запросу, он стоит времени
+        self.trackers = [CardTracker() for _ in range(4)] if track_cards else None
+        self._choosers = [self._make_chooser(p) for p in self.policies]
+        self.reset(rng)
+
+    def _make_chooser(self, policy):
+        choose_index = getattr(policy, 'choose_index', None)
+        if choose_index is not None:
+            return choose_index
+
+        def choose_by_card(sim, seat, legal):
+            card = policy.choose_card(sim.game_state(seat))
+            return CARD_INDEX[(card.rank, card.suit)]
+
+        return choose_by_card
+
+    # ------------------------------------------------------------------------
+    # Партия и кон
+    # ------------------------------------------------------------------------
+
+    def reset(self, rng=None):
+        """Начать новую партию"""
+        if rng is not None:
+            self.rng = rng
+        elif not hasattr(self, 'rng'):
+            self.rng = random.Random()
+        self.score = [0, 0]
+        self.eggs = 0
+        self.kons = []
+        self.kon_number = 0
+        self.opener = None
+        self.prev_opener = None
+        self.winner = None
+        self._start_kon()
+
+    @property
+    def game_over(self):
+        return self.winner is not None
+
+    def _start_kon(self):
+        deck = list(range(NUM_CARDS))
+        self.rng.shuffle(deck)
+        self.hands = [0, 0, 0, 0]
+        for seat in range(4):
+            for card in deck[seat * CARDS_PER_HAND:(seat + 1) * CARDS_PER_HAND]:
+                self.hands[seat] |= 1 << card
+
+        self.kon_number += 1
+        if self.kon_number == 1:
+            # Первый кон открывает владелец туза бубен, козырять нельзя никому
+            self.opener = next(s for s in range(4) if self.hands[s] >> ACE_DIAMONDS & 1)
+            self.banned = [True, True]
+        else:
+            # Открывает следующий по часовой; команде прошлого открывающего
+            # нельзя заходить козырем до её первого захода
+            self.prev_opener = self.opener
+            self.opener = (self.opener + 1) % 4
+            self.banned = [False, False]
+            self.banned[self.prev_opener & 1] = True
+
+        self.leader = self.opener
+        self.to_move = self.opener
+        self.trick = []
+        self.last_trick = None
+        if self.trackers is not None:
+            for seat, tracker in enumerate(self.trackers):
+                team = seat & 1
+                tracker.new_kon(
+                    self.hands[seat], (self.opener - seat) % 4,
+                    banned=(self.banned[team], self.banned[1 - team]),
+                    first_kon=self.kon_number == 1
+                )
+        self.points = [0, 0]
+        self.tricks = [0, 0]
+        self.played = 0
+        self.team_led = [False, False]
+
+    def legal_mask(self):
+        """Маска легальных ходов места, которое сейчас ходит"""
+        hand = self.hands[self.to_move]
+        if not self.trick:
+            if self.banned[self.to_move & 1]:
+                return hand & SIMPLE_MASK or hand
+            return hand
+        return hand & FOLLOW_MASK[self.trick[0]] or hand
+
+    def step(self, card):
+        """
+        Сыграть карту за место self.to_move
+
+        Последняя закрытая взятка - self.last_trick = (заходивший, карты).
+
+        Returns:
+            KonResult, если кон закончился, иначе None
+        """
+        seat = self.to_move
+        if not self.legal_mask() >> card & 1:
+            raise ValueError(f"Нелегальный ход {card_name(card)} для места {seat}")
+
+        self.hands[seat] ^= 1 << card
+        trick = self.trick
+        if not trick:
+            team = seat & 1
+            self.team_led[team] = True
+            if self.kon_number > 1:
+                self.banned[team] = False
+        trick.append(card)
+        if self.trackers is not None:
+            for other, tracker in enumerate(self.trackers):
+                tracker.observe((seat - other) % 4, card)
+
+        # Поимка дамы: Q♣ и 7♣ в одной взятке от разных команд
+        if card == QUEEN_CLUBS or card == SEVEN_CLUBS:
+            other = SEVEN_CLUBS if card == QUEEN_CLUBS else QUEEN_CLUBS
+            if other in trick:
+                other_seat = (self.leader + trick.index(other)) % 4
+                if (other_seat ^ seat) & 1:
+                    seven_seat = seat if card == SEVEN_CLUBS else other_seat
+                    return self._finish_kon(caught=seven_seat & 1)
+
+        if len(trick) < 4:
+            self.to_move = (seat + 1) % 4
+            return None
+
+        c0, c1, c2, c3 = trick
+        offset, points = resolve_trick(c0, c1, c2, c3)
+        taker = (self.leader + offset) % 4
+        team = taker & 1
+        self.points[team] += points
+        self.tricks[team] += 1
+        self.played |= 1 << c0 | 1 << c1 | 1 << c2 | 1 << c3
+        self.last_trick = (self.leader, trick)
+        self.trick = []
+        self.leader = self.to_move = taker
+
+        if self.tricks[0] + self.tricks[1] == TRICKS_PER_KON:
+            return self._finish_kon()
+        return None
+
+    def _finish_kon(self, caught=None):
+        points = self.points
+        tricks = self.tricks
+        if caught is not None:
+            winner = caught
+            penalty = CATCH_PENALTY
+        elif tricks[0] == TRICKS_PER_KON or tricks[1] == TRICKS_PER_KON:
+            # Все взятки - шестерых
+            winner = 0 if tricks[0] else 1
+            penalty = LOSING_SCORE
+        elif points[0] == points[1]:
+            # "Яйца" - пара переносится победителю следующего кона
+            winner = None
+            penalty = 0
+            self.eggs += 1
+        else:
+            winner = 0 if points[0] > points[1] else 1
+            penalty = 2 * PAIR if points[winner] > 90 else PAIR
+
+        if winner is not None:
+            penalty += self.eggs * PAIR
+            self.eggs = 0
+            self.score[1 - winner] += penalty
+
+        result = KonResult(
+            self.kon_number, self.opener, tuple(points), tuple(tricks),
+            winner, penalty, caught
+        )
+        self.kons.append(result)
+
+        if self.score[0] >= LOSING_SCORE or self.score[1] >= LOSING_SCORE:
+            self.winner = 0 if self.score[1] >= LOSING_SCORE else 1
+        elif self.kon_number >= MAX_KONS:
+            self.winner = 0 if self.score[0] <= self.score[1] else 1
+        else:
+            self._start_kon()
+        return result
+
+    # ------------------------------------------------------------------------
+    # Политики
+    # ------------------------------------------------------------------------
+
+    def choose(self):
+        """Спросить ход у политики места self.to_move (единственный ход - без вопроса)"""
+        legal = self.legal_mask()
+        if legal & (legal - 1) == 0:
+            return legal.bit_length() - 1
+        seat = self.to_move
+        return self._choosers[seat](self, seat, legal)
+
+    def game_state(self, seat):
+        """GameState с точки зрения места seat (для политик с choose_card)"""
+        team = seat & 1
+        state = GameState()
+        state.my_cards = [CARDS[i] for i in iter_cards(self.hands[seat])]
+        state.table_cards = [
+            (POSITIONS[(self.leader + i - seat) % 4], CARDS[card])
+            for i, card in enumerate(self.trick)
+        ]
+        state.my_team_score = self.score[team]
+        state.opponent_score = self.score[1 - team]
+        state.current_player = POSITIONS[(self.to_move - seat) % 4]
+        state.kon_number = self.kon_number
+        if self.prev_opener is not None:
+            state.last_kon_opener = POSITIONS[(self.prev_opener - seat) % 4]
+            state.my_team_opened_last_kon = (self.prev_opener & 1) == team
+        state.my_team_led_in_kon = self.team_led[team]
+        if self.trackers is not None:
+            state.tracker = self.trackers[seat]
+        state.opponents_led_in_kon = self.team_led[1 - team]
+        state.cards_left = {
+            POSITIONS[(other - seat) % 4]: count(self.hands[other])
+            for other in range(4) if other != seat
+        }
+        state.tricks_taken = self.tricks[team]
+        state.points_in_kon = self.points[team]
+        state.played_cards = [CARDS[i] for i in iter_cards(self.played)]
+        if self.last_trick is not None:
+            leader, trick = self.last_trick
+            state.last_trick = [
+                (POSITIONS[(leader + i - seat) % 4], CARDS[card])
+                for i, card in enumerate(trick)
+            ]
+        return state
+
+    def play_kon(self):
+        """Доиграть текущий кон, вернуть KonResult"""
+        while True:
+            result = self.step(self.choose())
+            if result is not None:
+                return result
+
+    def play_game(self):
+        """Доиграть партию, вернуть GameResult"""
+        while self.winner is None:
+            self.step(self.choose())
+        return GameResult(self.winner, tuple(self.score), len(self.kons))
+
+
+def play_n_games(policies, n, seed=0, start=0):
+    """
+    Сыграть n партий подряд
+
+    Партия i раздаётся из game_rng(seed, i), поэтому любой диапазон
+    [start, start + n) воспроизводится независимо от остальных.
+
+    Returns:
+        список GameResult
+    """
+    sim = KozelSimulator(policies, rng=game_rng(seed, start))
+    results = []
+    for index in range(start, start + n):
+        sim.reset(game_rng(seed, index))
+        results.append(sim.play_game())
+    return results
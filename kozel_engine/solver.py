@@ -0,0 +1,538 @@
+"""
+Точный решатель кона в открытую (double dummy)
+
+Все четыре руки известны. Альфа-бета по отдельным ходам с make/unmake,
+таблица транспозиций с двумя границами (внутри взятки - Zobrist-хеш рук,
+стола, заходящего и запретов; на границе взятки - ключ с точностью до
+относительных рангов), упорядочивание ходов и отсечение
+равноценных карт (соседние по старшинству карты с одинаковыми очками,
+между которыми всё уже сыграно).
+
+Значение позиции - очки команды 0 (места 0, 2) до конца кона; команда 1
+получает остаток. Легальность ходов - как в KozelAI._get_legal_cards и
+симуляторе: подкладка простой масти, запрет козырного захода.
+
+Поимка дамы заканчивает кон: решатель засчитывает поймавшей команде все
+ещё не разыгранные очки кона - она выигрывает кон при любых очках.
+
+    solver = DoubleDummySolver()
+    solver.load(hands, leader=0, first_kon=True)
+    for card in history:
+        solver.make(card)
+    result = solver.solve()
+    result.points, result.best_move, result.nodes_per_sec, result.tt_hit_rate
+"""
+
+import random
+import time
+from collections import namedtuple
+
+from .cards import (
+    CARD_POINTS,
+    FOLLOW_MASK,
+    NUM_CARDS,
+    QUEEN_CLUBS,
+    RANKS,
+    SEVEN_CLUBS,
+    SIMPLE_MASK,
+    iter_cards,
+    mask_points,
+)
+from .tricks import (
+    LEAD_CONTEXT,
+    POINTS,
+    SIMPLE_SEQUENCE,
+    STRENGTH,
+    TRUMP_ORDER,
+    resolve_trick,
+)
+
+INFINITY = 1000
+DEFAULT_TT_SIZE = 1 << 20
+
+# Результат решения:
+# points - очки команд до конца кона при лучшей игре обеих сторон,
+# best_move - лучший ход места, которое ходит
+SolveResult = namedtuple(
+    'SolveResult',
+    'points best_move nodes tt_probes tt_hits tb_hits elapsed nodes_per_sec tt_hit_rate'
+)
+
+
+# ============================================================================
+# ПРЕДПОСЧИТАННЫЕ ТАБЛИЦЫ
+# ============================================================================
+
+def _group(index):
+    # Группа старшинства: 0 - козыри, 1..3 - простые пики/черви/бубны
+    return 0 if TRUMP_ORDER[index] >= 0 else index // 8
+
+
+def _order(index):
+    if TRUMP_ORDER[index] >= 0:
+        return TRUMP_ORDER[index]
+    return SIMPLE_SEQUENCE.index(RANKS[index % 8])
+
+
+# Карты по возрастанию старшинства внутри группы, группы подряд
+SORT_KEY = tuple(_group(i) * 16 + _order(i) for i in range(NUM_CARDS))
+
+# BETWEEN[a * 32 + b] - карты строго между a и b в их группе
+BETWEEN = tuple(
+    sum(
+        1 << c for c in range(NUM_CARDS)
+        if _group(c) == _group(a)
+        and min(_order(a), _order(b)) < _order(c) < max(_order(a), _order(b))
+    ) if _group(a) == _group(b) else 0
+    for a in range(NUM_CARDS)
+    for b in range(NUM_CARDS)
+)
+
+# Пара может быть равноценной: одна группа, одинаковые очки, не Q♣/7♣
+EQUIVALENT = bytes(
+    1 if (_group(a) == _group(b) and a != b
+          and CARD_POINTS[a] == CARD_POINTS[b]
+          and a not in (QUEEN_CLUBS, SEVEN_CLUBS)
+          and b not in (QUEEN_CLUBS, SEVEN_CLUBS)) else 0
+    for a in range(NUM_CARDS)
+    for b in range(NUM_CARDS)
+)
+
+# Карты каждой группы по возрастанию старшинства
+GROUP_CARDS = tuple(
+    tuple(sorted((i for i in range(NUM_CARDS) if _group(i) == g), key=_order))
+    for g in range(4)
+)
+
+# Код карты в нормализованном ключе: очки и признак Q♣/7♣
+# (место-владелец добавляется при построении ключа)
+NORMAL_CODE = tuple(
+    POINTS[i] << 2 | (1 << 6 if i in (QUEEN_CLUBS, SEVEN_CLUBS) else 0)
+    for i in range(NUM_CARDS)
+)
+
+_zobrist = random.Random(0x6B6F7A656C)
+ZOBRIST_CARD = tuple(
+    tuple(_zobrist.getrandbits(64) for _ in range(NUM_CARDS))
+    for _ in range(4)
+)
+ZOBRIST_LEADER = tuple(_zobrist.getrandbits(64) for _ in range(4))
+ZOBRIST_BAN = tuple(_zobrist.getrandbits(64) for _ in range(8))
+# Карта стола - по месту во взятке: [X, Y] и [Y, X] - разные позиции
+ZOBRIST_TRICK = tuple(
+    tuple(_zobrist.getrandbits(64) for _ in range(NUM_CARDS))
+    for _ in range(4)
+)
+
+
+def boundary_key(hands, leader, ban):
+    """
+    Ключ позиции на границе взятки с точностью до относительных рангов
+
+    Ценность позиции зависит только от того, у кого какие из оставшихся
+    карт в порядке старшинства (с их очками), а не от того, какие
+    именно карты уже вышли. Простые масти симметричны - их подписи
+    сортируются.
+
+    Args:
+        hands: маски рук четырёх мест
+        leader: место, которое заходит
+        ban: запреты козырного захода (бит команды; бит 2 - первый кон)
+    """
+    h0, h1, h2, h3 = hands
+    groups = []
+    for cards in GROUP_CARDS:
+        signature = []
+        for card in cards:
+            if h0 >> card & 1:
+                signature.append(NORMAL_CODE[card])
+            elif h1 >> card & 1:
+                signature.append(NORMAL_CODE[card] | 1)
+            elif h2 >> card & 1:
+                signature.append(NORMAL_CODE[card] | 2)
+            elif h3 >> card & 1:
+                signature.append(NORMAL_CODE[card] | 3)
+        groups.append(tuple(signature))
+    simple = sorted(groups[1:])
+    return (leader, ban, groups[0], simple[0], simple[1], simple[2])
+
+
+# ============================================================================
+# РЕШАТЕЛЬ
+# ============================================================================
+
+class DoubleDummySolver:
+    """
+    Альфа-бета решатель кона в открытую
+
+    Таблица транспозиций сохраняется между вызовами solve (полезно,
+    когда решается несколько позиций одного кона) и очищается при
+    переполнении или через clear().
+
+    tablebase - необязательная EndgameTablebase (tablebase.py) для
+    повторного анализа архивных конов: позиции на границе взятки с не
+    более чем tablebase.max_cards картами на руке берутся из неё вместо
+    перебора. По умолчанию таблицы нет и граница взятки не платит за
+    отпечаток ключа; на свежих раздачах попаданий меньше 0.1%.
+    """
+
+    def __init__(self, tt_size=DEFAULT_TT_SIZE, tablebase=None):
+        self.tt_size = tt_size
+        self.tablebase = tablebase
+        self.tt = {}
+        self.hands = [0, 0, 0, 0]
+        self.trick = []
+        self._undo = []
+        self.leader = 0
+        self.to_move = 0
+        self.ban = 0
+        self.sticky_ban = False
+        self.played = 0
+        self.hash = 0
+        self.left = 0
+        self.reset_stats()
+
+    def clear(self):
+        """Очистить таблицу транспозиций"""
+        self.tt.clear()
+
+    def reset_stats(self):
+        self.nodes = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tb_hits = 0
+
+    # ------------------------------------------------------------------------
+    # Позиция
+    # ------------------------------------------------------------------------
+
+    def load(self, hands, leader, trick=(), banned=(False, False),
+             first_kon=False, played=0):
+        """
+        Задать позицию
+
+        Args:
+            hands: маски рук четырёх мест (без карт на столе)
+            leader: место, которое зашло в текущую взятку
+            trick: карты текущей взятки в порядке хода
+            banned: текущий запрет козырного захода по командам
+            first_kon: первый кон - козырем не заходит никто до конца кона
+            played: маска карт закрытых взяток этого кона
+        """
+        self.hands = list(hands)
+        self.trick = list(trick)
+        self._undo = []
+        self.leader = leader
+        self.to_move = (leader + len(self.trick)) % 4
+        self.sticky_ban = first_kon
+        self.ban = 3 if first_kon else (bool(banned[0]) | bool(banned[1]) << 1)
+        self.played = played
+        self.hash = 0
+        for seat in range(4):
+            for card in iter_cards(self.hands[seat]):
+                self.hash ^= ZOBRIST_CARD[seat][card]
+        for slot, card in enumerate(self.trick):
+            self.hash ^= ZOBRIST_TRICK[slot][card]
+        self.left = mask_points(hands[0] | hands[1] | hands[2] | hands[3])
+
+    def load_simulator(self, sim):
+        """Взять текущую позицию из KozelSimulator"""
+        self.load(sim.hands, sim.leader, sim.trick, sim.banned,
+                  first_kon=sim.kon_number == 1, played=sim.played)
+
+    def legal_mask(self):
+        """Маска легальных ходов места to_move"""
+        hand = self.hands[self.to_move]
+        if not self.trick:
+            if self.ban >> (self.to_move & 1) & 1:
+                return hand & SIMPLE_MASK or hand
+            return hand
+        return hand & FOLLOW_MASK[self.trick[0]] or hand
+
+    def make(self, card):
+        """
+        Сыграть карту за место to_move
+
+        Returns:
+            (очки команды 0 за закрытую этим ходом взятку,
+             None или очки команды 0 до конца кона, если кон закончился поимкой дамы)
+        """
+        seat = self.to_move
+        self.hands[seat] ^= 1 << card
+        trick = self.trick
+        self.hash ^= ZOBRIST_CARD[seat][card] ^ ZOBRIST_TRICK[len(trick)][card]
+        self.left -= POINTS[card]
+        old_ban = self.ban
+        if not trick and not self.sticky_ban:
+            self.ban &= ~(1 << (seat & 1))
+        trick.append(card)
+
+        if card == QUEEN_CLUBS or card == SEVEN_CLUBS:
+            other = SEVEN_CLUBS if card == QUEEN_CLUBS else QUEEN_CLUBS
+            if other in trick:
+                other_seat = (self.leader + trick.index(other)) % 4
+                if (other_seat ^ seat) & 1:
+                    seven_seat = seat if card == SEVEN_CLUBS else other_seat
+                    self._undo.append((seat, old_ban, None))
+                    return 0, (self._remaining_points() if seven_seat & 1 == 0 else 0)
+
+        if len(trick) < 4:
+            self.to_move = (seat + 1) % 4
+            self._undo.append((seat, old_ban, None))
+            return 0, None
+
+        c0, c1, c2, c3 = trick
+        offset, points = resolve_trick(c0, c1, c2, c3)
+        taker = (self.leader + offset) % 4
+        self._undo.append((seat, old_ban, (self.leader, trick)))
+        self.leader = self.to_move = taker
+        self.trick = []
+        self.played |= 1 << c0 | 1 << c1 | 1 << c2 | 1 << c3
+        self.hash ^= (ZOBRIST_TRICK[0][c0] ^ ZOBRIST_TRICK[1][c1]
+                      ^ ZOBRIST_TRICK[2][c2] ^ ZOBRIST_TRICK[3][c3])
+        if taker & 1:
+            return 0, None
+        return points, None
+
+    def unmake(self, card):
+        """Отменить последний make(card)"""
+        seat, old_ban, closed = self._undo.pop()
+        if closed is not None:
+            self.leader, self.trick = closed
+            for slot, c in enumerate(self.trick):
+                self.played ^= 1 << c
+                self.hash ^= ZOBRIST_TRICK[slot][c]
+        self.trick.pop()
+        self.ban = old_ban
+        self.to_move = seat
+        self.hands[seat] |= 1 << card
+        self.hash ^= ZOBRIST_CARD[seat][card] ^ ZOBRIST_TRICK[len(self.trick)][card]
+        self.left += POINTS[card]
+
+    # ------------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------------
+
+    def _ordered_moves(self, tt_move):
+        legal = self.legal_mask()
+        seat = self.to_move
+        played = self.played
+
+        # Равноценные карты: оставляем по одной из каждой серии
+        moves = []
+        prev = -1
+        for card in sorted(iter_cards(legal), key=SORT_KEY.__getitem__):
+            if prev >= 0 and EQUIVALENT[prev * 32 + card] and not BETWEEN[prev * 32 + card] & ~played:
+                continue
+            moves.append(card)
+            prev = card
+
+        trick = self.trick
+        if not trick:
+            # Заход: сначала сильные карты
+            moves.sort(key=lambda c: -STRENGTH[LEAD_CONTEXT[c] * 32 + c])
+        else:
+            context = LEAD_CONTEXT[trick[0]] * 32
+            winner, offset = trick[0], 0
+            for i in range(1, len(trick)):
+                if STRENGTH[context + trick[i]] > STRENGTH[context + winner]:
+                    winner, offset = trick[i], i
+            partner_wins = ((self.leader + offset) ^ seat) & 1 == 0
+            win_strength = STRENGTH[context + winner]
+            if partner_wins:
+                # Партнёр берёт - сначала отдаём очки
+                moves.sort(key=lambda c: (-POINTS[c], STRENGTH[context + c]))
+            else:
+                # Соперник берёт - сначала самые дешёвые бьющие, потом дешёвый сброс
+                moves.sort(key=lambda c: (
+                    (0, STRENGTH[context + c]) if STRENGTH[context + c] > win_strength
+                    else (1, POINTS[c])
+                ))
+
+        if tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def _search(self, alpha, beta):
+        self.nodes += 1
+        trick = self.trick
+        if not trick:
+            hands = self.hands
+            leader = self.leader
+            if not hands[leader]:
+                return 0
+            if hands[0] & (hands[0] - 1) == 0:
+                # Последняя взятка - ходы вынуждены
+                return self._last_trick(leader)
+
+        # Значение всегда в [0, остаток очков]
+        remaining = self.left
+        for card in trick:
+            remaining += POINTS[card]
+        if alpha >= remaining:
+            return remaining
+        if beta <= 0:
+            return 0
+
+        if trick:
+            key = (self.hash ^ ZOBRIST_LEADER[self.leader]
+                   ^ ZOBRIST_BAN[self.ban | self.sticky_ban << 2])
+        else:
+            key = boundary_key(self.hands, self.leader, self.ban | self.sticky_ban << 2)
+            tablebase = self.tablebase
+            if (tablebase is not None
+                    and self.hands[self.leader].bit_count() <= tablebase.max_cards):
+                value = tablebase.probe_key(key)
+                if value is not None:
+                    self.tb_hits += 1
+                    return value
+        self.tt_probes += 1
+        entry = self.tt.get(key)
+        tt_move = -1
+        if entry is not None:
+            self.tt_hits += 1
+            lower, upper, tt_move = entry
+            if lower >= beta:
+                return lower
+            if upper <= alpha:
+                return upper
+            if lower == upper:
+                return lower
+            # Известные границы сужают окно
+            if lower > alpha:
+                alpha = lower
+            if upper < beta:
+                beta = upper
+        else:
+            lower, upper = 0, remaining
+
+        maximizing = self.to_move & 1 == 0
+        alpha0, beta0 = alpha, beta
+        best = -INFINITY if maximizing else INFINITY
+        best_move = -1
+        for card in self._ordered_moves(tt_move):
+            gained, terminal = self.make(card)
+            if terminal is not None:
+                value = terminal
+            else:
+                value = gained + self._search(alpha - gained, beta - gained)
+            self.unmake(card)
+            if maximizing:
+                if value > best:
+                    best, best_move = value, card
+                    if best > alpha:
+                        alpha = best
+            elif value < best:
+                best, best_move = value, card
+                if best < beta:
+                    beta = best
+            if alpha >= beta:
+                break
+
+        if len(self.tt) >= self.tt_size:
+            self.tt.clear()
+        if best <= alpha0:
+            upper = best
+        elif best >= beta0:
+            lower = best
+        else:
+            lower = upper = best
+        self.tt[key] = (lower, upper, best_move)
+        return best
+
+    def _last_trick(self, leader):
+        # Очки команды 0 за последнюю взятку (по одной карте на руке)
+        hands = self.hands
+        c0 = hands[leader].bit_length() - 1
+        c1 = hands[(leader + 1) % 4].bit_length() - 1
+        c2 = hands[(leader + 2) % 4].bit_length() - 1
+        c3 = hands[(leader + 3) % 4].bit_length() - 1
+        trick = (c0, c1, c2, c3)
+        if QUEEN_CLUBS in trick and SEVEN_CLUBS in trick:
+            queen = trick.index(QUEEN_CLUBS)
+            seven = trick.index(SEVEN_CLUBS)
+            if (queen ^ seven) & 1:
+                return self.left if (leader + seven) & 1 == 0 else 0
+        offset, _ = resolve_trick(c0, c1, c2, c3)
+        return self.left if (leader + offset) & 1 == 0 else 0
+
+    def probe_tablebase(self):
+        """Очки команды 0 до конца кона из таблицы эндшпилей или None"""
+        tablebase = self.tablebase
+        if (tablebase is None or self.trick
+                or self.hands[self.leader].bit_count() > tablebase.max_cards):
+            return None
+        return tablebase.probe_key(
+            boundary_key(self.hands, self.leader, self.ban | self.sticky_ban << 2)
+        )
+
+    def _remaining_points(self):
+        return self.left + sum(POINTS[c] for c in self.trick)
+
+    def value(self):
+        """Точные очки команды 0 до конца кона в текущей позиции (без статистики)"""
+        remaining = self._remaining_points()
+        return self._search(-1, remaining + 1)
+
+    def solve(self):
+        """
+        Решить текущую позицию
+
+        Returns:
+            SolveResult; points - очки (команда 0, команда 1) до конца кона,
+            включая карты текущей взятки
+        """
+        self.reset_stats()
+        start = time.perf_counter()
+        remaining = self._remaining_points()
+        maximizing = self.to_move & 1 == 0
+        alpha, beta = -1, remaining + 1
+        best = -INFINITY if maximizing else INFINITY
+        best_move = -1
+        for card in self._ordered_moves(-1):
+            gained, terminal = self.make(card)
+            if terminal is not None:
+                value = terminal
+            else:
+                value = gained + self._search(alpha - gained, beta - gained)
+            self.unmake(card)
+            if maximizing and value > best:
+                best, best_move = value, card
+                alpha = max(alpha, best)
+            elif not maximizing and value < best:
+                best, best_move = value, card
+                beta = min(beta, best)
+
+        elapsed = time.perf_counter() - start
+        return SolveResult(
+            points=(best, remaining - best),
+            best_move=best_move,
+            nodes=self.nodes,
+            tt_probes=self.tt_probes,
+            tt_hits=self.tt_hits,
+            tb_hits=self.tb_hits,
+            elapsed=elapsed,
+            nodes_per_sec=self.nodes / elapsed if elapsed > 0 else 0.0,
+            tt_hit_rate=self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+        )
+
+    def evaluate_moves(self):
+        """
+        Точная оценка каждого легального хода места to_move
+
+        Returns:
+            {карта: очки команды ходящего до конца кона после этого хода}
+        """
+        remaining = self._remaining_points()
+        team = self.to_move & 1
+        values = {}
+        for card in iter_cards(self.legal_mask()):
+            gained, terminal = self.make(card)
+            if terminal is not None:
+                value = terminal
+            else:
+                value = gained + self._search(-1 - gained, remaining + 1 - gained)
+            self.unmake(card)
+            values[card] = value if team == 0 else remaining - value
+        return values
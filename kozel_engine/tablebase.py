@@ -0,0 +1,224 @@
+"""
+Таблица эндшпилей: точные очки позиций последних взяток кона
+
+ЭКСПЕРИМЕНТАЛЬНО. Таблица неполная: в ней только позиции, встретившиеся в
+сыгранных генератором партиях, и на свежих раздачах она почти не
+отвечает (меньше 0.1% проб). Ни ИИ, ни онлайн-поиск её не используют.
+
+Позиции на границе взятки, где у каждого места не больше max_cards карт,
+хранятся на диске: ключ - 64-битный отпечаток нормализованного ключа
+solver.boundary_key (относительные ранги, симметрия простых мастей,
+заходящий, запреты), значение - очки команды 0 до конца кона. Файл -
+открытая адресация с линейным пробированием, читается через mmap:
+поиск - O(1) без разбора файла при загрузке.
+
+Полный перебор всех позиций с 3 картами на руке невозможен (~8e13
+раскладов, и даже после нормализации их слишком много; с 2 картами -
+~2.6e10), поэтому генератор
+заполняет таблицу из реальных раскладов: играет случайные партии, каждый
+кон доигрывает до хвоста и решает хвост точно; в таблицу идут корень
+хвоста и все точно решённые позиции из таблицы транспозиций решателя.
+
+Это инструмент повторного анализа архива: таблица, построенная по
+сыгранным партиям (--seed и --games тех же раздач), отвечает на их хвосты
+без перебора. Онлайн-поиск (PIMC, ISMCTS) и KozelAI таблицу не принимают,
+решатель опрашивает её, только если её передать явно.
+
+    python -m kozel_engine.tablebase endgames.kztb --games 20000 --max-cards 3
+
+    tablebase = EndgameTablebase('endgames.kztb')
+    solver = DoubleDummySolver(tablebase=tablebase)
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .simulator import TRICKS_PER_KON, KozelSimulator, RandomPolicy, game_rng
+from .solver import DoubleDummySolver, boundary_key
+
+MAGIC = b'KZTB'
+VERSION = 1
+HEADER = struct.Struct('<4sHBxQQ')   # magic, версия, max_cards, слотов, записей
+RECORD = struct.Struct('<QB')        # отпечаток (0 - пусто), очки
+DEFAULT_MAX_CARDS = 3
+DEFAULT_SHARD_SIZE = 50
+
+
+def fingerprint(key):
+    """64-битный отпечаток ключа solver.boundary_key (никогда не 0)"""
+    leader, ban, *groups = key
+    data = bytearray((leader, ban))
+    for group in groups:
+        data.append(255)
+        data.extend(group)
+    value = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+    return value or 1
+
+
+# ============================================================================
+# ЧТЕНИЕ
+# ============================================================================
+
+class EndgameTablebase:
+    """Таблица эндшпилей, открытая через mmap (только чтение)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_cards, self.slots, self.entries = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: не таблица эндшпилей версии {VERSION}")
+        self._mask = self.slots - 1
+        self.probes = 0
+        self.hits = 0
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.entries
+
+    def __getstate__(self):
+        # В процессы пула передаётся путь, файл открывается заново
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    def probe_key(self, key):
+        """Очки команды 0 для ключа solver.boundary_key или None"""
+        self.probes += 1
+        target = fingerprint(key)
+        slot = target & self._mask
+        data = self._mmap
+        while True:
+            stored, value = RECORD.unpack_from(data, HEADER.size + slot * RECORD.size)
+            if stored == target:
+                self.hits += 1
+                return value
+            if stored == 0:
+                return None
+            slot = (slot + 1) & self._mask
+
+    def probe(self, hands, leader, banned=(False, False), first_kon=False):
+        """Очки команды 0 до конца кона для рук на границе взятки или None"""
+        # Как у решателя: биты запретов команд, бит 2 - первый кон
+        ban = 3 | 1 << 2 if first_kon else bool(banned[0]) | bool(banned[1]) << 1
+        return self.probe_key(boundary_key(hands, leader, ban))
+
+
+# ============================================================================
+# ГЕНЕРАЦИЯ
+# ============================================================================
+
+def write_table(path, entries, max_cards):
+    """Записать {отпечаток: очки} в файл с открытой адресацией"""
+    slots = 1
+    while slots < 2 * len(entries) or slots < 16:
+        slots <<= 1
+    mask = slots - 1
+    table = bytearray(HEADER.size + slots * RECORD.size)
+    HEADER.pack_into(table, 0, MAGIC, VERSION, max_cards, slots, len(entries))
+    for key, value in entries.items():
+        slot = key & mask
+        while RECORD.unpack_from(table, HEADER.size + slot * RECORD.size)[0]:
+            slot = (slot + 1) & mask
+        RECORD.pack_into(table, HEADER.size + slot * RECORD.size, key, value)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(table)
+    os.replace(tmp_path, path)
+
+
+def _solve_shard(task):
+    """Решить хвосты всех конов партий [start, start + count); {отпечаток: очки}"""
+    seed, start, count, max_cards = task
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(seed, start))
+    solver = DoubleDummySolver()
+    entries = {}
+    for index in range(start, start + count):
+        sim.reset(game_rng(seed, index))
+        while not sim.game_over:
+            # Случайно до хвоста: поимка дамы может закончить кон раньше
+            kon_number = sim.kon_number
+            while sim.kon_number == kon_number and not sim.game_over and (
+                    sim.trick or sim.tricks[0] + sim.tricks[1] < TRICKS_PER_KON - max_cards):
+                sim.step(sim.choose())
+            if sim.kon_number != kon_number or sim.game_over:
+                continue
+            _solve_tail(solver, sim, entries)
+            sim.play_kon()
+    return entries
+
+
+def _solve_tail(solver, sim, entries):
+    solver.clear()
+    solver.load_simulator(sim)
+    root = boundary_key(solver.hands, solver.leader, solver.ban | solver.sticky_ban << 2)
+    entries[fingerprint(root)] = solver.value()
+    # Точно решённые позиции на границах взяток (ключи-кортежи);
+    # последнюю взятку решатель считает без таблицы
+    for key, (lower, upper, _) in solver.tt.items():
+        if lower == upper and isinstance(key, tuple) and _cards(key) > 4:
+            entries[fingerprint(key)] = lower
+
+
+def _cards(key):
+    return sum(len(group) for group in key[2:])
+
+
+def build(path, games, max_cards=DEFAULT_MAX_CARDS, seed=0, workers=None,
+          shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Сгенерировать таблицу эндшпилей
+
+    Args:
+        path: файл таблицы
+        games: случайных партий; из каждого кона берётся хвост
+        max_cards: карт на руке в корне хвоста
+
+    Returns:
+        число позиций в таблице
+    """
+    tasks = [
+        (seed, start, min(shard_size, games - start), max_cards)
+        for start in range(0, games, shard_size)
+    ]
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for shard in pool.map(_solve_shard, tasks):
+            entries.update(shard)
+    write_table(path, entries, max_cards)
+    return len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Генерация таблицы эндшпилей (экспериментально: только "
+                    "позиции сыгранных партий, для повторного разбора архива)")
+    parser.add_argument('out', help="файл таблицы")
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--max-cards', type=int, default=DEFAULT_MAX_CARDS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    total = build(args.out, args.games, args.max_cards, args.seed, args.workers)
+    print(f"{args.out}: {total} позиций")
+
+
+if __name__ == '__main__':
+    main()
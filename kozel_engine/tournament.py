@@ -0,0 +1,259 @@
+"""
+Турнир конфигураций KozelAI в самоигре на всех ядрах
+
+Каждая пара конфигураций играет одинаковые раздачи дважды - с обменом
+мест команд, чтобы убрать везение раздачи. Партия i всегда раздаётся из
+game_rng(seed, i), поэтому любой результат воспроизводится по (seed, i).
+
+Работа режется на шарды, шарды идут в пул процессов, результаты каждой
+партии пишутся в JSONL по мере готовности. Итог - доля побед и средние
+очки за кон с 95% доверительными интервалами.
+
+Конфигурация - словарь (или объект JSON):
+    {
+        "name": "aggressive",
+        "policy": "kozel_bot_architecture:KozelAI",      # по умолчанию
+        "rules": {"need_90_from": 65, "protect_60_from": 50},
+        "strategies": {"protect_60": "my_strategies:protect_60_greedy"}
+    }
+
+strategies подменяет методы _strategy_<имя> функциями f(ai, game_state, legal_cards).
+
+Запуск:
+    python -m kozel_engine.tournament configs.json --games 20000 --out results.jsonl
+"""
+
+import argparse
+import importlib
+import itertools
+import json
+import math
+import os
+import types
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .simulator import KozelSimulator, game_rng
+
+DEFAULT_POLICY = 'kozel_bot_architecture:KozelAI'
+DEFAULT_SHARD_SIZE = 250
+Z_95 = 1.959964
+
+
+# ============================================================================
+# ПОЛИТИКИ ИЗ КОНФИГУРАЦИЙ
+# ============================================================================
+
+def resolve(path):
+    """Объект по пути 'модуль:имя'"""
+    module_name, _, attr = path.partition(':')
+    if not attr:
+        raise ValueError(f"Ожидается путь вида 'модуль:имя', получено {path!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def build_policy(config):
+    """Создать политику по конфигурации"""
+    policy_class = resolve(config.get('policy', DEFAULT_POLICY))
+    rules = config.get('rules')
+    policy = policy_class(rules=rules) if rules else policy_class()
+    for name, path in config.get('strategies', {}).items():
+        attr = f"_strategy_{name}"
+        if not hasattr(policy, attr):
+            raise ValueError(f"У {type(policy).__name__} нет стратегии {attr}")
+        setattr(policy, attr, types.MethodType(resolve(path), policy))
+    return policy
+
+
+# ============================================================================
+# ШАРДЫ
+# ============================================================================
+
+def _play_shard(task):
+    """
+    Сыграть шард партий в процессе пула
+
+    task: (индекс a, конфиг a, индекс b, конфиг b, seed, start, count, swapped)
+    При swapped конфиг a сидит на местах 1, 3 (команда 1).
+    """
+    a_id, a_config, b_id, b_config, seed, start, count, swapped = task
+    a_policy = build_policy(a_config)
+    b_policy = build_policy(b_config)
+    if swapped:
+        policies, a_team = [b_policy, a_policy, b_policy, a_policy], 1
+    else:
+        policies, a_team = [a_policy, b_policy, a_policy, b_policy], 0
+
+    sim = KozelSimulator(policies, rng=game_rng(seed, start))
+    records = []
+    for index in range(start, start + count):
+        sim.reset(game_rng(seed, index))
+        result = sim.play_game()
+        a_points = [kon.points[a_team] for kon in sim.kons]
+        records.append({
+            'a': a_id,
+            'b': b_id,
+            'game': index,
+            'swapped': swapped,
+            'a_won': result.winner == a_team,
+            'score_a': result.score[a_team],
+            'score_b': result.score[1 - a_team],
+            'kons': result.kons,
+            'a_points': sum(a_points),
+            'a_points_sq': sum(p * p for p in a_points),
+        })
+    return records
+
+
+def make_tasks(configs, games, seed, shard_size=DEFAULT_SHARD_SIZE):
+    """Шарды круговой системы: каждая пара, обе рассадки, раздачи 0..games-1"""
+    tasks = []
+    for a_id, b_id in itertools.combinations(range(len(configs)), 2):
+        for swapped in (False, True):
+            for start in range(0, games, shard_size):
+                count = min(shard_size, games - start)
+                tasks.append((
+                    a_id, configs[a_id], b_id, configs[b_id],
+                    seed, start, count, swapped
+                ))
+    return tasks
+
+
+# ============================================================================
+# СТАТИСТИКА
+# ============================================================================
+
+def wilson_interval(wins, n, z=Z_95):
+    """Доверительный интервал Уилсона для доли побед"""
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return center - half, center + half
+
+
+def mean_interval(total, total_sq, n, z=Z_95):
+    """Среднее и нормальный доверительный интервал по сумме и сумме квадратов"""
+    if n == 0:
+        return 0.0, 0.0, 0.0
+    mean = total / n
+    variance = max(total_sq / n - mean * mean, 0.0)
+    half = z * math.sqrt(variance / n) if n > 1 else 0.0
+    return mean, mean - half, mean + half
+
+
+class PairStats:
+    """Накопитель результатов пары конфигураций (с точки зрения a)"""
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.kons = 0
+        self.points = 0
+        self.points_sq = 0
+
+    def add(self, record):
+        self.games += 1
+        self.wins += record['a_won']
+        self.kons += record['kons']
+        self.points += record['a_points']
+        self.points_sq += record['a_points_sq']
+
+    def summary(self):
+        low, high = wilson_interval(self.wins, self.games)
+        mean, mean_low, mean_high = mean_interval(self.points, self.points_sq, self.kons)
+        return {
+            'games': self.games,
+            'win_rate': self.wins / self.games if self.games else 0.0,
+            'win_rate_ci': [low, high],
+            'avg_kon_points': mean,
+            'avg_kon_points_ci': [mean_low, mean_high],
+            'kons': self.kons,
+        }
+
+
+def _summaries(pairs, configs):
+    return [
+        dict(a=configs[a]['name'], b=configs[b]['name'], **stats.summary())
+        for (a, b), stats in sorted(pairs.items())
+    ]
+
+
+def aggregate(records, configs):
+    """Свести записи партий (например из load_records) в итоги по парам"""
+    pairs = {}
+    for record in records:
+        pairs.setdefault((record['a'], record['b']), PairStats()).add(record)
+    return _summaries(pairs, configs)
+
+
+# ============================================================================
+# ТУРНИР
+# ============================================================================
+
+def run_tournament(configs, games, out_path, seed=0, workers=None,
+                   shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Круговой турнир конфигураций
+
+    Args:
+        configs: список конфигураций (у каждой обязательно 'name')
+        games: раздач на пару (каждая играется в обеих рассадках)
+        out_path: JSONL, куда по мере готовности пишутся партии
+        seed: базовое зерно раздач
+        workers: число процессов (по умолчанию - все ядра)
+
+    Returns:
+        итоги по парам (см. aggregate)
+    """
+    if len(configs) < 2:
+        raise ValueError("Для турнира нужно минимум 2 конфигурации")
+    for config in configs:
+        # Ошибки конфигурации - до запуска пула, а не в воркере
+        build_policy(config)
+
+    tasks = make_tasks(configs, games, seed, shard_size)
+    pairs = {}
+    with open(out_path, 'w', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_play_shard, task) for task in tasks]
+        for future in as_completed(futures):
+            for record in future.result():
+                out.write(json.dumps(record) + '\n')
+                pairs.setdefault((record['a'], record['b']), PairStats()).add(record)
+            out.flush()
+
+    return _summaries(pairs, configs)
+
+
+def load_records(path):
+    """Прочитать партии из JSONL построчно"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Турнир конфигураций KozelAI")
+    parser.add_argument('configs', help="JSON со списком конфигураций")
+    parser.add_argument('--games', type=int, default=1000, help="раздач на пару")
+    parser.add_argument('--out', default='tournament.jsonl', help="JSONL с партиями")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.configs, encoding='utf-8') as f:
+        configs = json.load(f)
+
+    summary = run_tournament(
+        configs, args.games, args.out,
+        seed=args.seed, workers=args.workers, shard_size=args.shard_size
+    )
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+Учёт карт кона с точки зрения одного игрока
+
+Обновляется за O(1) на каждую увиденную карту и хранит:
+- played - вышедшие карты (closed - из закрытых взяток),
+  unseen - карты, которых игрок не видел
+- can_hold[место] - маска карт, которые ещё могут быть у места
+- voids[место] - маска простых мастей, в которых место показало пустоту
+- counts[место] - карт на руке
+
+Выводы из правил:
+- не подложил простую масть захода - этой простой масти у места нет
+- зашёл козырем под запретом козырного захода - простых карт у места нет
+- если у места ровно столько возможных карт, сколько карт на руке, эти
+  карты точно его - остальные места их держать не могут
+
+probabilities() - матрица "место x карта" для невиданных карт,
+forbidden() - запреты для pimc.sample_hands.
+
+Места - относительно игрока: 0 - игрок, 1 - слева, 2 - партнёр, 3 - справа.
+
+    tracker = CardTracker()
+    tracker.new_kon(my_hand_mask, leader=2, banned=(False, True))
+    tracker.observe(2, card)       # место 2 сыграло card
+"""
+
+from .cards import (
+    FOLLOW_MASK,
+    FULL_DECK,
+    NUM_CARDS,
+    SIMPLE_MASK,
+    TRUMP_MASK,
+    count,
+    iter_cards,
+)
+from .tricks import resolve_trick
+
+POSITIONS = ('bottom', 'left', 'top', 'right')
+
+
+class CardTracker:
+    """Карты, масти и вероятности рук в текущем коне"""
+
+    def __init__(self):
+        self.new_kon(0, 0)
+
+    def new_kon(self, hand, leader, banned=(False, False), first_kon=False,
+                counts=None):
+        """
+        Начать кон
+
+        Args:
+            hand: маска своей руки
+            leader: место, которое заходит первым
+            banned: запреты козырного захода по командам (0 - наша)
+            first_kon: первый кон - козырем не заходит никто
+            counts: карт на руках по местам (по умолчанию - как у игрока)
+        """
+        self.hand = hand
+        self.played = 0
+        self.closed = 0
+        self.unseen = FULL_DECK & ~hand
+        self.can_hold = [hand, self.unseen, self.unseen, self.unseen]
+        self.voids = [0, 0, 0, 0]
+        self.counts = list(counts) if counts is not None else [count(hand)] * 4
+        self.trick = []
+        self.leader = leader
+        self.first_kon = first_kon
+        self.banned = [bool(banned[0]), bool(banned[1])]
+        self.points = [0, 0]
+        self._matrix = None
+
+    # ------------------------------------------------------------------------
+    # Наблюдения
+    # ------------------------------------------------------------------------
+
+    @property
+    def to_move(self):
+        return (self.leader + len(self.trick)) % 4
+
+    def observe(self, seat, card):
+        """
+        Место seat сыграло карту card
+
+        Returns:
+            (место, взявшее взятку) если карта закрыла взятку, иначе None
+        """
+        bit = 1 << card
+        self.played |= bit
+        self.unseen &= ~bit
+        can_hold = self.can_hold
+        for other in range(4):
+            can_hold[other] &= ~bit
+        if seat == 0:
+            self.hand &= ~bit
+        self.counts[seat] -= 1
+        self._matrix = None
+
+        trick = self.trick
+        if not trick:
+            team = seat & 1
+            if self.banned[team] and TRUMP_MASK >> card & 1:
+                # Козырь под запретом - простых не осталось
+                can_hold[seat] &= TRUMP_MASK
+            if not self.first_kon:
+                self.banned[team] = False
+        else:
+            follow = FOLLOW_MASK[trick[0]]
+            if follow and not follow & bit:
+                # Не подложил масть захода - её у места нет
+                self.voids[seat] |= follow
+                can_hold[seat] &= ~follow
+        trick.append(card)
+        self._propagate()
+
+        if len(trick) < 4:
+            return None
+        c0, c1, c2, c3 = trick
+        offset, points = resolve_trick(c0, c1, c2, c3)
+        taker = (self.leader + offset) % 4
+        self.points[taker & 1] += points
+        self.closed |= 1 << c0 | 1 << c1 | 1 << c2 | 1 << c3
+        self.trick = []
+        self.leader = taker
+        return taker
+
+    def observe_position(self, position, card):
+        """То же по позиции ('bottom', 'left', 'top', 'right'), card - номер карты"""
+        return self.observe(POSITIONS.index(position), card)
+
+    def _propagate(self):
+        # Места, у которых возможных карт ровно на руку, держат именно их
+        # (не больше трёх проходов по трём местам)
+        can_hold = self.can_hold
+        counts = self.counts
+        changed = True
+        while changed:
+            changed = False
+            for other in (1, 2, 3):
+                known = can_hold[other]
+                if counts[other] and count(known) == counts[other]:
+                    for rest in (1, 2, 3):
+                        if rest != other and can_hold[rest] & known:
+                            can_hold[rest] &= ~known
+                            changed = True
+
+    # ------------------------------------------------------------------------
+    # Запросы
+    # ------------------------------------------------------------------------
+
+    def has_void(self, seat, card):
+        """Место показало пустоту в простой масти карты card"""
+        return bool(self.voids[seat] & FOLLOW_MASK[card])
+
+    def can_have(self, seat, card):
+        """Может ли карта card быть у места seat"""
+        return bool(self.can_hold[seat] >> card & 1)
+
+    def forbidden(self):
+        """{место: маска невиданных карт, которых у места точно нет} для sample_hands"""
+        return {
+            seat: self.unseen & ~self.can_hold[seat]
+            for seat in (1, 2, 3)
+            if self.unseen & ~self.can_hold[seat]
+        }
+
+    def probabilities(self):
+        """
+        Вероятность, что невиданная карта у места
+
+        Оценка без полного перебора раскладов: вес места - карт на руке,
+        делённое на число возможных карт; вероятности по карте
+        нормируются по местам, которые могут её держать.
+
+        Returns:
+            список из 32 строк [p0, p1, p2, p3] (для видимых карт - нули)
+        """
+        if self._matrix is not None:
+            return self._matrix
+        weights = [0.0] * 4
+        for seat in (1, 2, 3):
+            possible = count(self.can_hold[seat])
+            if possible:
+                weights[seat] = self.counts[seat] / possible
+        matrix = [[0.0] * 4 for _ in range(NUM_CARDS)]
+        for card in iter_cards(self.unseen):
+            row = matrix[card]
+            total = 0.0
+            for seat in (1, 2, 3):
+                if self.can_hold[seat] >> card & 1:
+                    row[seat] = weights[seat]
+                    total += weights[seat]
+            if total:
+                for seat in (1, 2, 3):
+                    row[seat] /= total
+        self._matrix = matrix
+        return matrix
+
+    def holder_probability(self, card, seats):
+        """Вероятность, что карта у одного из мест seats (0 для вышедшей)"""
+        if self.hand >> card & 1:
+            return 1.0 if 0 in seats else 0.0
+        row = self.probabilities()[card]
+        return sum(row[seat] for seat in seats)
+
+    def simple_left(self, seat):
+        """Может ли у места ещё быть простая карта"""
+        return bool(self.can_hold[seat] & SIMPLE_MASK)
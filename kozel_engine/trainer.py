@@ -0,0 +1,434 @@
+"""
+Офлайн-обучение сети KozelML на NumPy
+
+Та же сеть, что KozelML.createModel (kozel-assistant/ai/ml-model.js):
+92 -> 128 relu -> dropout 0.2 -> 64 relu -> dropout 0.2 -> 32 relu ->
+36 softmax, categoricalCrossentropy, Adam с learningRate 0.001. Метка -
+как в KozelML.train: награда на месте сыгранной карты, остальное - 0.
+
+Примеры берутся из осколков features.py, открытых через mmap: осколки
+режутся на блоки по BLOCK_ROWS строк, блоки читаются и перемешиваются в
+пуле потоков на все ядра (копия из mmap и перестановка отпускают GIL), а
+матричные умножения идут в многопоточном BLAS. В памяти - несколько
+блоков, сколько бы строк ни было в наборе. Последняя доля набора
+(validation_split, как validationSplit у model.fit) - проверочная.
+
+Результат - модель в формате слоёв TF.js (model.json и weights.bin),
+которую KozelML.importModel загружает и сохраняет в IndexedDB:
+
+    python -m kozel_engine.trainer dataset/ --out model/ --epochs 10
+    python -m kozel_engine.trainer dataset/ --archive games.kzga --workers 8
+
+NumPy - необязательная зависимость, как у batch.py.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .features import INPUT_SIZE, OUTPUT_SIZE, build_dataset, open_shards
+
+# Слои Dense: имя, число нейронов, активация; dropout - после первых двух
+LAYERS = (
+    ('input_layer', 128, 'relu'),
+    ('hidden_1', 64, 'relu'),
+    ('hidden_2', 32, 'relu'),
+    ('output_layer', OUTPUT_SIZE, 'softmax'),
+)
+DROPOUT = 0.2
+DROPOUT_NAMES = ('dropout_1', 'dropout_2')
+
+LEARNING_RATE = 0.001
+BATCH_SIZE = 256
+EPOCHS = 10
+VALIDATION_SPLIT = 0.2
+BLOCK_ROWS = 1 << 13
+EPSILON = 1e-7               # epsilon бэкенда TF.js: Adam и обрезка вероятностей
+
+TFJS_VERSION = '4.11.0'      # kozel-assistant/lib/tf.min.js
+WEIGHTS_FILE = 'weights.bin'
+
+# Итог эпохи: потери и точность на обучающих и проверочных примерах
+EpochStats = namedtuple('EpochStats', 'epoch loss acc val_loss val_acc seconds')
+
+
+# ============================================================================
+# СЕТЬ
+# ============================================================================
+
+def _truncated_normal(rng, stddev, shape):
+    # Как truncatedNormal TF.js: значения дальше двух сигм перевыбираются
+    values = rng.normal(0, stddev, shape)
+    while True:
+        outside = np.abs(values) > 2 * stddev
+        if not outside.any():
+            return values
+        values[outside] = rng.normal(0, stddev, outside.sum())
+
+
+class DenseModel:
+    """
+    Полносвязная сеть KozelML
+
+    weights - [(kernel (вход, выход), bias)] в порядке LAYERS. dtype
+    задаёт точность вычислений (float64 - для проверки градиентов).
+    """
+
+    def __init__(self, seed=None, dtype=np.float32):
+        rng = np.random.default_rng(seed)
+        self.dtype = dtype
+        self.weights = []
+        fan_in = INPUT_SIZE
+        for name, units, activation in LAYERS:
+            if activation == 'relu':
+                # heNormal
+                stddev = np.sqrt(2 / fan_in)
+            else:
+                # glorotNormal - инициализатор Dense по умолчанию
+                stddev = np.sqrt(2 / (fan_in + units))
+            kernel = _truncated_normal(rng, stddev, (fan_in, units)).astype(dtype)
+            self.weights.append((kernel, np.zeros(units, dtype=dtype)))
+            fan_in = units
+
+    def predict(self, x):
+        """Вероятности карт (N, 36) без dropout"""
+        return self._forward(np.asarray(x, dtype=self.dtype))[0][-1]
+
+    def _forward(self, x, rng=None):
+        # activations[i] - вход слоя i (после dropout), последний - softmax
+        activations = [x]
+        masks = []
+        for i, (kernel, bias) in enumerate(self.weights):
+            z = activations[-1] @ kernel + bias
+            if i == len(self.weights) - 1:
+                z -= z.max(axis=1, keepdims=True)
+                np.exp(z, out=z)
+                z /= z.sum(axis=1, keepdims=True)
+                activations.append(z)
+                break
+            np.maximum(z, 0, out=z)
+            if rng is not None and i < len(DROPOUT_NAMES):
+                # Обратный dropout: выжившие нейроны делятся на 1 - rate
+                mask = (rng.random(z.shape) >= DROPOUT) / self.dtype(1 - DROPOUT)
+                z *= mask
+                masks.append(mask)
+            else:
+                masks.append(None)
+            activations.append(z)
+        return activations, masks
+
+    def loss_and_grads(self, x, actions, rewards, rng=None):
+        """
+        Средняя categoricalCrossentropy, градиенты по весам и вероятности
+
+        rng включает dropout (обучение); без него - сеть как при predict.
+        """
+        x = np.asarray(x, dtype=self.dtype)
+        n = len(x)
+        rows = np.arange(n)
+        rewards = np.asarray(rewards, dtype=self.dtype)
+        activations, masks = self._forward(x, rng)
+        probs = activations[-1]
+        picked = np.clip(probs[rows, actions], EPSILON, 1 - EPSILON)
+        loss = float(-(rewards * np.log(picked)).sum() / n)
+
+        # d(-r log p_a)/dz = r p - r e_a: сумма метки равна награде
+        delta = probs * rewards[:, None]
+        delta[rows, actions] -= rewards
+        delta /= n
+        grads = [None] * len(self.weights)
+        for i in range(len(self.weights) - 1, -1, -1):
+            kernel, _ = self.weights[i]
+            grads[i] = (activations[i].T @ delta, delta.sum(axis=0))
+            if i == 0:
+                break
+            delta = delta @ kernel.T
+            if masks[i - 1] is not None:
+                delta *= masks[i - 1]
+            delta *= activations[i] > 0
+        return loss, grads, probs
+
+    # ------------------------------------------------------------------------
+    # Формат слоёв TF.js
+    # ------------------------------------------------------------------------
+
+    def topology(self):
+        """modelTopology, как её сохраняет model.save у KozelML"""
+        layers = []
+        for i, (name, units, activation) in enumerate(LAYERS):
+            if activation == 'relu':
+                initializer = {'scale': 2, 'mode': 'fan_in'}
+            else:
+                initializer = {'scale': 1, 'mode': 'fan_avg'}
+            config = {
+                'units': units, 'activation': activation, 'use_bias': True,
+                'kernel_initializer': {
+                    'class_name': 'VarianceScaling',
+                    'config': dict(initializer, distribution='normal', seed=None),
+                },
+                'bias_initializer': {'class_name': 'Zeros', 'config': {}},
+                'kernel_regularizer': None, 'bias_regularizer': None,
+                'activity_regularizer': None, 'kernel_constraint': None,
+                'bias_constraint': None, 'name': name, 'trainable': True,
+            }
+            if i == 0:
+                config.update(batch_input_shape=[None, INPUT_SIZE], dtype='float32')
+            layers.append({'class_name': 'Dense', 'config': config})
+            if i < len(DROPOUT_NAMES):
+                layers.append({'class_name': 'Dropout', 'config': {
+                    'rate': DROPOUT, 'noise_shape': None, 'seed': None,
+                    'name': DROPOUT_NAMES[i], 'trainable': True,
+                }})
+        return {
+            'class_name': 'Sequential',
+            'config': {'name': 'sequential_1', 'layers': layers},
+            'keras_version': f'tfjs-layers {TFJS_VERSION}',
+            'backend': 'tensor_flow.js',
+        }
+
+    def save_tfjs(self, out_dir):
+        """Записать model.json и weights.bin (float32, little-endian)"""
+        os.makedirs(out_dir, exist_ok=True)
+        specs = []
+        with open(os.path.join(out_dir, WEIGHTS_FILE), 'wb') as f:
+            for (name, _, _), (kernel, bias) in zip(LAYERS, self.weights):
+                for suffix, array in (('kernel', kernel), ('bias', bias)):
+                    f.write(np.ascontiguousarray(array, dtype='<f4').tobytes())
+                    specs.append({'name': f'{name}/{suffix}', 'shape': list(array.shape),
+                                  'dtype': 'float32'})
+        model = {
+            'format': 'layers-model',
+            'generatedBy': 'kozel_engine.trainer',
+            'convertedBy': None,
+            'modelTopology': self.topology(),
+            'weightsManifest': [{'paths': [WEIGHTS_FILE], 'weights': specs}],
+        }
+        with open(os.path.join(out_dir, 'model.json'), 'w', encoding='utf-8') as f:
+            json.dump(model, f)
+
+    @classmethod
+    def load_tfjs(cls, out_dir):
+        """Модель из model.json и весов TF.js (продолжить обучение)"""
+        with open(os.path.join(out_dir, 'model.json'), encoding='utf-8') as f:
+            model_json = json.load(f)
+        arrays = {}
+        for group in model_json['weightsManifest']:
+            data = b''
+            for path in group['paths']:
+                with open(os.path.join(out_dir, path), 'rb') as f:
+                    data += f.read()
+            offset = 0
+            for spec in group['weights']:
+                size = int(np.prod(spec['shape']))
+                arrays[spec['name']] = np.frombuffer(
+                    data, dtype='<f4', count=size, offset=offset).reshape(spec['shape'])
+                offset += 4 * size
+        model = cls()
+        try:
+            model.weights = [(arrays[f'{name}/kernel'].astype(np.float32),
+                              arrays[f'{name}/bias'].astype(np.float32))
+                             for name, _, _ in LAYERS]
+        except KeyError as e:
+            raise ValueError(f"В модели нет весов {e.args[0]}") from None
+        for (kernel, bias), (name, units, _) in zip(model.weights, LAYERS):
+            if kernel.shape[1] != units or bias.shape != (units,):
+                raise ValueError(f"Слой {name}: {kernel.shape}, ожидалось {units} нейронов")
+        return model
+
+
+class Adam:
+    """Adam с параметрами tf.train.adam по умолчанию"""
+
+    def __init__(self, learning_rate=LEARNING_RATE, beta1=0.9, beta2=0.999, epsilon=EPSILON):
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.steps = 0
+        self.moments = None
+
+    def step(self, model, grads):
+        if self.moments is None:
+            self.moments = [[(np.zeros_like(w), np.zeros_like(w)) for w in layer]
+                            for layer in model.weights]
+        self.steps += 1
+        rate = (self.learning_rate * np.sqrt(1 - self.beta2 ** self.steps)
+                / (1 - self.beta1 ** self.steps))
+        for layer, layer_grads, layer_moments in zip(model.weights, grads, self.moments):
+            for weight, grad, (m, v) in zip(layer, layer_grads, layer_moments):
+                m *= self.beta1
+                m += (1 - self.beta1) * grad
+                v *= self.beta2
+                v += (1 - self.beta2) * grad * grad
+                weight -= rate * m / (np.sqrt(v) + self.epsilon)
+
+
+# ============================================================================
+# ДАННЫЕ
+# ============================================================================
+
+def split_blocks(shards, validation_split=VALIDATION_SPLIT, block_rows=BLOCK_ROWS):
+    """
+    Блоки (осколок, начало, конец) обучающей и проверочной частей
+
+    Проверочная часть - последняя доля строк набора, как validationSplit.
+    """
+    total = sum(len(shard.action) for shard in shards)
+    cutoff = total - int(total * validation_split)
+    train, validation = [], []
+    offset = 0
+    for index, shard in enumerate(shards):
+        rows = len(shard.action)
+        for start in range(0, rows, block_rows):
+            stop = min(rows, start + block_rows)
+            split = min(max(cutoff - offset - start, 0), stop - start)
+            if split:
+                train.append((index, start, start + split))
+            if start + split < stop:
+                validation.append((index, start + split, stop))
+        offset += rows
+    return train, validation
+
+
+def _load_block(shards, block, rng):
+    index, start, stop = block
+    shard = shards[index]
+    order = rng.permutation(stop - start) if rng is not None else slice(None)
+    return (np.asarray(shard.x[start:stop])[order],
+            np.asarray(shard.action[start:stop], dtype=np.intp)[order],
+            np.asarray(shard.reward[start:stop])[order])
+
+
+def iter_batches(shards, blocks, batch_size=BATCH_SIZE, rng=None, workers=None):
+    """
+    Мини-пакеты (x, действия, награды) из блоков осколков
+
+    С rng порядок блоков и строк внутри блока случаен. Блоки читаются
+    наперёд в пуле из workers потоков.
+    """
+    blocks = list(blocks)
+    if rng is not None:
+        rng.shuffle(blocks)
+    workers = workers or os.cpu_count()
+    seeds = None
+    if rng is not None:
+        seeds = np.random.SeedSequence(int(rng.integers(1 << 63))).spawn(len(blocks))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for i, block in enumerate(blocks):
+            block_rng = np.random.default_rng(seeds[i]) if seeds is not None else None
+            pending.append(pool.submit(_load_block, shards, block, block_rng))
+            if len(pending) <= workers:
+                continue
+            yield from _batches(pending.popleft().result(), batch_size)
+        while pending:
+            yield from _batches(pending.popleft().result(), batch_size)
+
+
+def _batches(block, batch_size):
+    x, actions, rewards = block
+    for start in range(0, len(actions), batch_size):
+        stop = start + batch_size
+        yield x[start:stop], actions[start:stop], rewards[start:stop]
+
+
+# ============================================================================
+# ОБУЧЕНИЕ
+# ============================================================================
+
+def _accuracy(probs, actions, rewards):
+    # categoricalAccuracy: argmax метки - сыгранная карта, если награда > 0
+    return int(((probs.argmax(axis=1) == actions) & (rewards > 0)).sum())
+
+
+def evaluate(model, shards, blocks, workers=None):
+    """(средние потери, точность) на блоках без dropout"""
+    loss = correct = rows = 0
+    for x, actions, rewards in iter_batches(shards, blocks, BLOCK_ROWS, workers=workers):
+        probs = model.predict(x)
+        picked = np.clip(probs[np.arange(len(actions)), actions], EPSILON, 1 - EPSILON)
+        loss -= float((rewards * np.log(picked)).sum())
+        correct += _accuracy(probs, actions, rewards)
+        rows += len(actions)
+    return (loss / rows, correct / rows) if rows else (None, None)
+
+
+def train(shards, model=None, epochs=EPOCHS, batch_size=BATCH_SIZE,
+          learning_rate=LEARNING_RATE, validation_split=VALIDATION_SPLIT,
+          workers=None, seed=None, on_epoch=None):
+    """
+    Обучить сеть на осколках features.py
+
+    Args:
+        shards: open_shards(...)
+        model: DenseModel для дообучения или None - новая
+        on_epoch: вызывается с EpochStats после каждой эпохи
+
+    Returns:
+        (модель, [EpochStats])
+    """
+    rng = np.random.default_rng(seed)
+    model = model or DenseModel(seed=int(rng.integers(1 << 63)))
+    optimizer = Adam(learning_rate)
+    train_blocks, validation_blocks = split_blocks(shards, validation_split)
+    if not train_blocks:
+        raise ValueError("Нет обучающих примеров")
+
+    history = []
+    for epoch in range(1, epochs + 1):
+        started = time.perf_counter()
+        total_loss = correct = rows = 0
+        for x, actions, rewards in iter_batches(shards, train_blocks, batch_size, rng, workers):
+            loss, grads, probs = model.loss_and_grads(x, actions, rewards, rng)
+            optimizer.step(model, grads)
+            # Как у model.fit: потери и точность обучения - по ходу эпохи, с dropout
+            total_loss += loss * len(actions)
+            correct += _accuracy(probs, actions, rewards)
+            rows += len(actions)
+        val_loss, val_acc = evaluate(model, shards, validation_blocks, workers)
+        stats = EpochStats(epoch, total_loss / rows, correct / rows, val_loss, val_acc,
+                           time.perf_counter() - started)
+        history.append(stats)
+        if on_epoch is not None:
+            on_epoch(stats)
+    return model, history
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обучение сети KozelML на осколках features.py")
+    parser.add_argument('dataset', help="каталог осколков (manifest.json)")
+    parser.add_argument('--archive', help="сначала собрать набор из архива archive.py")
+    parser.add_argument('--out', default='kozel-ml-model', help="каталог model.json")
+    parser.add_argument('--resume', help="дообучить модель TF.js из каталога")
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--learning-rate', type=float, default=LEARNING_RATE)
+    parser.add_argument('--validation-split', type=float, default=VALIDATION_SPLIT)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.archive:
+        rows = build_dataset(args.archive, args.dataset, workers=args.workers)
+        print(f"{args.dataset}: {rows} примеров")
+    model = DenseModel.load_tfjs(args.resume) if args.resume else None
+
+    def report(stats):
+        print(f"Эпоха {stats.epoch}: loss={stats.loss:.4f} acc={stats.acc:.4f} "
+              f"val_loss={stats.val_loss or 0:.4f} val_acc={stats.val_acc or 0:.4f} "
+              f"({stats.seconds:.1f} с)")
+
+    model, _ = train(open_shards(args.dataset), model, args.epochs, args.batch_size,
+                     args.learning_rate, args.validation_split, args.workers, args.seed,
+                     on_epoch=report)
+    model.save_tfjs(args.out)
+    print(f"{args.out}/model.json")
+
+
+if __name__ == '__main__':
+    main()
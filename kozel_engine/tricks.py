@@ -0,0 +1,146 @@
+"""
+Разрешение взяток по предпосчитанным таблицам
+
+При импорте один раз строятся плоские таблицы:
+- BEATS[(контекст захода, текущая старшая, карта)] - бьёт ли карта старшую
+- CARD_POINTS - очки карты (из cards.py)
+
+Контекст захода - простая масть первой карты взятки, а для козырного захода
+слот треф (у треф простых карт нет, поэтому слот свободен). Разрешение
+взятки из 4 карт - три обращения к BEATS и четыре к очкам, без ветвлений
+по рангам и мастям.
+"""
+
+from .cards import (
+    CARD_INDEX,
+    CARD_POINTS,
+    CARD_SIMPLE_SUIT,
+    CLUBS,
+    NO_CARD,
+    NUM_CARDS,
+    RANKS,
+    SUITS,
+)
+
+# Старшинство козырей по ADR-0002 (от младшего к старшему)
+TRUMP_SEQUENCE = (
+    ('8', 'clubs'), ('9', 'clubs'), ('K', 'clubs'), ('10', 'clubs'), ('A', 'clubs'),
+    ('J', 'diamonds'), ('J', 'hearts'), ('J', 'spades'), ('J', 'clubs'),
+    ('Q', 'diamonds'), ('Q', 'hearts'), ('Q', 'spades'), ('Q', 'clubs'),
+    ('7', 'clubs'),
+)
+
+# Старшинство простых внутри масти: 7 < 8 < 9 < K < 10 < A
+SIMPLE_SEQUENCE = ('7', '8', '9', 'K', '10', 'A')
+
+
+# ============================================================================
+# ТАБЛИЦЫ
+# ============================================================================
+
+# Порядок козыря по номеру карты, -1 для простой (как Card.getTrumpOrder)
+TRUMP_ORDER = tuple(
+    TRUMP_SEQUENCE.index((RANKS[i % 8], SUITS[i // 8]))
+    if (RANKS[i % 8], SUITS[i // 8]) in TRUMP_SEQUENCE else -1
+    for i in range(NUM_CARDS)
+)
+
+# Контекст захода по первой карте взятки
+LEAD_CONTEXT = tuple(
+    CLUBS if CARD_SIMPLE_SUIT[i] == NO_CARD else CARD_SIMPLE_SUIT[i]
+    for i in range(NUM_CARDS)
+)
+
+
+def _strength(context, index):
+    # Любой козырь старше любой простой; простая другой масти не бьёт ничего
+    if TRUMP_ORDER[index] >= 0:
+        return 20 + TRUMP_ORDER[index]
+    if CARD_SIMPLE_SUIT[index] == context:
+        return 1 + SIMPLE_SEQUENCE.index(RANKS[index % 8])
+    return 0
+
+
+# Сила карты в контексте захода: STRENGTH[context * 32 + card]
+STRENGTH = bytes(
+    _strength(context, i)
+    for context in range(4)
+    for i in range(NUM_CARDS)
+)
+
+# BEATS[context << 10 | winner << 5 | card] == 1, если card бьёт winner
+BEATS = bytes(
+    1 if STRENGTH[context * 32 + card] > STRENGTH[context * 32 + winner] else 0
+    for context in range(4)
+    for winner in range(NUM_CARDS)
+    for card in range(NUM_CARDS)
+)
+
+POINTS = bytes(CARD_POINTS)
+
+
+# ============================================================================
+# РАЗРЕШЕНИЕ ВЗЯТКИ
+# ============================================================================
+
+def beats(card, winner, lead):
+    """Бьёт ли card текущую старшую winner при заходе картой lead"""
+    return BEATS[LEAD_CONTEXT[lead] << 10 | winner << 5 | card] == 1
+
+
+def resolve_trick(c0, c1, c2, c3):
+    """
+    Разрешить полную взятку
+
+    Args:
+        c0..c3: номера карт в порядке хода, c0 - заход
+
+    Returns:
+        (смещение взявшего от заходившего 0..3, очки взятки)
+    """
+    base = LEAD_CONTEXT[c0] << 10
+    winner = c0
+    offset = 0
+    if BEATS[base | winner << 5 | c1]:
+        winner = c1
+        offset = 1
+    if BEATS[base | winner << 5 | c2]:
+        winner = c2
+        offset = 2
+    if BEATS[base | winner << 5 | c3]:
+        offset = 3
+    return offset, POINTS[c0] + POINTS[c1] + POINTS[c2] + POINTS[c3]
+
+
+def trick_winner(trick):
+    """
+    Старшая карта неполной или полной взятки
+
+    Args:
+        trick: номера карт в порядке хода
+
+    Returns:
+        (смещение старшей карты от заходившего, номер карты)
+        или (NO_CARD, NO_CARD) для пустой взятки
+    """
+    if not trick:
+        return NO_CARD, NO_CARD
+    base = LEAD_CONTEXT[trick[0]] << 10
+    winner = trick[0]
+    offset = 0
+    for i in range(1, len(trick)):
+        card = trick[i]
+        if BEATS[base | winner << 5 | card]:
+            winner = card
+            offset = i
+    return offset, winner
+
+
+def trick_points(trick):
+    """Очки карт взятки"""
+    return sum(POINTS[card] for card in trick)
+
+
+def trump_order(rank, suit):
+    """Порядок козыря по рангу и масти, -1 для простой"""
+    return TRUMP_ORDER[CARD_INDEX[(rank, suit)]]
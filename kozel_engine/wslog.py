@@ -0,0 +1,346 @@
+"""
+Потоковый разбор дампов WebSocket в записи конов
+
+WEBSOCKET_INTERCEPTOR (kozel_online_specific.py) складывает каждое
+сообщение в window.__wsData как {direction, data, time}; выгруженный
+массив доходит до сотен мегабайт, и json.load такого файла не помещается
+в память. Здесь дамп читается кусками по CHUNK_SIZE символов и
+разбирается по одному сообщению (json.JSONDecoder.raw_decode), а кон
+собирается конечным автоматом - в памяти только текущий кон и
+недочитанное сообщение, сколько бы ни весил файл.
+
+Цепочка генераторов:
+    iter_messages(path)   -> данные сообщений (массив JSON или JSON Lines, .gz)
+    iter_events(messages) -> ('deal', карты, кон) / ('card', позиция, карта) /
+                             ('result', данные)
+    iter_kons(events)     -> записи конов (dict, готовый к JSON)
+
+Сообщения распознаются по тем же ключам, что ищет перехватчик:
+раздача - myCards / hand / cards, ход - move / play / turn с card и
+position (bottom, left, top, right или место 0-3 от нас), итог кона -
+konResult / result. Взятки закрываются через tricks.resolve_trick, поимка
+дамы заканчивает кон, как в симуляторе.
+
+Запись кона:
+    {'source', 'kon', 'started', 'ended', 'hand': ['AH', ...],
+     'tricks': [{'leader', 'cards', 'winner', 'points'}],
+     'points': {'us', 'them'}, 'caught': 'us' | 'them' | None,
+     'complete': bool, 'result': данные итога или None}
+
+Много файлов - параллельно, каждый процесс пишет свой JSONL:
+
+    python -m kozel_engine.wslog dumps/*.json --out records/ --workers 4
+"""
+
+import argparse
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .cards import QUEEN_CLUBS, SEVEN_CLUBS, card_name, hand_mask
+from .model import parse_card
+from .simulator import CARDS_PER_HAND, POSITIONS, TRICKS_PER_KON
+from .tricks import resolve_trick
+
+CHUNK_SIZE = 1 << 16
+
+DEAL_KEYS = ('myCards', 'hand', 'cards')
+MOVE_KEYS = ('move', 'play', 'turn')
+RESULT_KEYS = ('konResult', 'result')
+TEAMS = ('us', 'them')
+
+_WHITESPACE = ' \t\r\n'
+
+
+# ============================================================================
+# ЧТЕНИЕ
+# ============================================================================
+
+def _open(path):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_json_values(stream, chunk_size=CHUNK_SIZE):
+    """
+    Значения JSON из потока по одному
+
+    Понимает массив верхнего уровня ([{...}, {...}]) и значения подряд
+    (JSON Lines). В памяти - один кусок и недочитанное значение.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    array = None
+    while True:
+        # Пробелы, а внутри массива - запятые и закрывающая скобка
+        while pos < len(buffer) and (buffer[pos] in _WHITESPACE
+                                     or array and buffer[pos] in ',]'):
+            pos += 1
+        if pos < len(buffer):
+            if array is None:
+                array = buffer[pos] == '['
+                if array:
+                    pos += 1
+                continue
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            # Значение у края куска могло оборваться - дочитать и повторить
+            if end is not None and (end < len(buffer) or eof):
+                pos = end
+                yield value
+                continue
+            if eof:
+                raise ValueError(f"Оборванный JSON: {buffer[pos:pos + 40]!r}")
+        elif eof:
+            return
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_messages(path, outgoing=False, chunk_size=CHUNK_SIZE):
+    """
+    Данные сообщений дампа по одному
+
+    Элемент дампа - {direction, data, time} (как пишет перехватчик) или
+    само сообщение. Исходящие (direction 'out') пропускаются: сервер
+    присылает наши ходы обратно.
+    """
+    with _open(path) as stream:
+        for item in iter_json_values(stream, chunk_size):
+            if not isinstance(item, dict):
+                continue
+            data = item.get('data', item) if 'direction' in item else item
+            if not outgoing and item.get('direction') == 'out':
+                continue
+            if isinstance(data, str):
+                try:
+                    data = json.loads(data)
+                except ValueError:
+                    continue
+            if isinstance(data, dict):
+                yield dict(data, _time=item.get('time'))
+
+
+# ============================================================================
+# СОБЫТИЯ
+# ============================================================================
+
+def _position(data):
+    position = data.get('position', data.get('player', data.get('seat')))
+    if isinstance(position, int) and 0 <= position < 4:
+        return POSITIONS[position]
+    if position in POSITIONS:
+        return position
+    raise ValueError(f"Неизвестная позиция: {position!r}")
+
+
+def iter_events(messages):
+    """
+    События игры из сообщений
+
+    Сообщение без известных ключей или с неразборчивой картой пропускается.
+    Каждое событие - кортеж, последний элемент - время сообщения.
+    """
+    for data in messages:
+        time = data.get('_time')
+        try:
+            for key in DEAL_KEYS:
+                cards = data.get(key)
+                if isinstance(cards, list) and cards:
+                    hand = [parse_card(c.get('card', c) if isinstance(c, dict) else c)
+                            for c in cards]
+                    yield ('deal', hand, data.get('konNumber'), time)
+                    break
+            for key in MOVE_KEYS:
+                move = data.get(key)
+                if isinstance(move, dict) and 'card' in move:
+                    yield ('card', _position(move), parse_card(move['card']), time)
+                    break
+            for key in RESULT_KEYS:
+                result = data.get(key)
+                if isinstance(result, dict):
+                    yield ('result', result, time)
+                    break
+        except ValueError:
+            continue
+
+
+# ============================================================================
+# КОНЫ
+# ============================================================================
+
+class _Kon:
+    """Собираемый кон"""
+
+    def __init__(self, source, number, hand, time):
+        self.source = source
+        self.number = number
+        self.hand = hand
+        self.hand_mask = hand_mask(hand)
+        self.started = self.ended = time
+        self.tricks = []
+        self.trick = []             # [(позиция, номер карты)]
+        self.played = 0
+        self.points = [0, 0]
+        self.caught = None
+        self.result = None
+
+    @property
+    def finished(self):
+        return self.caught is not None or len(self.tricks) == TRICKS_PER_KON
+
+    def play(self, position, card, time):
+        if self.finished or self.played >> card & 1:
+            return                  # повтор сообщения после переподключения
+        self.played |= 1 << card
+        self.ended = time
+        trick = self.trick
+        trick.append((position, card))
+        team = POSITIONS.index(position) & 1
+
+        # Поимка дамы: Q♣ и 7♣ в одной взятке от разных команд
+        if card == QUEEN_CLUBS or card == SEVEN_CLUBS:
+            other = SEVEN_CLUBS if card == QUEEN_CLUBS else QUEEN_CLUBS
+            for other_position, other_card in trick:
+                if other_card == other and (POSITIONS.index(other_position) & 1) != team:
+                    seven = position if card == SEVEN_CLUBS else other_position
+                    self.caught = TEAMS[POSITIONS.index(seven) & 1]
+                    return
+
+        if len(trick) < 4:
+            return
+        (leader, c0), (_, c1), (_, c2), (_, c3) = trick
+        offset, points = resolve_trick(c0, c1, c2, c3)
+        winner = trick[offset][0]
+        self.points[POSITIONS.index(winner) & 1] += points
+        self.tricks.append({
+            'leader': leader,
+            'cards': [card_name(c) for _, c in trick],
+            'winner': winner,
+            'points': points,
+        })
+        self.trick = []
+
+    def record(self):
+        return {
+            'source': self.source,
+            'kon': self.number,
+            'started': self.started,
+            'ended': self.ended,
+            'hand': [repr(card) for card in self.hand],
+            'tricks': self.tricks,
+            'points': dict(zip(TEAMS, self.points)),
+            'caught': self.caught,
+            'complete': self.finished,
+            'result': self.result,
+        }
+
+
+def iter_kons(events, source=None):
+    """
+    Записи конов из событий; в памяти только текущий кон
+
+    Новый кон - раздача из 8 карт, отличных от руки текущего кона
+    (меньше карт - обновление посреди кона). Кон отдаётся на следующей
+    раздаче или в конце потока - итог кона приходит уже после последней
+    взятки. Ходы до первой раздачи (дамп начат посреди кона) пропускаются.
+    """
+    kon = None
+    count = 0
+    for event in events:
+        kind = event[0]
+        if kind == 'deal':
+            _, hand, number, time = event
+            mask = hand_mask(hand)
+            # Неполная рука - обновление посреди кона, та же рука - повтор раздачи
+            if len(hand) != CARDS_PER_HAND or kon is not None and mask == kon.hand_mask:
+                continue
+            if kon is not None and kon.played:
+                yield kon.record()
+            count += 1
+            kon = _Kon(source, number if isinstance(number, int) else count, hand, time)
+        elif kind == 'card' and kon is not None:
+            _, position, card, time = event
+            kon.play(position, card.index, time)
+        elif kind == 'result' and kon is not None:
+            kon.result = event[1]
+            if event[2] is not None:
+                kon.ended = event[2]
+    if kon is not None and kon.played:
+        yield kon.record()
+
+
+def parse_dump(path, outgoing=False, chunk_size=CHUNK_SIZE):
+    """Записи конов одного дампа (генератор)"""
+    messages = iter_messages(path, outgoing, chunk_size)
+    return iter_kons(iter_events(messages), source=os.path.basename(str(path)))
+
+
+def iter_records(paths, outgoing=False):
+    """Записи конов нескольких дампов подряд"""
+    for path in paths:
+        yield from parse_dump(path, outgoing)
+
+
+# ============================================================================
+# ПАРАЛЛЕЛЬНО ПО ФАЙЛАМ
+# ============================================================================
+
+def _convert_one(task):
+    path, out_path, outgoing = task
+    kons = 0
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for record in parse_dump(path, outgoing):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            kons += 1
+    os.replace(tmp_path, out_path)
+    return path, out_path, kons
+
+
+def convert_dumps(paths, out_dir, workers=None, outgoing=False):
+    """
+    Разобрать дампы в JSONL (по файлу на дамп) в пуле процессов
+
+    Returns:
+        {путь дампа: число конов}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = []
+    for path in paths:
+        name = os.path.basename(str(path))
+        for suffix in ('.gz', '.json', '.jsonl', '.txt'):
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+        tasks.append((str(path), os.path.join(out_dir, name + '.kons.jsonl'), outgoing))
+    workers = min(workers or os.cpu_count(), len(tasks)) or 1
+    if workers == 1:
+        results = map(_convert_one, tasks)
+        return {path: kons for path, _, kons in results}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return {path: kons for path, _, kons in pool.map(_convert_one, tasks)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Дампы WebSocket -> JSONL с конами")
+    parser.add_argument('dumps', nargs='+', help="файлы window.__wsData (.json, .jsonl, .gz)")
+    parser.add_argument('--out', default='kons', help="каталог для JSONL")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--outgoing', action='store_true',
+                        help="учитывать исходящие сообщения")
+    args = parser.parse_args(argv)
+    counts = convert_dumps(args.dumps, args.out, args.workers, args.outgoing)
+    for path, kons in counts.items():
+        print(f"{path}: {kons} конов")
+
+
+if __name__ == '__main__':
+    main()
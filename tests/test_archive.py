@@ -0,0 +1,134 @@
+"""Двоичный архив партий: упаковка, индекс, конвертеры из JSON"""
+
+import json
+import random
+
+import pytest
+
+from kozel_engine.archive import (
+    KON_HEADER,
+    RECORDED,
+    UNKNOWN,
+    Archive,
+    ArchiveWriter,
+    game_from_dict,
+    game_to_dict,
+    games_from_kon_records,
+    games_from_move_history,
+    pack_cards,
+    play_game,
+    unpack_cards,
+    write_archive,
+)
+from kozel_engine.simulator import RandomPolicy, game_rng
+
+POLICIES = [RandomPolicy()] * 4
+
+
+def self_play(n, seed=0):
+    return [play_game(POLICIES, game_rng(seed, i)) for i in range(n)]
+
+
+def test_pack_cards_round_trip():
+    rng = random.Random(1)
+    for n in range(33):
+        cards = [rng.randrange(32) for _ in range(n)]
+        data = pack_cards(cards)
+        assert len(data) == (5 * n + 7) // 8
+        assert unpack_cards(data, n) == cards
+
+
+def test_self_play_games_are_complete():
+    for game in self_play(5):
+        assert max(game.score) >= 12
+        for kon in game.kons:
+            assert sum(h.bit_count() for h in kon.hands) == 32
+            played = [card for trick in kon.tricks for card in trick.cards]
+            assert len(set(played)) == len(played)
+            for trick in kon.tricks:
+                # Карта места (leader + i) - из его руки
+                for i, card in enumerate(trick.cards):
+                    assert kon.hands[(trick.leader + i) % 4] >> card & 1
+            if kon.caught is None:
+                assert len(played) == 32 and sum(kon.points) == 120
+
+
+def test_random_access_through_index(tmp_path):
+    games = self_play(40, seed=3)
+    path = str(tmp_path / 'games.kzga')
+    assert write_archive(path, games) == 40
+
+    with Archive(path) as archive:
+        assert len(archive) == 40
+        for i in random.Random(2).sample(range(40), 40):
+            assert archive[i] == games[i]
+        assert archive[-1] == games[-1]
+        assert list(archive) == games
+        with pytest.raises(IndexError):
+            archive[40]
+
+    # Полный кон самоигры: заголовок, 8 байт взяток, 32 карты по 5 бит
+    kons = sum(len(g.kons) for g in games)
+    json_size = len(json.dumps([game_to_dict(g) for g in games]))
+    binary_size = (tmp_path / 'games.kzga').stat().st_size
+    assert binary_size <= 6 + 40 * 6 + kons * (KON_HEADER.size + 8 + 20)
+    assert json_size > 10 * binary_size
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = str(tmp_path / 'games.kzga')
+    with ArchiveWriter(path) as writer:
+        writer.add(self_play(1)[0])
+    with open(path + '.idx', 'r+b') as f:
+        f.write(b'XXXX')
+    with pytest.raises(ValueError):
+        Archive(path)
+
+
+def test_dict_round_trip():
+    for game in self_play(3, seed=5):
+        assert game_from_dict(json.loads(json.dumps(game_to_dict(game)))) == game
+
+
+def test_move_history_export():
+    def card(name):
+        return {'rank': name[:-1], 'suit': {'C': 'clubs', 'S': 'spades',
+                                            'H': 'hearts', 'D': 'diamonds'}[name[-1]]}
+
+    hand = ['AH', '7S', 'QC', '10D', 'KS', '9H', 'JD', '8C']
+    export = {'games': [{
+        'result': 'win', 'finalScore': [4, 12],
+        'moves': [
+            {'myCards': [card(c) for c in hand], 'tableCards': [],
+             'playedCard': card('AH')},
+            {'myCards': [card(c) for c in hand[1:]], 'tableCards': [card('KH'), card('7H')],
+             'playedCard': card('9H')},
+            {'myCards': [card(c) for c in hand[:4] + ['AS', 'KD', '9C', '8H']],
+             'tableCards': [card('10S')], 'playedCard': card('7S')},
+        ],
+    }]}
+    (game,) = games_from_move_history(export)
+    assert game.winner == 0 and game.score == (4, 12) and game.source == RECORDED
+    assert len(game.kons) == 2
+    first, second = game.kons
+    assert first.tricks[0].leader == 0 and len(first.tricks[0].cards) == 1
+    assert first.tricks[1].leader == 2 and len(first.tricks[1].cards) == 3
+    assert second.tricks[0].leader == 3
+    assert first.points == (UNKNOWN, UNKNOWN) and first.hands[1:] == (0, 0, 0)
+
+
+def test_kon_records_from_wslog(tmp_path):
+    from test_wslog import simulated_messages, write_array
+    from kozel_engine.wslog import parse_dump
+
+    messages, results = simulated_messages(2, seed=1)
+    path = tmp_path / 'dump.json'
+    write_array(path, messages)
+    games = list(games_from_kon_records(parse_dump(path)))
+    assert len(games) == 2
+    kons = [kon for game in games for kon in game.kons]
+    assert [kon.kon_number for kon in kons] == [r.kon_number for r in results]
+    for kon, result in zip(kons, results):
+        if result.caught is None:
+            assert kon.points == result.points
+        assert kon.caught == result.caught
@@ -0,0 +1,55 @@
+"""Пакетная оценка на NumPy против поштучных legal_moves и trick_winner"""
+
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from kozel_engine.batch import (  # noqa: E402
+    bits_to_masks,
+    evaluate,
+    legal_masks,
+    masks_to_bits,
+)
+from kozel_engine.cards import NO_CARD, legal_moves  # noqa: E402
+from kozel_engine.tricks import trick_points, trick_winner  # noqa: E402
+
+
+def random_positions(n, seed):
+    """Руки, столы из 0-4 карт и запреты N случайных позиций"""
+    rng = random.Random(seed)
+    hands, tricks, bans = [], [], []
+    deck = list(range(32))
+    for _ in range(n):
+        rng.shuffle(deck)
+        size = rng.randint(1, 8)
+        on_table = rng.randint(0, 4)
+        hands.append(sum(1 << card for card in deck[:size]))
+        tricks.append(deck[size:size + on_table] + [NO_CARD] * (4 - on_table))
+        bans.append(rng.random() < 0.5)
+    return hands, tricks, bans
+
+
+def test_batch_matches_single_position_rules():
+    hands, tricks, bans = random_positions(20000, seed=12)
+    result = evaluate(np.array(hands), np.array(tricks), np.array(bans))
+
+    for i, (hand, trick, ban) in enumerate(zip(hands, tricks, bans)):
+        cards = [card for card in trick if card != NO_CARD]
+        assert result.legal[i] == legal_moves(hand, trick[0], ban)
+        assert (result.winner_offset[i], result.winner[i]) == trick_winner(cards)
+        assert result.points[i] == trick_points(cards)
+
+
+def test_scalar_ban_and_mask_bits_round_trip():
+    hands, tricks, _ = random_positions(500, seed=3)
+    hands = np.array(hands, dtype=np.uint32)
+    leads = np.full(len(hands), NO_CARD)
+    assert (legal_masks(hands, leads, True) == legal_masks(hands, leads, np.ones(500, bool))).all()
+    assert (legal_masks(hands, leads) == hands).all()
+
+    bits = masks_to_bits(hands)
+    assert bits.shape == (500, 32)
+    assert (bits.sum(axis=1) == [int(h).bit_count() for h in hands]).all()
+    assert (bits_to_masks(bits) == hands).all()
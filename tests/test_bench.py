@@ -0,0 +1,53 @@
+"""Замеры: прогон, сравнение с базой, полнота базы"""
+
+import json
+
+from kozel_engine.bench import (
+    BENCHMARKS,
+    DEFAULT_BASELINE,
+    STRATEGIES,
+    compare,
+    fixture_states,
+    main,
+    run_benchmarks,
+    select,
+    strategy_states,
+)
+
+
+def test_quick_run():
+    names = select(['resolve_trick', 'choose_card[default]', 'recommend_http[cached]'])
+    report = run_benchmarks(names, samples=3, sample_time=0.001)
+    assert list(report['benchmarks']) == names
+    for result in report['benchmarks'].values():
+        assert result['ops_per_sec'] > 0
+        assert result['p50_us'] <= result['p90_us'] <= result['p99_us']
+
+
+def test_every_strategy_has_positions():
+    buckets = strategy_states(fixture_states(games=10))
+    assert all(buckets[name] for name in STRATEGIES)
+
+
+def test_compare_flags_slowdown():
+    baseline = {'benchmarks': {'a': {'p50_us': 10.0}, 'b': {'p50_us': 10.0}}}
+    report = {'benchmarks': {'a': {'p50_us': 14.0}, 'b': {'p50_us': 11.0},
+                             'new': {'p50_us': 99.0}}}
+    assert [r[0] for r in compare(report, baseline, threshold=0.25)] == ['a']
+    assert compare(report, baseline, threshold=0.5) == []
+
+
+def test_cli_exit_code(tmp_path):
+    baseline = tmp_path / 'base.json'
+    baseline.write_text(json.dumps({'benchmarks': {'resolve_trick': {'p50_us': 1e-6}}}))
+    out = tmp_path / 'run.json'
+    args = ['--only', 'resolve_trick', '--samples', '2', '--out', str(out)]
+    assert main(args + ['--baseline', str(baseline)]) == 1
+    assert main(args + ['--baseline', str(baseline), '--threshold', '1e12']) == 0
+    assert 'resolve_trick' in json.loads(out.read_text())['benchmarks']
+
+
+def test_baseline_covers_all_benchmarks():
+    with open(DEFAULT_BASELINE, encoding='utf-8') as f:
+        baseline = json.load(f)
+    assert sorted(baseline['benchmarks']) == sorted(BENCHMARKS)
@@ -0,0 +1,67 @@
+"""Маски карт и легальные ходы KozelAI"""
+
+import random
+
+from kozel_bot_architecture import Card, GameState, KozelAI
+from kozel_engine.cards import (
+    CARD_INDEX,
+    NO_CARD,
+    RANKS,
+    SUITS,
+    TRUMP_MASK,
+    hand_mask,
+    legal_moves,
+)
+
+DECK = [Card(rank, suit) for suit in SUITS for rank in RANKS]
+
+
+def is_trump(card):
+    return card.rank in ('J', 'Q') or card.suit == 'clubs'
+
+
+def naive_legal(cards, lead, no_trump_lead):
+    """Правила захода и подкладывания без масок"""
+    if lead is None:
+        if no_trump_lead:
+            return [c for c in cards if not is_trump(c)] or cards
+        return cards
+    if is_trump(lead):
+        return cards
+    return [c for c in cards if not is_trump(c) and c.suit == lead.suit] or cards
+
+
+def test_hand_mask_uses_cached_index():
+    assert hand_mask(DECK) == (1 << 32) - 1
+    assert hand_mask([('Q', 'clubs')]) == 1 << CARD_INDEX[('Q', 'clubs')]
+    card = Card('7', 'hearts')
+    assert hand_mask([card]) == 1 << card.index
+
+
+def test_trump_mask():
+    assert [c for c in DECK if TRUMP_MASK >> c.index & 1] == [c for c in DECK if is_trump(c)]
+
+
+def test_legal_cards_match_rules():
+    rng = random.Random(7)
+    ai = KozelAI()
+    deck = list(DECK)
+    for _ in range(2000):
+        rng.shuffle(deck)
+        size = rng.randint(1, 8)
+        state = GameState()
+        state.my_cards = deck[:size]
+        lead = deck[size] if rng.random() < 0.6 else None
+        state.table_cards = [('left', lead)] if lead else []
+        state.kon_number = rng.choice((1, 2))
+        state.my_team_opened_last_kon = rng.random() < 0.5
+        state.my_team_led_in_kon = rng.random() < 0.5
+        no_trump_lead = state.kon_number == 1 or (
+            state.my_team_opened_last_kon and not state.my_team_led_in_kon)
+
+        expected = naive_legal(state.my_cards, lead, no_trump_lead)
+        assert ai._get_legal_cards(state) == expected
+
+        mask = legal_moves(hand_mask(state.my_cards),
+                           lead.index if lead else NO_CARD, no_trump_lead)
+        assert mask == hand_mask(expected)
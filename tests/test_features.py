@@ -0,0 +1,144 @@
+"""Признаки MLStateEncoder на NumPy против ml-encoder.js"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from kozel_engine.archive import play_game, write_archive  # noqa: E402
+from kozel_engine.cards import card_name  # noqa: E402
+from kozel_engine.features import (  # noqa: E402
+    INPUT_SIZE,
+    build_dataset,
+    encode_states,
+    examples_from_games,
+    open_shards,
+    states_from_game_states,
+    write_shards,
+)
+from kozel_engine.simulator import POSITIONS, RandomPolicy, game_rng  # noqa: E402
+from kozel_engine.tricks import resolve_trick  # noqa: E402
+
+AI_DIR = os.path.join(os.path.dirname(__file__), '..', 'kozel-assistant', 'ai')
+
+# Карты стола - экземпляры Card, как после parseTableCards; состояния
+# объявляются перед драйвером (stdin занят самим скриптом)
+JS_DRIVER = """
+const encoder = new MLStateEncoder();
+const vectors = states.map(state => encoder.encodeGameState(Object.assign({}, state, {
+    tableCards: (state.tableCards || []).map(tc => ({
+        player: tc.player, card: new Card(tc.card.rank, tc.card.suit)
+    }))
+})));
+process.stdout.write(JSON.stringify(vectors));
+"""
+
+
+def card(index):
+    name = card_name(index)
+    return {'rank': name[:-1], 'suit': {'C': 'clubs', 'S': 'spades',
+                                        'H': 'hearts', 'D': 'diamonds'}[name[-1]]}
+
+
+def js_encode(states):
+    sources = []
+    for name in ('card.js', 'rules.js', 'ml-encoder.js'):
+        with open(os.path.join(AI_DIR, name), encoding='utf-8') as f:
+            sources.append(f.read())
+    script = '\n'.join(sources + [f'const states = {json.dumps(states)};', JS_DRIVER])
+    done = subprocess.run(['node'], input=script,
+                          capture_output=True, text=True, check=True, timeout=60)
+    return np.array(json.loads(done.stdout), dtype=np.float32)
+
+
+def self_play(n, seed=0):
+    return [play_game([RandomPolicy()] * 4, game_rng(seed, i)) for i in range(n)]
+
+
+def game_states(games):
+    """gameState расширения перед каждым нашим ходом партий"""
+    states = []
+    for game in games:
+        score = [0, 0]
+        for kon in game.kons:
+            hand = kon.hands[0]
+            points = [0, 0]
+            for trick in kon.tricks:
+                seats = [(trick.leader + i) % 4 for i in range(len(trick.cards))]
+                if 0 in seats:
+                    mine = seats.index(0)
+                    states.append({
+                        'myCards': [card(c) for c in range(32) if hand >> c & 1],
+                        'tableCards': [{'player': POSITIONS[s], 'card': card(c)}
+                                       for s, c in zip(seats, trick.cards[:mine])],
+                        'myTeamScore': points[0], 'opponentScore': points[1],
+                        'myTurn': True,
+                        'teams': {'myGames': score[0], 'opponentGames': score[1]},
+                    })
+                    hand &= ~(1 << trick.cards[mine])
+                if len(trick.cards) == 4:
+                    offset, trick_points = resolve_trick(*trick.cards)
+                    points[seats[offset] & 1] += trick_points
+            if kon.winner in (0, 1):
+                score[1 - kon.winner] += kon.penalty
+    return states
+
+
+EDGE_STATES = [
+    {'myCards': [], 'tableCards': []},
+    {'myCards': [card(5), card(30)], 'myTurn': False,
+     'tableCards': [{'card': card(20)}, {'player': 'left', 'card': card(1)}],
+     'myTeamScore': 37, 'opponentScore': 61},
+    {'myCards': [card(c) for c in range(8)], 'myTurn': True,
+     'tableCards': [{'player': 'top', 'card': card(17)}, {'player': 'right', 'card': card(23)}],
+     'teams': {'myGames': 4, 'opponentGames': 10}},
+]
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="нужен node")
+def test_matches_js_encoder():
+    games = self_play(4, seed=2)
+    states = game_states(games) + EDGE_STATES
+    expected = js_encode(states)
+    assert expected.shape == (len(states), INPUT_SIZE)
+
+    examples, _, _ = examples_from_games(games)
+    got = encode_states(states_from_game_states(states))
+    assert (got == expected).all()
+    assert (encode_states(examples) == expected[:len(examples.hands)]).all()
+
+
+def test_actions_and_rewards():
+    games = self_play(2, seed=5)
+    examples, actions, rewards = examples_from_games(games)
+    x = encode_states(examples)
+    # Сыгранная карта - на руке, награды - в пределах MoveHistory
+    assert (x[np.arange(len(actions)), actions] == 1).all()
+    assert ((rewards >= 0.35) & (rewards <= 1.0)).all()
+    kons = [kon for game in games for kon in game.kons]
+    assert 8 * sum(kon.caught is None for kon in kons) <= len(actions)
+    assert len(actions) <= sum(len(kon.tricks) for kon in kons)
+
+
+def test_shards_round_trip(tmp_path):
+    games = self_play(12, seed=7)
+    examples, actions, rewards = examples_from_games(games)
+    x = encode_states(examples)
+
+    rows = write_shards(games, tmp_path / 'one', shard_size=100)
+    shards = open_shards(tmp_path / 'one')
+    assert rows == len(actions) and len(shards) == -(-rows // 100)
+    assert isinstance(shards[0].x, np.memmap)
+    assert (np.concatenate([s.x for s in shards]) == x).all()
+    assert (np.concatenate([s.action for s in shards]) == actions).all()
+    assert (np.concatenate([s.reward for s in shards]) == rewards).all()
+
+    path = str(tmp_path / 'games.kzga')
+    write_archive(path, games)
+    assert build_dataset(path, tmp_path / 'many', shard_size=100, workers=2) == rows
+    shards = open_shards(tmp_path / 'many')
+    assert (np.concatenate([s.x for s in shards]) == x).all()
@@ -0,0 +1,88 @@
+"""ISMCTS: переиспользование дерева между ходами"""
+
+import copy
+
+from kozel_bot_architecture import KozelAI
+from kozel_engine.cards import hand_mask
+from kozel_engine.ismcts import ISMCTSEngine
+from kozel_engine.simulator import KozelSimulator, RandomPolicy, game_rng
+
+
+class CheckedEngine(ISMCTSEngine):
+    """Проверяет, что после спуска корень - позиция нашего хода"""
+
+    def __init__(self):
+        super().__init__(iterations=40, time_ms=None, seed=1)
+        self.searches = 0
+        self.reused = 0
+        self.forced_before = 0
+
+    def search(self, game_state, legal_cards=None, forbidden=None):
+        result = super().search(game_state, legal_cards, forbidden)
+        hand = hand_mask(game_state.my_cards)
+        # Дети корня - наши карты; чужая карта среди них - корень не тот
+        assert all(hand >> card & 1 for card in self.root.children)
+        self.searches += 1
+        self.reused += result.reused > 0
+        return result
+
+
+def test_tree_reuse_survives_forced_moves():
+    engine = CheckedEngine()
+    ai = KozelAI(evaluator=engine)
+    forced = 0
+    for index in range(6):
+        sim = KozelSimulator([ai, RandomPolicy(), RandomPolicy(), RandomPolicy()],
+                             rng=game_rng(4, index))
+        while not sim.game_over:
+            if sim.to_move == 0 and sim.legal_mask().bit_count() == 1:
+                forced += 1     # ход без поиска: корень дерева не двигается
+            sim.step(sim.choose())
+    assert forced > 0
+    assert engine.searches > 50
+    assert engine.reused > 0
+
+
+def play_to_our_turn(sim):
+    kon = sim.kon_number
+    while sim.to_move != 0:
+        sim.step(sim.choose())
+    return sim.kon_number == kon and not sim.game_over
+
+
+def skipped_decision(index):
+    """
+    Партия, где наш ход D1 сделан без поиска: (симулятор на ходе D0,
+    симулятор на ходе D2) или None. В D1 мы кладём последнюю карту
+    взятки и берём её - без проверки глубины спуск из корня D0 по
+    одной карте D1 попал бы в существующий узел
+    """
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(5, index))
+    sim.play_kon()                      # во втором кону козырем заходить можно
+    if sim.game_over or not play_to_our_turn(sim):
+        return None
+    d0 = copy.deepcopy(sim)
+    sim.step(sim.choose())
+    if not play_to_our_turn(sim) or len(sim.trick) != 3:
+        return None
+    sim.step(sim.choose())
+    if sim.to_move != 0 or sim.trick or sim.game_over:
+        return None
+    return d0, sim
+
+
+def test_move_without_search_resets_stale_root():
+    checked = 0
+    for index in range(200):
+        found = skipped_decision(index)
+        if found is None:
+            continue
+        d0, d2 = found
+        engine = ISMCTSEngine(iterations=300, time_ms=None, seed=index)
+        engine.search(d0.game_state(0))
+        result = engine.search(d2.game_state(0))
+        assert result.reused == 0
+        hand = hand_mask(d2.game_state(0).my_cards)
+        assert all(hand >> card & 1 for card in engine.root.children)
+        checked += 1
+    assert checked >= 5
@@ -0,0 +1,111 @@
+"""Замеры choose_card: гистограммы, стратегии, /metrics сервера"""
+
+import asyncio
+import json
+
+from kozel_bot_architecture import KozelAI
+from kozel_engine.bench import fixture_states
+from kozel_engine.metrics import DecisionMetrics, Histogram
+from kozel_engine.server import RecommendServer
+
+
+def test_histogram_buckets_and_quantile():
+    histogram = Histogram()
+    for ns in (0, 1, 3, 1000, 1000, 1500):
+        histogram.observe(ns)
+    assert histogram.count == 6 and histogram.total == 3504
+    # 1000 и 1500 - в корзине [512, 1024) и [1024, 2048)
+    assert histogram.counts[10] == 2 and histogram.counts[11] == 1
+    assert histogram.quantile(0.5) == 4
+    assert histogram.quantile(1.0) == 2048
+
+    other = Histogram()
+    other.observe(1 << 60)
+    histogram.merge(other)
+    assert histogram.counts[-1] == 1 and histogram.count == 7
+
+
+def test_measured_choices_match_plain():
+    states = fixture_states(games=6)
+    plain = KozelAI()
+    metrics = DecisionMetrics()
+    measured = KozelAI(metrics=metrics)
+    picked = []
+    for state in states:
+        assert measured.choose_card(state) == plain.choose_card(state)
+        assert measured.last_strategy == plain.last_strategy
+        picked.append(plain.last_strategy)
+
+    # Замеры считают ту же стратегию, что choose_card оставил в last_strategy
+    assert metrics.decisions == {name: picked.count(name) for name in set(picked)}
+    assert sum(metrics.decisions.values()) == len(states)
+    assert metrics.decisions['forced'] == sum(len(plain._get_legal_cards(s)) == 1 for s in states)
+    for (phase, strategy), histogram in metrics.histograms.items():
+        assert histogram.count == metrics.decisions[strategy]
+        if strategy == 'forced':
+            assert phase in ('legal', 'total')
+
+    # Выключение возвращает метод класса
+    measured.set_metrics(None)
+    assert 'choose_card' not in measured.__dict__
+    measured.choose_card(states[0])
+    assert sum(metrics.decisions.values()) == len(states)
+
+
+def test_snapshot_and_drain():
+    metrics = DecisionMetrics()
+    metrics.record('default', 800, 300, 5000, 6100)
+    metrics.record('forced', 700)
+    text = metrics.snapshot()
+    assert 'kozel_ai_decisions_total{strategy="default"} 1' in text
+    assert 'kozel_ai_phase_seconds_count{phase="strategy",strategy="default"} 1' in text
+    assert 'kozel_ai_phase_seconds_bucket{phase="total",strategy="forced",le="+Inf"} 1' in text
+    assert 'phase="analyze",strategy="forced"' not in text
+
+    drained = metrics.drain()
+    assert metrics.decisions == {} and drained.decisions == {'default': 1, 'forced': 1}
+    metrics.merge(drained)
+    metrics.merge(drained)
+    assert metrics.decisions['default'] == 2
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split(b' ')[1]), body.decode()
+
+
+def test_server_metrics_endpoint():
+    async def scenario():
+        server = RecommendServer(workers=0, metrics=True)
+        await server.start(port=0)
+        try:
+            results = [await server.recommend({'myCards': hand, 'konNumber': 2})
+                       for hand in (['10H', 'QC', '7S'], ['AH'], ['10H', 'QC', '7S'])]
+            status, text = await get(server.port, '/metrics')
+        finally:
+            server.close()
+        return results, status, text
+
+    results, status, text = asyncio.run(scenario())
+    assert status == 200
+    assert all('metrics' not in r for r in results)
+    assert 'kozel_ai_decisions_total{strategy="forced"} 1' in text
+    # Третий запрос - из кэша, движок не вызывался
+    assert sum(int(line.split()[-1]) for line in text.splitlines()
+               if line.startswith('kozel_ai_decisions_total')) == 2
+
+    async def without_metrics():
+        server = RecommendServer(workers=0)
+        await server.start(port=0)
+        try:
+            return await get(server.port, '/metrics')
+        finally:
+            server.close()
+
+    status, body = asyncio.run(without_metrics())
+    assert status == 404 and 'error' in json.loads(body)
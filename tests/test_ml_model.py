@@ -0,0 +1,117 @@
+"""Пакетные предсказания KozelML в TF.js против предсказаний по одному"""
+
+import json
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from kozel_engine.cards import card_name
+from kozel_engine.simulator import POSITIONS
+
+ASSISTANT_DIR = os.path.join(os.path.dirname(__file__), '..', 'kozel-assistant')
+TF_PATH = os.path.join(ASSISTANT_DIR, 'lib', 'tf.min.js')
+SOURCES = ('ai/card.js', 'ai/rules.js', 'ai/ml-encoder.js', 'ai/ml-loader.js', 'ai/ml-model.js')
+
+JS_DRIVER = """
+const toCard = c => new Card(c.rank, c.suit);
+(async () => {
+    await tf.setBackend('cpu');
+    await mlLoader.loadTensorFlow();
+    const ml = new KozelML();
+    ml.createModel();
+    const requests = states.map(s => ({
+        gameState: Object.assign({}, s, {
+            myCards: s.myCards.map(toCard),
+            tableCards: s.tableCards.map(tc => ({ player: tc.player, card: toCard(tc.card) }))
+        }),
+        legalCards: s.legal.map(toCard)
+    }));
+    const reference = requests.map(r => Array.from(tf.tidy(() => ml.model.predict(
+        tf.tensor2d([ml.encoder.encodeGameState(r.gameState)])).dataSync())));
+
+    // Считаем вызовы модели: весь пакет - один model.predict
+    const predict = ml.model.predict.bind(ml.model);
+    let predictCalls = 0;
+    ml.model.predict = (...args) => {
+        predictCalls++;
+        return predict(...args);
+    };
+
+    const before = tf.memory().numTensors;
+    const batch = await ml.predictBatch(requests);
+    const batchCalls = predictCalls;
+    const single = [];
+    for (const r of requests) {
+        single.push(await ml.predictBestCard(r.gameState, r.legalCards));
+    }
+    const after = tf.memory().numTensors;
+
+    process.stdout.write(JSON.stringify({
+        reference,
+        legal: requests.map(r => r.legalCards.map(c => ml.encoder.encodeAction(c))),
+        batch: batch.map(b => ({ card: ml.encoder.encodeAction(b.card), confidence: b.confidence,
+                                 probabilities: Array.from(b.probabilities) })),
+        single: single.map(q => ml.encoder.encodeAction(q.card)),
+        batchCalls, predictCalls, before, after,
+        memory: ml.getStats().memory
+    }));
+})();
+"""
+
+
+def card(index):
+    name = card_name(index)
+    return {'rank': name[:-1], 'suit': {'C': 'clubs', 'S': 'spades',
+                                        'H': 'hearts', 'D': 'diamonds'}[name[-1]]}
+
+
+def random_states(n, seed=0):
+    rng = random.Random(seed)
+    states = []
+    for _ in range(n):
+        cards = rng.sample(range(32), 12)
+        hand, table = cards[:rng.randint(1, 8)], cards[8:8 + rng.randint(0, 3)]
+        states.append({
+            'myCards': [card(c) for c in hand],
+            'tableCards': [{'player': POSITIONS[(i - len(table)) % 4], 'card': card(c)}
+                           for i, c in enumerate(table)],
+            'legal': [card(c) for c in rng.sample(hand, rng.randint(1, len(hand)))],
+            'myTeamScore': rng.randint(0, 120), 'opponentScore': rng.randint(0, 120),
+            'myTurn': True,
+        })
+    return states
+
+
+@pytest.mark.skipif(shutil.which('node') is None or not os.path.exists(TF_PATH),
+                    reason="нужны node и kozel-assistant/lib/tf.min.js")
+def test_batch_matches_single_predictions():
+    states = random_states(40)
+    # Логи модулей и model.summary() - в stderr, stdout - только результат
+    sources = ['console.log = console.error;',
+               f'const tf = require({json.dumps(os.path.abspath(TF_PATH))});']
+    for name in SOURCES:
+        with open(os.path.join(ASSISTANT_DIR, name), encoding='utf-8') as f:
+            sources.append(f.read())
+    script = '\n'.join(sources + [f'const states = {json.dumps(states)};', JS_DRIVER])
+    done = subprocess.run(['node'], input=script, capture_output=True, text=True,
+                          check=True, timeout=120)
+    result = json.loads(done.stdout)
+
+    for reference, legal, got, single in zip(result['reference'], result['legal'],
+                                             result['batch'], result['single']):
+        assert got['probabilities'] == pytest.approx(reference, abs=1e-6)
+        best = max(legal, key=lambda i: reference[i])
+        assert got['card'] == single == best
+        assert got['confidence'] == pytest.approx(reference[best], abs=1e-6)
+
+    # 40 состояний - один вызов модели, по одному - по вызову на состояние
+    assert result['batchCalls'] == 1
+    assert result['predictCalls'] == 1 + len(states)
+    # Тензоры пакетов освобождены
+    assert result['after'] == result['before']
+    memory = result['memory']
+    assert memory['leakedTensors'] == 0
+    assert memory['batches'] == 1 + len(states) and memory['maxBatch'] == len(states)
@@ -0,0 +1,143 @@
+"""GameState: события хода, взятки и кона против симулятора, undo"""
+
+import pytest
+
+from kozel_bot_architecture import update_game_state
+from kozel_engine.model import GameState
+from kozel_engine.simulator import CARDS, POSITIONS, KozelSimulator, RandomPolicy, game_rng
+
+
+def snapshot(state):
+    """Поля состояния, сравнимые с game_state симулятора"""
+    return (
+        sorted(c.index for c in state.my_cards),
+        [(p, c.index) for p, c in state.table_cards],
+        sorted(c.index for c in state.played_cards),
+        [(p, c.index) for p, c in state.last_trick],
+        state.points_in_kon, state.tricks_taken, state.kon_number,
+        state.my_team_score, state.opponent_score, state.current_player,
+        state.my_team_led_in_kon, state.opponents_led_in_kon,
+        state.my_team_opened_last_kon, dict(state.cards_left),
+    )
+
+
+def replay(seed):
+    """Партия симулятора и GameState места 0, который ведётся событиями"""
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(seed, 0))
+    state = sim.game_state(0)
+    states = [snapshot(state)]
+    while sim.winner is None:
+        seat = sim.to_move
+        card = sim.choose()
+        full = len(sim.trick) == 3
+        result = sim.step(card)
+        state.play_card(POSITIONS[seat], CARDS[card])
+        if full and result is None or result is not None and result.caught is None:
+            state.close_trick()
+        if result is not None and sim.winner is None:
+            state.end_kon(sim.score[0], sim.score[1],
+                          [CARDS[c] for c in range(32) if sim.hands[0] >> c & 1],
+                          POSITIONS[sim.opener])
+        if sim.winner is None:
+            assert snapshot(state) == snapshot(sim.game_state(0))
+        states.append(snapshot(state))
+    return state, states
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_events_track_simulator(seed):
+    replay(seed)
+
+
+def test_undo_restores_every_step():
+    state, states = replay(4)
+    kon = state.kon_number
+    assert kon > 3
+    # История - только текущий и прошлый кон
+    assert sum(kind == 'kon' for kind, _, _ in state.history) == 2
+    seen = [snapshot(state)]
+    while state.history:
+        state.undo()
+        seen.append(snapshot(state))
+    # Каждое состояние этих конов встречается при откате
+    assert all(s in seen for s in states if s[6] >= kon - 1)
+    assert seen[-1][6] == kon - 2
+    with pytest.raises(IndexError):
+        state.undo()
+
+
+def test_observe_table_catches_up():
+    state = GameState()
+    state.my_cards = [CARDS[0], CARDS[9]]
+    table = [('left', CARDS[3]), ('top', CARDS[5])]
+    assert state.observe_table(table[:1]) == 1
+    assert state.observe_table(table) == 1
+    assert state.opponents_led_in_kon and state.kon_opener == 'left'
+
+    state.play_card('bottom', CARDS[0])
+    state.play_card('right', CARDS[7])
+    # Новая взятка: старая закрывается, новые карты доигрываются
+    assert state.observe_table([('right', CARDS[16])]) == 2
+    assert len(state.played_cards) == 4 and state.table_cards[0][1] is CARDS[16]
+
+    with pytest.raises(ValueError):
+        state.observe_table([('left', CARDS[20])])
+    with pytest.raises(ValueError):
+        state.play_card('bottom', CARDS[31])
+
+
+class Page:
+    """Снимок страницы для update_game_state: что видит VisionModule"""
+
+    def __init__(self):
+        self.hand, self.table, self.scores = [], [], {'my': 0, 'opponent': 0}
+
+    def parse_my_cards(self):
+        return list(self.hand)
+
+    def parse_table_state(self):
+        return list(self.table)
+
+    def get_scores(self):
+        return dict(self.scores)
+
+
+def test_update_path_follows_game_without_rebuild():
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(5, 0))
+    page = Page()
+    state, rebuilds = None, 0
+
+    def poll(hand, table):
+        nonlocal state, rebuilds
+        page.hand, page.table = hand, table
+        page.scores = {'my': sim.score[0], 'opponent': sim.score[1]}
+        state, rebuilt = update_game_state(state, page)
+        rebuilds += rebuilt
+
+    def hand_cards(mask):
+        return [CARDS[c] for c in range(32) if mask >> c & 1]
+
+    poll(hand_cards(sim.hands[0]), [])
+    kons = 1
+    while sim.winner is None:
+        seat, leader, trick = sim.to_move, sim.leader, list(sim.trick)
+        card = sim.choose()
+        hand = sim.hands[0] & ~(1 << card) if seat == 0 else sim.hands[0]
+        if seat == 0:
+            state.play_card('bottom', CARDS[card])
+        result = sim.step(card)
+        if sim.winner is not None:
+            break
+        # Стол сразу после карты (в том числе полная взятка), затем после уборки
+        shown = [(POSITIONS[(leader + i) % 4], CARDS[c]) for i, c in enumerate(trick + [card])]
+        if result is None or result.caught is None:
+            poll(hand_cards(hand), shown)
+        if len(shown) == 4 or result is not None:
+            kons += result is not None
+            table = [(POSITIONS[(sim.leader + i) % 4], CARDS[c]) for i, c in enumerate(sim.trick)]
+            poll(hand_cards(sim.hands[0]), table)
+            assert snapshot(state)[:9] == snapshot(sim.game_state(0))[:9]
+            assert state.my_team_opened_last_kon == sim.game_state(0).my_team_opened_last_kon
+
+    assert kons > 3 and state.kon_number == sim.kon_number
+    assert rebuilds == 1  # только первый опрос
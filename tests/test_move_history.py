@@ -0,0 +1,80 @@
+"""Счётчики аналитики MoveHistory против перебора последних ходов"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+MOVE_HISTORY = os.path.join(os.path.dirname(__file__), '..', 'kozel-assistant', 'ai', 'move-history.js')
+
+JS_DRIVER = """
+const { MoveAggregates } = require(%(path)s);
+const SIZE = 50;
+const ranks = ['7', '8', '9', '10', 'J', 'Q', 'K', 'A'];
+const suits = ['clubs', 'spades', 'hearts', 'diamonds'];
+let seed = 7;  // Парк-Миллер: произведение точно помещается в double
+const rand = n => (seed = seed * 16807 %% 2147483647) %% n;
+
+// Перебор окна - так аналитика считалась до счётчиков
+function scan(moves) {
+    const followed = { total: 0, wins: 0 }, ignored = { total: 0, wins: 0 };
+    const byCard = {}, firstLead = {};
+    for (const m of moves) {
+        const key = m.playedCard.rank + '_' + m.playedCard.suit;
+        if (m.aiRecommendation) {
+            const bucket = m.wasRecommended ? followed : ignored;
+            bucket.total++;
+            if (m.trickWon) bucket.wins++;
+        }
+        const card = byCard[key] = byCard[key] || { total: 0, wins: 0, points: 0 };
+        card.total++;
+        if (m.trickWon) card.wins++;
+        card.points += m.pointsGained || 0;
+        if (m.isFirstInTrick) {
+            const lead = firstLead[key] = firstLead[key] || { wins: 0, total: 0 };
+            lead.total++;
+            if (m.trickWon) lead.wins++;
+        }
+    }
+    return { length: moves.length, followed, ignored, byCard, firstLead };
+}
+
+const aggregates = new MoveAggregates(SIZE);
+const moves = [];
+const checks = [];
+for (let i = 0; i < 180; i++) {
+    const move = {
+        playedCard: { rank: ranks[rand(8)], suit: suits[rand(4)] },
+        isFirstInTrick: rand(4) === 0,
+        aiRecommendation: rand(3) ? { rank: 'A', suit: 'clubs' } : null,
+        wasRecommended: rand(2) === 0,
+        trickWon: rand(2) === 0,
+        pointsGained: rand(3) ? rand(30) : undefined
+    };
+    moves.push(move);
+    aggregates.add(move);
+    if (i %% 7 === 0 || i === 179) {
+        const { length, followed, ignored, byCard, firstLead } = aggregates;
+        const got = JSON.parse(JSON.stringify({ length, followed, ignored, byCard, firstLead }));
+        checks.push({ got, want: scan(moves.slice(-SIZE)) });
+    }
+}
+process.stdout.write(JSON.stringify(checks));
+"""
+
+
+def sort_keys(value):
+    return json.loads(json.dumps(value, sort_keys=True))
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="нужен node")
+def test_aggregates_match_window_scan():
+    script = JS_DRIVER % {'path': json.dumps(os.path.abspath(MOVE_HISTORY))}
+    done = subprocess.run(['node'], input=script, capture_output=True, text=True,
+                          check=True, timeout=60)
+    checks = json.loads(done.stdout)
+    assert checks[-1]['got']['length'] == 50
+    for check in checks:
+        assert sort_keys(check['got']) == sort_keys(check['want'])
@@ -0,0 +1,71 @@
+"""PIMC: бюджет времени, согласованность выборок с рукой, пустыми мастями и запретами"""
+
+import random
+import time
+
+import pytest
+
+from kozel_engine.cards import SUIT_MASK, count, hand_mask
+from kozel_engine.pimc import PIMCEvaluator, _unseen, observe, sample_hands
+from kozel_engine.simulator import KozelSimulator, RandomPolicy, game_rng
+
+
+def decision_with_void(seed):
+    """Ход места 0 с выбором, когда оно уже знает о пустой масти у кого-то из других"""
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(seed, 0), track_cards=True)
+    while True:
+        if sim.to_move == 0 and sim.trackers[0].forbidden() and count(sim.legal_mask()) > 1:
+            return sim, sim.game_state(0)
+        sim.step(sim.choose())
+
+
+def test_samples_keep_known_hand_and_voids():
+    sim, state = decision_with_void(1)
+    observation = observe(state)
+    forbidden = state.tracker.forbidden()
+    unseen = _unseen(observation)
+    rng = random.Random(0)
+    for _ in range(200):
+        hands = sample_hands(observation, rng, forbidden)
+        assert hands[0] == hand_mask(state.my_cards)
+        assert [count(h) for h in hands] == list(observation.counts)
+        assert hands[1] | hands[2] | hands[3] == unseen
+        assert not hands[1] & hands[2] and not hands[1] & hands[3] and not hands[2] & hands[3]
+        # Масти, в которых место показало пустоту, ему не раздаются
+        for seat, mask in forbidden.items():
+            assert hands[seat] & mask == 0
+
+
+def test_tight_forbidden_masks_are_honored():
+    # Запреты, которые случайная раздача почти не выполняет: у места 1
+    # только две масти, у места 3 - только две другие; остаётся жадная раздача
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(2, 0))
+    observation = observe(sim.game_state(sim.to_move))
+    unseen = _unseen(observation)
+    first, second = sorted(SUIT_MASK, key=lambda mask: -count(unseen & mask))[:2]
+    allowed = first | second
+    assert count(unseen & allowed) >= observation.counts[1]
+    assert count(unseen & ~allowed) >= observation.counts[3]
+    forbidden = {1: unseen & ~allowed, 3: unseen & allowed}
+    rng = random.Random(5)
+    for _ in range(50):
+        hands = sample_hands(observation, rng, forbidden)
+        assert hands[1] & ~allowed == 0
+        assert hands[3] & allowed == 0
+        assert hands[1] | hands[2] | hands[3] == unseen
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_time_budget_is_respected(workers):
+    _, state = decision_with_void(3)
+    with PIMCEvaluator(budget_ms=150, workers=workers, seed=0) as evaluator:
+        # Пул уже запущен: первый ход не ждёт старта процессов
+        started = time.time()
+        result = evaluator.evaluate(state)
+        elapsed = time.time() - started
+    assert result.samples >= workers
+    assert result.elapsed <= elapsed
+    # Последняя выборка не начинается, если не успевает; запас - на
+    # разброс длительности выборок и обмен с пулом
+    assert elapsed < 0.15 * 1.5 + 0.05
+    assert result.best_move in {card.index for card in state.my_cards}
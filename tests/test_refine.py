@@ -0,0 +1,138 @@
+"""Уточнение моделью: дедлайн, память ответов, заглушка Messages API"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from kozel_engine.refine import ModelClient, Refiner
+from kozel_engine.server import RecommendServer
+
+
+class StubModel:
+    """Локальная заглушка /v1/messages: отвечает answer через delay секунд"""
+
+    def __init__(self, answer, delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.requests.append(body)
+                time.sleep(stub.delay)
+                payload = json.dumps({
+                    'type': 'message',
+                    'content': [{'type': 'text', 'text': stub.answer}],
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/messages"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def rules(tmp_path):
+    path = tmp_path / 'rules.txt'
+    path.write_text("Козыри: все вальты, все дамы, все трефы.", encoding='utf-8')
+    return path
+
+
+def game_state(*cards):
+    return {'myCards': list(cards), 'konNumber': 2}
+
+
+def serve(stub, rules, deadline_ms, requests):
+    """Ответы сервера kozelai с уточнением на последовательные запросы"""
+    async def scenario():
+        refiner = Refiner(ModelClient(api_key='test', url=stub.url), rules_path=rules)
+        server = RecommendServer('kozelai', workers=0, refiner=refiner,
+                                 deadline_ms=deadline_ms)
+        results = []
+        for data, pause in requests:
+            await asyncio.sleep(pause)
+            started = time.perf_counter()
+            result = await server.recommend(data)
+            results.append((result, time.perf_counter() - started))
+        return server, results
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        stub.close()
+
+
+def test_refined_answer_is_memoized(rules):
+    stub = StubModel('Ход: {"card": "7S", "reasoning": "сбросить мелочь"}')
+    state = game_state('AH', '7S', 'QC', '10D')
+    server, results = serve(stub, rules, 2000, [(state, 0), (state, 0)])
+
+    (first, _), (second, _) = results
+    assert first['tier'] == 'refined' and first['card'] == {'rank': '7', 'suit': 'spades'}
+    assert first['reasoning'] == 'сбросить мелочь'
+    assert second['tier'] == 'refined' and second['cached'] is True
+    assert len(stub.requests) == 1
+    assert server.stats()['refine_hits'] == 1
+
+    body = stub.requests[0]
+    system = body['system'][0]
+    assert 'Козыри: все вальты' in system['text']
+    assert system['cache_control'] == {'type': 'ephemeral'}
+    assert 'Мои карты: AH 7S QC 10D' in body['messages'][0]['content']
+
+
+def test_slow_model_does_not_miss_the_deadline(rules):
+    stub = StubModel('{"card": "7S", "reasoning": "поздно"}', delay=0.5)
+    state = game_state('AH', '7S', 'QC', '10D')
+    server, results = serve(stub, rules, 200, [(state, 0), (state, 0.6)])
+
+    (first, elapsed), (second, _) = results
+    assert first['tier'] == 'local'
+    assert elapsed < 0.4
+    # Запрос модели доиграл в фоне - следующий опрос того же состояния
+    assert second['tier'] == 'refined' and second['card']['rank'] == '7'
+    assert len(stub.requests) == 1
+    assert server.stats()['refine_late'] == 1
+
+
+def test_no_refinement_without_budget(rules):
+    stub = StubModel('{"card": "7S"}')
+    server, results = serve(stub, rules, 0, [(game_state('AH', '7S'), 0)])
+    assert results[0][0]['tier'] == 'local'
+    assert stub.requests == []
+    assert server.stats()['refine_skipped'] == 1
+
+
+def test_illegal_card_keeps_local_answer(rules):
+    stub = StubModel('{"card": "AS", "reasoning": "нет такой карты"}')
+    state = game_state('AH', '7S')
+    server, results = serve(stub, rules, 2000, [(state, 0), (state, 0)])
+    assert [result['tier'] for result, _ in results] == ['local', 'local']
+    assert len(stub.requests) == 2
+    assert server.stats()['refine_rejected'] == 2
+    assert not server.refiner.memo
+
+
+def test_rules_are_read_once(rules):
+    refiner = Refiner(ModelClient(api_key='test'), rules_path=rules)
+    prefix = refiner.prefix
+    rules.unlink()
+    assert refiner.prefix is prefix
+    assert 'Козыри' in prefix
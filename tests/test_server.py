@@ -0,0 +1,147 @@
+"""Сервер рекомендаций: склейка запросов, LRU-кэш, ошибки движка"""
+
+import asyncio
+import json
+
+from kozel_engine.server import RecommendServer, parse_game_state, state_key
+
+
+def game_state(*cards):
+    return {'myCards': list(cards), 'konNumber': 2}
+
+
+class SlowServer(RecommendServer):
+    """Сервер, который "считает" 50 мс и запоминает, что считал"""
+
+    def __init__(self, cache_size=8, fail=None):
+        super().__init__(workers=0, cache_size=cache_size)
+        self.computed_states = []
+        self.fail = fail
+
+    async def _compute(self, data):
+        self.computed_states.append(data)
+        await asyncio.sleep(0.05)
+        if self.fail is not None:
+            raise self.fail
+        return {'card': data['myCards'][0], 'reasoning': 'test'}
+
+
+async def post(port, body):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    data = json.dumps(body).encode()
+    writer.write(b'POST /recommend HTTP/1.1\r\nContent-Length: %d\r\n'
+                 b'Connection: close\r\n\r\n' % len(data) + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b'\r\n\r\n')
+    return int(head.split(b' ')[1]), json.loads(payload)
+
+
+def test_state_key_ignores_hand_order():
+    a = parse_game_state(game_state('10H', 'QC', '7S'))
+    b = parse_game_state(game_state('7S', '10H', 'QC'))
+    c = parse_game_state(dict(game_state('7S', '10H', 'QC'), konNumber=3))
+    assert state_key(a) == state_key(b)
+    assert state_key(a) != state_key(c)
+
+
+def test_identical_requests_are_coalesced():
+    async def scenario():
+        server = SlowServer()
+        results = await asyncio.gather(
+            *[server.recommend(game_state('AH', '7S')) for _ in range(10)]
+        )
+        return server, results
+
+    server, results = asyncio.run(scenario())
+    assert len(server.computed_states) == 1
+    assert server.counters['computed'] == 1
+    assert server.counters['coalesced'] == 9
+    assert [r['cached'] for r in results].count(False) == 1
+    assert all(r['card'] == 'AH' for r in results)
+    assert not server.in_flight
+
+
+def test_lru_cache_hit_and_eviction():
+    async def scenario():
+        server = SlowServer(cache_size=2)
+        first = await server.recommend(game_state('AH'))
+        again = await server.recommend(game_state('AH'))
+        await server.recommend(game_state('AS'))
+        await server.recommend(game_state('AH'))       # AH - самый свежий
+        await server.recommend(game_state('AD'))       # вытесняет AS
+        await server.recommend(game_state('AH'))
+        await server.recommend(game_state('AS'))
+        return server, first, again
+
+    server, first, again = asyncio.run(scenario())
+    assert first['cached'] is False and again['cached'] is True
+    assert [s['myCards'][0] for s in server.computed_states] == ['AH', 'AS', 'AD', 'AS']
+    assert server.counters['cache_hits'] == 3
+    assert len(server.cache) == 2
+
+
+def test_engine_error_returns_500_and_is_not_cached():
+    async def scenario():
+        server = SlowServer(fail=RuntimeError("пул упал"))
+        await server.start(port=0)
+        try:
+            responses = await asyncio.gather(
+                *[post(server.port, {'gameState': game_state('AH')}) for _ in range(3)]
+            )
+            bad = await post(server.port, {'gameState': game_state('XX')})
+        finally:
+            server.close()
+        return server, responses, bad
+
+    server, responses, bad = asyncio.run(scenario())
+    assert [status for status, _ in responses] == [500, 500, 500]
+    assert 'пул упал' in responses[0][1]['error']
+    assert bad[0] == 400
+    assert not server.cache and not server.in_flight
+    assert server.counters['errors'] == 4
+
+
+def test_kozelai_engine_over_http():
+    async def scenario():
+        server = RecommendServer('kozelai', workers=0)
+        await server.start(port=0)
+        try:
+            body = {'gameState': game_state('AH', '7S', 'QC', '10D')}
+            first = await post(server.port, body)
+            second = await post(server.port, body)
+        finally:
+            server.close()
+        return first, second
+
+    (status, first), (_, second) = asyncio.run(scenario())
+    assert status == 200
+    assert first['cached'] is False and second['cached'] is True
+    assert first['card'] == second['card']
+    assert first['reasoning'].startswith('Стратегия: ')
+
+
+def test_search_engines_accept_payload_without_played_cards():
+    # Третья взятка кона: две взятки сыграны, но расширение не шлёт
+    # playedCards, только число карт у других (правый уже положил карту)
+    body = {'gameState': {
+        'myCards': ['AH', '10H', 'KS', '9D', '8C', 'QC'],
+        'tableCards': [{'rank': '7', 'suit': 'hearts'}],
+        'konNumber': 2,
+        'leftCards': 6, 'topCards': 6, 'rightCards': 5,
+    }}
+
+    async def scenario(engine):
+        server = RecommendServer(engine, budget_ms=50, workers=0)
+        await server.start(port=0)
+        try:
+            return await post(server.port, body)
+        finally:
+            server.close()
+
+    for engine in ('pimc', 'ismcts'):
+        status, result = asyncio.run(scenario(engine))
+        assert status == 200, result
+        # Масть хода - черви, они есть на руке
+        assert result['card']['suit'] == 'hearts'
@@ -0,0 +1,151 @@
+"""Правила симулятора: поимка дамы, "яйца", все взятки, запреты козырных заходов"""
+
+import random
+
+from kozel_engine.cards import (
+    QUEEN_CLUBS,
+    SEVEN_CLUBS,
+    SIMPLE_MASK,
+    TRUMP_MASK,
+    card_index,
+    iter_cards,
+)
+from kozel_engine.simulator import (
+    CATCH_PENALTY,
+    LOSING_SCORE,
+    PAIR,
+    TRICKS_PER_KON,
+    KozelSimulator,
+    RandomPolicy,
+    game_rng,
+)
+
+
+def second_kon(seed=1):
+    """Симулятор в начале второго кона (все взятки в первом - партия заново)"""
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=random.Random(seed))
+    while sim.kon_number == 1:
+        sim.play_kon()
+        if sim.game_over:
+            sim.reset()
+    return sim
+
+
+def deal(sim, first, second):
+    """Раздать заново: у открывающего first, у следующего по часовой - second"""
+    rest = [c for c in range(32) if c not in (first, second)]
+    random.Random(0).shuffle(rest)
+    opener = sim.opener
+    hands = [0, 0, 0, 0]
+    hands[opener] = 1 << first
+    hands[(opener + 1) % 4] = 1 << second
+    for seat in range(4):
+        while hands[seat].bit_count() < 8:
+            hands[seat] |= 1 << rest.pop()
+    sim.hands = hands
+
+
+def finish(sim, points, tricks):
+    sim.points = list(points)
+    sim.tricks = list(tricks)
+    return sim._finish_kon()
+
+
+def test_queen_caught_by_other_team_ends_kon():
+    sim = second_kon()
+    deal(sim, QUEEN_CLUBS, SEVEN_CLUBS)
+    opener = sim.opener
+    score = list(sim.score)
+    eggs = sim.eggs
+
+    assert sim.step(QUEEN_CLUBS) is None
+    result = sim.step(SEVEN_CLUBS)
+
+    catcher = (opener + 1) & 1
+    assert result is not None
+    assert result.caught == catcher and result.winner == catcher
+    assert result.penalty == CATCH_PENALTY + eggs * PAIR == 4 + eggs * PAIR
+    assert sim.score[1 - catcher] == score[1 - catcher] + result.penalty
+    assert sim.score[catcher] == score[catcher]
+
+
+def test_queen_and_seven_from_one_team_are_not_a_catch():
+    sim = second_kon()
+    rest = [c for c in range(32) if c not in (QUEEN_CLUBS, SEVEN_CLUBS)]
+    opener = sim.opener
+    partner = (opener + 2) % 4
+    hands = [0, 0, 0, 0]
+    hands[opener] = 1 << QUEEN_CLUBS
+    hands[partner] = 1 << SEVEN_CLUBS
+    for seat in range(4):
+        while hands[seat].bit_count() < 8:
+            hands[seat] |= 1 << rest.pop()
+    sim.hands = hands
+
+    sim.step(QUEEN_CLUBS)
+    sim.step(next(iter_cards(sim.legal_mask())))
+    assert sim.step(SEVEN_CLUBS) is None
+    result = sim.step(next(iter_cards(sim.legal_mask())))
+    assert result is None
+    assert sim.tricks[partner & 1] == 1        # 7♣ взял взятку, кон идёт дальше
+
+
+def test_kon_scoring():
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=random.Random(2))
+    assert finish(sim, (70, 50), (5, 3)).penalty == PAIR
+    assert sim.score == [0, PAIR]
+    assert finish(sim, (20, 100), (2, 6)).penalty == 2 * PAIR
+    assert sim.score == [2 * PAIR, PAIR]
+
+
+def test_eggs_carry_a_pair_to_next_winner():
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=random.Random(3))
+    result = finish(sim, (60, 60), (4, 4))
+    assert result.winner is None and result.penalty == 0
+    assert sim.score == [0, 0] and sim.eggs == 1
+
+    result = finish(sim, (70, 50), (5, 3))
+    assert result.winner == 0
+    assert result.penalty == PAIR + PAIR
+    assert sim.score == [0, 2 * PAIR] and sim.eggs == 0
+
+
+def test_all_tricks_win_the_game():
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=random.Random(4))
+    result = finish(sim, (120, 0), (TRICKS_PER_KON, 0))
+    assert result.winner == 0 and result.penalty == LOSING_SCORE
+    assert sim.game_over and sim.winner == 0
+
+
+def test_no_trump_leads_in_first_kon():
+    for index in range(30):
+        sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(9, index))
+        while sim.kon_number == 1 and not sim.game_over:
+            if not sim.trick and sim.hands[sim.to_move] & SIMPLE_MASK:
+                assert not sim.legal_mask() & TRUMP_MASK
+            sim.step(sim.choose())
+
+
+def test_last_opener_team_banned_until_its_first_lead():
+    checked = 0
+    for index in range(30):
+        sim = second_kon(index)
+        banned_team = sim.prev_opener & 1
+        assert sim.opener & 1 != banned_team
+        led = False
+        while sim.kon_number == 2 and not sim.game_over:
+            seat = sim.to_move
+            if not sim.trick and seat & 1 == banned_team:
+                if not led and sim.hands[seat] & SIMPLE_MASK:
+                    assert not sim.legal_mask() & TRUMP_MASK
+                    checked += 1
+                if led:
+                    assert sim.legal_mask() == sim.hands[seat]
+                led = True
+            sim.step(sim.choose())
+    assert checked > 10
+
+
+def test_ace_of_diamonds_opens_first_kon():
+    sim = KozelSimulator([RandomPolicy()] * 4, rng=random.Random(5))
+    assert sim.hands[sim.opener] >> card_index('A', 'diamonds') & 1
@@ -0,0 +1,82 @@
+"""Решатель в открытую против полного минимакса на коротких эндшпилях"""
+
+import random
+
+import pytest
+
+from kozel_engine.cards import iter_cards
+from kozel_engine.simulator import KozelSimulator, RandomPolicy, game_rng
+from kozel_engine.solver import DoubleDummySolver
+
+
+def minimax(solver):
+    """Очки команды 0 полным перебором, без таблиц и отсечений"""
+    if not solver.trick and not solver.hands[solver.leader]:
+        return 0
+    maximizing = solver.to_move & 1 == 0
+    best = None
+    for card in iter_cards(solver.legal_mask()):
+        gained, terminal = solver.make(card)
+        value = terminal if terminal is not None else gained + minimax(solver)
+        solver.unmake(card)
+        if best is None or (value > best if maximizing else value < best):
+            best = value
+    return best
+
+
+def endgames(cards_left, count, seed):
+    """Позиции случайных партий, когда на руке cards_left карт (и 0-3 карты на столе)"""
+    positions = []
+    index = 0
+    while len(positions) < count:
+        sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(seed, index))
+        index += 1
+        if index % 2:
+            sim.play_kon()              # второй кон - запрет только у одной команды
+            if sim.game_over:
+                continue
+        kon = sim.kon_number
+        while sim.kon_number == kon and sim.tricks[0] + sim.tricks[1] < 8 - cards_left:
+            sim.step(sim.choose())
+        for _ in range(index % 4):
+            if sim.kon_number == kon:
+                sim.step(sim.choose())
+        if sim.kon_number == kon and not sim.game_over:
+            positions.append(sim)
+    return positions
+
+
+@pytest.mark.parametrize('cards_left, count', [(2, 40), (3, 30), (4, 6)])
+def test_solve_matches_minimax(cards_left, count):
+    shared = DoubleDummySolver()    # таблица переживает загрузки - как в pimc
+    for sim in endgames(cards_left, count, seed=cards_left):
+        reference = DoubleDummySolver()
+        reference.load_simulator(sim)
+        expected = minimax(reference)
+
+        for solver in (DoubleDummySolver(), shared):
+            solver.load_simulator(sim)
+            result = solver.solve()
+            assert result.points[0] == expected
+            assert max(solver.evaluate_moves().values()) == result.points[sim.to_move & 1]
+
+
+def test_trick_order_is_part_of_the_key():
+    # Одни и те же руки, стол [X, Y] и [Y, X]: позиции разные, таблица общая
+    rng = random.Random(11)
+    shared = DoubleDummySolver()
+    for _ in range(40):
+        deck = list(range(32))
+        rng.shuffle(deck)
+        hands = [0, 0, 0, 0]
+        for seat, size in enumerate((3, 3, 4, 4)):
+            for card in deck[:size]:
+                hands[seat] |= 1 << card
+            del deck[:size]
+        x, y = deck[:2]
+        played = sum(1 << card for card in deck[2:])
+        for trick in ([x, y], [y, x]):
+            fresh = DoubleDummySolver()
+            fresh.load(hands, 0, trick, played=played)
+            shared.load(hands, 0, trick, played=played)
+            assert shared.solve().points == fresh.solve().points
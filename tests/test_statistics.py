@@ -0,0 +1,90 @@
+"""Накопительные счётчики GameStatistics против перебора истории игр"""
+
+import json
+import math
+import os
+import shutil
+import subprocess
+
+import pytest
+
+STATISTICS = os.path.join(os.path.dirname(__file__), '..', 'kozel-assistant', 'ai', 'statistics.js')
+
+JS_DRIVER = """
+const GameStatistics = require(%(path)s);
+const statistics = new GameStatistics();
+statistics.recentSize = 10;
+let seed = 11;  // Парк-Миллер: произведение точно помещается в double
+const rand = n => (seed = seed * 16807 %% 2147483647) %% n;
+
+const results = ['win', 'win', 'loss', 'draw'];
+const history = [];  // Новые первыми, как gamesHistory
+const stats = statistics.createEmptyStats();
+const checks = [];
+for (let i = 0; i < 60; i++) {
+    const game = { result: results[rand(4)], myScore: rand(120), opponentScore: rand(120) };
+    history.unshift(game);
+    statistics.updateStreak(stats.streak, game.result);
+    statistics.addToWindow(stats.recent, game);
+    checks.push({
+        streak: statistics.getCurrentStreak(stats),
+        recent: statistics.getRecentStats(stats),
+        history: history.slice()
+    });
+}
+// Миграция старой статистики по gamesHistory из 25 игр
+const migrated = statistics.migrateStats({ gamesHistory: history.slice(0, 25) });
+process.stdout.write(JSON.stringify({
+    checks,
+    migrated: {
+        version: migrated.version,
+        streak: statistics.getCurrentStreak(migrated),
+        recent: statistics.getRecentStats(migrated),
+        history: history.slice(0, 25)
+    }
+}));
+"""
+
+
+def scan(history, size=10):
+    """Серия и окно перебором, как считалось до счётчиков"""
+    streak = 0
+    for game in history:
+        if game['result'] != history[0]['result']:
+            break
+        streak += 1
+    window = history[:size]
+    wins = sum(g['result'] == 'win' for g in window)
+    return {
+        'streak': {'type': history[0]['result'], 'count': streak},
+        'games': len(window),
+        'wins': wins,
+        'losses': sum(g['result'] == 'loss' for g in window),
+        'winRate': f'{wins / len(window) * 100:.1f}',
+        # Math.round: половина округляется вверх
+        'my': math.floor(sum(g['myScore'] for g in window) / len(window) + 0.5),
+    }
+
+
+def observed(check):
+    recent = check['recent']
+    return {
+        'streak': check['streak'],
+        'games': recent['games'],
+        'wins': recent['wins'],
+        'losses': recent['losses'],
+        'winRate': recent['winRate'],
+        'my': recent['averageScore']['my'],
+    }
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="нужен node")
+def test_running_aggregates_match_history_scan():
+    script = JS_DRIVER % {'path': json.dumps(os.path.abspath(STATISTICS))}
+    done = subprocess.run(['node'], input=script, capture_output=True, text=True,
+                          check=True, timeout=60)
+    result = json.loads(done.stdout)
+    for check in result['checks']:
+        assert observed(check) == scan(check['history'])
+    assert result['migrated']['version'] == 2
+    assert observed(result['migrated']) == scan(result['migrated']['history'])
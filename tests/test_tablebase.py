@@ -0,0 +1,113 @@
+"""Таблица эндшпилей: файл с открытой адресацией и пробы решателя"""
+
+import pickle
+
+import pytest
+
+from kozel_bot_architecture import KozelAI
+from kozel_engine.ismcts import ISMCTSEngine
+from kozel_engine.pimc import PIMCEvaluator
+from kozel_engine.simulator import TRICKS_PER_KON, KozelSimulator, RandomPolicy, game_rng
+from kozel_engine.solver import DoubleDummySolver, boundary_key
+from kozel_engine.tablebase import (
+    HEADER,
+    RECORD,
+    EndgameTablebase,
+    _solve_shard,
+    fingerprint,
+    write_table,
+)
+
+
+def table(tmp_path, entries, max_cards=3):
+    path = str(tmp_path / 'endgames.kztb')
+    write_table(path, entries, max_cards)
+    return EndgameTablebase(path)
+
+
+def test_write_table_round_trip(tmp_path):
+    entries = {fingerprint((0, 0, (i,), (), (), ())): i % 121 for i in range(100)}
+    with table(tmp_path, entries) as tablebase:
+        assert len(tablebase) == 100
+        assert tablebase.max_cards == 3
+        assert tablebase.slots >= 200 and tablebase.slots & (tablebase.slots - 1) == 0
+        for i in range(100):
+            assert tablebase.probe_key((0, 0, (i,), (), (), ())) == i % 121
+        assert tablebase.probe_key((1, 0, (0,), (), (), ())) is None
+        assert tablebase.hits == 100 and tablebase.probes == 101
+
+
+def test_colliding_fingerprints_use_linear_probing(tmp_path, monkeypatch):
+    # Все отпечатки в одном слоте, последний - с переходом через конец таблицы
+    slots = 16
+    prints = [slots - 1 + slots * k for k in range(1, 5)]
+    entries = {value: index for index, value in enumerate(prints)}
+    monkeypatch.setattr('kozel_engine.tablebase.fingerprint', lambda key: key[0])
+    with table(tmp_path, entries) as tablebase:
+        assert tablebase.slots == slots
+        for index, value in enumerate(prints):
+            assert tablebase.probe_key((value,)) == index
+        # Тот же слот, но отпечатка нет - проба идёт до пустого слота
+        assert tablebase.probe_key((slots - 1 + slots * 9,)) is None
+        stored = [
+            RECORD.unpack_from(tablebase._mmap, HEADER.size + slot * RECORD.size)[0]
+            for slot in (15, 0, 1, 2)
+        ]
+        assert stored == prints
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'bad.kztb'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        EndgameTablebase(str(path))
+
+
+def test_pickle_reopens_by_path(tmp_path):
+    key = (2, 1, (5, 9), (), (3,), ())
+    with table(tmp_path, {fingerprint(key): 42}) as tablebase:
+        copy = pickle.loads(pickle.dumps(tablebase))
+        try:
+            assert copy.path == tablebase.path
+            assert copy.probe_key(key) == 42
+        finally:
+            copy.close()
+
+
+def test_solver_with_table_matches_plain_search(tmp_path):
+    # Таблица по раздачам архива отвечает на хвосты тех же конов
+    entries = _solve_shard((3, 0, 4, 3))
+    assert entries
+    with table(tmp_path, entries) as tablebase:
+        probing = DoubleDummySolver(tablebase=tablebase)
+        checked = 0
+        for index in range(4):
+            sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(3, index))
+            kon = sim.kon_number
+            while sim.kon_number == kon and not sim.game_over and (
+                    sim.trick or sim.tricks[0] + sim.tricks[1] < TRICKS_PER_KON - 3):
+                sim.step(sim.choose())
+            if sim.kon_number != kon or sim.game_over:
+                continue
+            plain = DoubleDummySolver()
+            plain.load_simulator(sim)
+            probing.clear()
+            probing.load_simulator(sim)
+            key = boundary_key(plain.hands, plain.leader, plain.ban | plain.sticky_ban << 2)
+            assert tablebase.probe_key(key) == plain.value()
+            assert probing.probe_tablebase() == plain.value()
+            assert probing.solve().points == plain.solve().points
+            checked += 1
+        assert checked > 0
+        assert tablebase.hits >= 2 * checked
+
+
+def test_only_solver_takes_a_table():
+    # Таблица экспериментальная: ИИ и онлайн-поиск её не принимают
+    with pytest.raises(TypeError):
+        ISMCTSEngine(iterations=10, tablebase=object())
+    with pytest.raises(TypeError):
+        PIMCEvaluator(tablebase=object())
+    with pytest.raises(TypeError):
+        KozelAI(tablebase=object())
+    assert DoubleDummySolver().probe_tablebase() is None
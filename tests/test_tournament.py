@@ -0,0 +1,92 @@
+"""Турнир: воспроизводимость по зерну, сводка шардов, доверительные интервалы"""
+
+import math
+
+import pytest
+
+from kozel_engine.tournament import (
+    Z_95,
+    _play_shard,
+    aggregate,
+    load_records,
+    make_tasks,
+    mean_interval,
+    run_tournament,
+    wilson_interval,
+)
+
+CONFIGS = [
+    {'name': 'random_a', 'policy': 'kozel_engine.simulator:RandomPolicy'},
+    {'name': 'random_b', 'policy': 'kozel_engine.simulator:RandomPolicy'},
+    {'name': 'kozelai'},
+]
+
+
+def game_key(record):
+    return record['a'], record['b'], record['swapped'], record['game']
+
+
+def test_results_do_not_depend_on_workers_or_shards(tmp_path):
+    one = run_tournament(CONFIGS, 5, str(tmp_path / 'one.jsonl'), seed=3,
+                         workers=1, shard_size=5)
+    two = run_tournament(CONFIGS, 5, str(tmp_path / 'two.jsonl'), seed=3,
+                         workers=2, shard_size=2)
+    assert one == two
+
+    records = sorted(load_records(str(tmp_path / 'one.jsonl')), key=game_key)
+    assert records == sorted(load_records(str(tmp_path / 'two.jsonl')), key=game_key)
+    # 3 пары x 2 рассадки x 5 раздач
+    assert len(records) == 30
+
+    # Сводка по JSONL (в любом порядке строк) - та же, что у турнира
+    assert aggregate(reversed(records), CONFIGS) == one
+
+    other = run_tournament(CONFIGS[:2], 5, str(tmp_path / 'seed.jsonl'), seed=4, workers=1)
+    assert [r['score_a'] for r in load_records(str(tmp_path / 'seed.jsonl'))] != \
+        [r['score_a'] for r in records if (r['a'], r['b']) == (0, 1)]
+    assert other[0]['games'] == 10
+
+
+def test_shards_cover_every_deal_once():
+    tasks = make_tasks(CONFIGS, 7, seed=0, shard_size=3)
+    deals = sorted((a, b, swapped, game)
+                   for a, _, b, _, _, start, count, swapped in tasks
+                   for game in range(start, start + count))
+    assert deals == sorted((a, b, swapped, game)
+                           for a, b in ((0, 1), (0, 2), (1, 2))
+                           for swapped in (False, True) for game in range(7))
+
+    # Партия шарда - та же, что партия одиночного шарда с тем же номером
+    task = tasks[0]
+    record = _play_shard(task)[2]
+    assert _play_shard(task[:5] + (2, 1) + task[7:])[0] == record
+
+
+def test_summary_statistics():
+    records = [
+        {'a': 0, 'b': 1, 'a_won': won, 'kons': 2, 'a_points': points,
+         'a_points_sq': points_sq}
+        for won, points, points_sq in ((True, 100, 6800), (False, 40, 1000), (True, 80, 3400))
+    ]
+    [summary] = aggregate(records, CONFIGS)
+    assert summary['games'] == 3 and summary['kons'] == 6
+    assert summary['win_rate'] == pytest.approx(2 / 3)
+    assert summary['win_rate_ci'] == list(wilson_interval(2, 3))
+    assert summary['avg_kon_points'] == pytest.approx(220 / 6)
+    half = Z_95 * math.sqrt((11200 / 6 - (220 / 6) ** 2) / 6)
+    assert summary['avg_kon_points_ci'] == pytest.approx([220 / 6 - half, 220 / 6 + half])
+
+
+def test_intervals():
+    low, high = wilson_interval(50, 100)
+    assert (low, high) == pytest.approx((0.40383, 0.59617), abs=1e-5)
+    # Уилсон не выходит за [0, 1] и при крайних долях
+    assert wilson_interval(0, 10)[0] == pytest.approx(0.0, abs=1e-12)
+    assert wilson_interval(10, 10)[1] == pytest.approx(1.0)
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+
+    # Значения 1, 1, 2, 3, 3: среднее 2, дисперсия 0.8
+    assert mean_interval(10, 24, 5) == pytest.approx(
+        (2.0, 2.0 - Z_95 * math.sqrt(0.8 / 5), 2.0 + Z_95 * math.sqrt(0.8 / 5)))
+    assert mean_interval(7, 49, 1) == (7.0, 7.0, 7.0)
+    assert mean_interval(0, 0, 0) == (0.0, 0.0, 0.0)
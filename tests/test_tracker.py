@@ -0,0 +1,77 @@
+"""CardTracker: выводы о мастях и невиданных картах против раздачи симулятора"""
+
+import pytest
+
+from kozel_engine.cards import FULL_DECK, SIMPLE_MASK, card_index, count
+from kozel_engine.simulator import KozelSimulator, RandomPolicy, game_rng
+from kozel_engine.tracker import CardTracker
+
+
+def check_tracker(sim, seat, kon_played):
+    """Знания места seat не противоречат настоящим рукам"""
+    tracker = sim.trackers[seat]
+    assert tracker.hand == sim.hands[seat]
+    assert tracker.played == kon_played
+    assert tracker.unseen == FULL_DECK & ~(sim.hands[seat] | kon_played)
+    for other in range(4):
+        relative = (other - seat) % 4
+        hand = sim.hands[other]
+        assert tracker.counts[relative] == count(hand)
+        # Настоящая рука - внутри возможных карт, пустые масти - пусты
+        assert hand & ~tracker.can_hold[relative] == 0
+        assert hand & tracker.voids[relative] == 0
+    for relative, mask in tracker.forbidden().items():
+        assert sim.hands[(seat + relative) % 4] & mask == 0
+
+    matrix = tracker.probabilities()
+    for card in range(32):
+        total = sum(matrix[card])
+        if tracker.unseen >> card & 1:
+            assert total == pytest.approx(1.0)
+        else:
+            assert total == 0
+
+
+def test_tracker_matches_simulator_ground_truth():
+    voids = 0
+    for i in range(60):
+        sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(9, i), track_cards=True)
+        kon, kon_played = sim.kon_number, 0
+        while not sim.game_over:
+            card = sim.choose()
+            sim.step(card)
+            if sim.game_over:
+                break
+            if sim.kon_number != kon:
+                kon, kon_played = sim.kon_number, 0
+            else:
+                kon_played |= 1 << card
+            for seat in range(4):
+                check_tracker(sim, seat, kon_played)
+            voids += sum(bool(v) for v in sim.trackers[0].voids)
+    # Проверка не пустая: пустые масти выводятся часто
+    assert voids > 100
+
+
+def test_void_and_trump_lead_inference():
+    hearts = [card_index(rank, 'hearts') for rank in ('7', '8', '9', '10', 'K', 'A')]
+    hand = 1 << hearts[0] | 1 << hearts[1] | 1 << card_index('Q', 'clubs')
+    tracker = CardTracker()
+    tracker.new_kon(hand, leader=0, banned=(False, True), counts=[3, 3, 3, 3])
+
+    tracker.observe(0, hearts[0])
+    # Место 1 не подложило черву - черв у него нет
+    tracker.observe(1, card_index('7', 'spades'))
+    assert tracker.has_void(1, hearts[2])
+    assert not tracker.can_have(1, hearts[5])
+    assert not tracker.has_void(2, hearts[2])
+    tracker.observe(2, hearts[2])
+    tracker.observe(3, hearts[3])
+
+    # Взял 10♥ (место 3); его команда под запретом заходит козырем -
+    # простых карт у места 3 больше нет
+    assert tracker.leader == 3
+    tracker.observe(3, card_index('J', 'diamonds'))
+    assert not tracker.simple_left(3)
+    assert tracker.can_hold[3] & SIMPLE_MASK == 0
+    assert 3 in tracker.forbidden()
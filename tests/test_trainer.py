@@ -0,0 +1,117 @@
+"""Офлайн-обучение KozelML: градиенты, поток блоков, экспорт в TF.js"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from kozel_engine.archive import play_game  # noqa: E402
+from kozel_engine.features import INPUT_SIZE, OUTPUT_SIZE, open_shards, write_shards  # noqa: E402
+from kozel_engine.simulator import RandomPolicy, game_rng  # noqa: E402
+from kozel_engine.trainer import (  # noqa: E402
+    DenseModel,
+    evaluate,
+    iter_batches,
+    split_blocks,
+    train,
+)
+
+TF_PATH = os.path.join(os.path.dirname(__file__), '..', 'kozel-assistant', 'lib', 'tf.min.js')
+
+JS_PREDICT = """
+const tf = require(%(tf)s);
+const fs = require('fs');
+const dir = %(dir)s;
+const artifacts = JSON.parse(fs.readFileSync(dir + '/model.json', 'utf-8'));
+const group = artifacts.weightsManifest[0];
+const data = fs.readFileSync(dir + '/' + group.paths[0]);
+(async () => {
+    await tf.setBackend('cpu');
+    const model = await tf.loadLayersModel(tf.io.fromMemory({
+        modelTopology: artifacts.modelTopology,
+        weightSpecs: group.weights,
+        weightData: data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength)
+    }));
+    const names = model.layers.map(layer => layer.name);
+    const probs = await model.predict(tf.tensor2d(%(x)s)).array();
+    console.log(JSON.stringify({names, probs}));
+})();
+"""
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    out = tmp_path_factory.mktemp('dataset')
+    games = [play_game([RandomPolicy()] * 4, game_rng(3, i)) for i in range(60)]
+    write_shards(games, str(out), shard_size=1000)
+    return str(out)
+
+
+def test_gradients_match_finite_differences():
+    rng = np.random.default_rng(0)
+    model = DenseModel(seed=1, dtype=np.float64)
+    x = rng.random((6, INPUT_SIZE))
+    actions = rng.integers(OUTPUT_SIZE, size=6)
+    rewards = rng.random(6)
+    _, grads, _ = model.loss_and_grads(x, actions, rewards)
+
+    for layer, (i, j) in ((0, (5, 7)), (2, (3, 1)), (3, (10, 4))):
+        kernel = model.weights[layer][0]
+        saved = kernel[i, j]
+        kernel[i, j] = saved + 1e-6
+        plus = model.loss_and_grads(x, actions, rewards)[0]
+        kernel[i, j] = saved - 1e-6
+        minus = model.loss_and_grads(x, actions, rewards)[0]
+        kernel[i, j] = saved
+        assert grads[layer][0][i, j] == pytest.approx((plus - minus) / 2e-6, rel=1e-4, abs=1e-9)
+
+
+def test_blocks_cover_rows_once(dataset):
+    shards = open_shards(dataset)
+    total = sum(len(s.action) for s in shards)
+    train_blocks, validation_blocks = split_blocks(shards, 0.25, block_rows=300)
+    assert sum(b - a for _, a, b in validation_blocks) == int(total * 0.25)
+
+    rng = np.random.default_rng(4)
+    seen = []
+    for x, actions, rewards in iter_batches(shards, train_blocks, 64, rng, workers=3):
+        assert x.shape[1] == INPUT_SIZE and len(x) <= 64
+        # Строка узнаётся по сыгранной карте и награде
+        seen.extend(zip(actions.tolist(), rewards.tolist()))
+    expected = [(int(s.action[i]), float(s.reward[i]))
+                for index, a, b in train_blocks for s in [shards[index]] for i in range(a, b)]
+    assert sorted(seen) == sorted(expected)
+
+
+def test_training_lowers_validation_loss(dataset):
+    shards = open_shards(dataset)
+    untrained = DenseModel(seed=2)
+    _, history = train(shards, DenseModel(seed=2), epochs=3, seed=2, workers=2)
+    before, _ = evaluate(untrained, shards, split_blocks(shards)[1])
+    assert history[-1].val_loss < before
+    assert history[-1].loss < history[0].loss
+
+
+@pytest.mark.skipif(shutil.which('node') is None or not os.path.exists(TF_PATH),
+                    reason="нужны node и kozel-assistant/lib/tf.min.js")
+def test_export_loads_in_tfjs(dataset, tmp_path):
+    shards = open_shards(dataset)
+    model, _ = train(shards, epochs=1, seed=5)
+    model.save_tfjs(str(tmp_path / 'model'))
+    assert DenseModel.load_tfjs(str(tmp_path / 'model')).weights[0][0].tolist() == \
+        model.weights[0][0].tolist()
+
+    x = np.asarray(shards[0].x[:20])
+    script = JS_PREDICT % {'tf': json.dumps(os.path.abspath(TF_PATH)),
+                           'dir': json.dumps(str(tmp_path / 'model')),
+                           'x': json.dumps(x.tolist())}
+    done = subprocess.run(['node'], input=script, capture_output=True, text=True,
+                          check=True, timeout=120)
+    result = json.loads(done.stdout.strip().splitlines()[-1])
+    assert result['names'] == ['input_layer', 'dropout_1', 'hidden_1', 'dropout_2',
+                               'hidden_2', 'output_layer']
+    assert np.allclose(result['probs'], model.predict(x), atol=1e-5)
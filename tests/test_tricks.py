@@ -0,0 +1,74 @@
+"""Таблицы взяток против Card.compareInTrick из расширения"""
+
+import json
+import random
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from kozel_engine.cards import NUM_CARDS, RANKS, SUITS
+from kozel_engine.tricks import (
+    BEATS,
+    LEAD_CONTEXT,
+    POINTS,
+    TRUMP_ORDER,
+    resolve_trick,
+    trick_winner,
+)
+
+CARD_JS = Path(__file__).resolve().parent.parent / 'kozel-assistant' / 'ai' / 'card.js'
+
+# Для каждого захода lead, старшей winner и карты card: бьёт ли card
+# (compareInTrick > 0) - строка из 32*32*32 символов '0'/'1'
+COMPARE_ALL = """
+const fs = require('fs');
+const Card = new Function(fs.readFileSync(process.argv[1], 'utf8') + '; return Card;')();
+const ranks = %s, suits = %s;
+const deck = [];
+for (const suit of suits) for (const rank of ranks) deck.push(new Card(rank, suit));
+let out = '';
+for (const lead of deck) {
+    const leadSuit = lead.getSimpleSuit();
+    for (const winner of deck)
+        for (const card of deck)
+            out += card.compareInTrick(winner, leadSuit) > 0 ? '1' : '0';
+}
+process.stdout.write(out);
+"""
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason="нужен Node.js")
+def test_beats_matches_compare_in_trick():
+    script = COMPARE_ALL % (json.dumps(RANKS), json.dumps(SUITS))
+    result = subprocess.run(['node', '-e', script, str(CARD_JS)],
+                            capture_output=True, text=True, check=True)
+    expected = result.stdout
+    assert len(expected) == NUM_CARDS ** 3
+
+    mismatches = [
+        (lead, winner, card)
+        for lead in range(NUM_CARDS)
+        for winner in range(NUM_CARDS)
+        for card in range(NUM_CARDS)
+        if BEATS[LEAD_CONTEXT[lead] << 10 | winner << 5 | card]
+        != int(expected[(lead * NUM_CARDS + winner) * NUM_CARDS + card])
+    ]
+    assert mismatches == []
+
+
+def test_seven_of_clubs_is_highest_trump():
+    seven = RANKS.index('7')
+    assert TRUMP_ORDER[seven] == max(TRUMP_ORDER)
+    assert RANKS.index('8') in [i for i in range(NUM_CARDS) if TRUMP_ORDER[i] == 0]
+
+
+def test_resolve_trick_matches_trick_winner():
+    rng = random.Random(5)
+    deck = list(range(NUM_CARDS))
+    for _ in range(5000):
+        trick = rng.sample(deck, 4)
+        offset, points = resolve_trick(*trick)
+        assert (offset, trick[offset]) == trick_winner(trick)
+        assert points == sum(POINTS[card] for card in trick)
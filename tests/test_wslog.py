@@ -0,0 +1,156 @@
+"""Потоковый разбор дампов WebSocket: коны из сообщений симулятора"""
+
+import gzip
+import io
+import json
+import subprocess
+import sys
+import tracemalloc
+
+import pytest
+
+from kozel_engine.cards import card_name
+from kozel_engine.simulator import POSITIONS, KozelSimulator, RandomPolicy, game_rng
+from kozel_engine.wslog import (
+    convert_dumps,
+    iter_json_values,
+    iter_records,
+    parse_dump,
+)
+
+
+def card(index):
+    name = card_name(index)
+    return {'rank': name[:-1], 'suit': {'C': 'clubs', 'S': 'spades',
+                                        'H': 'hearts', 'D': 'diamonds'}[name[-1]]}
+
+
+def simulated_messages(games, seed=0):
+    """
+    Сообщения, как их видел бы место 0, и итоги конов симулятора
+
+    Раздача приходит дважды (повтор после переподключения), после каждого
+    хода - шумовое сообщение и эхо нашего хода исходящим.
+    """
+    messages, results = [], []
+    time = 0
+    for index in range(games):
+        sim = KozelSimulator([RandomPolicy()] * 4, rng=game_rng(seed, index))
+        while not sim.game_over:
+            hand = [card(c) for c in range(32) if sim.hands[0] >> c & 1]
+            for _ in range(2):
+                messages.append({'direction': 'in', 'time': time,
+                                 'data': {'myCards': hand, 'konNumber': sim.kon_number}})
+            result = None
+            while result is None:
+                seat = sim.to_move
+                played = sim.choose()
+                time += 1
+                move = {'position': POSITIONS[seat], 'card': card(played)}
+                if seat == 0:
+                    messages.append({'direction': 'out', 'time': time, 'data': {'play': move}})
+                messages.append({'direction': 'in', 'time': time, 'data': {'move': move}})
+                messages.append({'direction': 'in', 'time': time, 'data': {'ping': 1}})
+                result = sim.step(played)
+            messages.append({'direction': 'in', 'time': time,
+                             'data': {'konResult': {'points': result.points}}})
+            results.append(result)
+    return messages, results
+
+
+def write_array(path, messages):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(messages, f, ensure_ascii=False, indent=1)
+
+
+def test_kons_match_simulator(tmp_path):
+    messages, results = simulated_messages(3)
+    path = tmp_path / 'dump.json'
+    write_array(path, messages)
+
+    records = list(parse_dump(path))
+    assert len(records) == len(results)
+    for record, result in zip(records, results):
+        assert record['complete'] and record['kon'] == result.kon_number
+        assert record['result'] == {'points': list(result.points)}
+        if result.caught is None:
+            assert len(record['tricks']) == sum(result.tricks)
+            assert [record['points']['us'], record['points']['them']] == list(result.points)
+            assert sum(t['points'] for t in record['tricks']) == 120
+        else:
+            assert record['caught'] == ('us', 'them')[result.caught]
+        assert len(record['hand']) == 8
+
+
+def test_chunk_boundaries_and_formats(tmp_path):
+    messages, _ = simulated_messages(1, seed=4)
+    array = tmp_path / 'dump.json'
+    write_array(array, messages)
+    lines = tmp_path / 'dump.jsonl.gz'
+    with gzip.open(lines, 'wt', encoding='utf-8') as f:
+        for message in messages:
+            f.write(json.dumps(message) + '\n')
+
+    expected = [dict(r, source=None) for r in parse_dump(array)]
+    for path, chunk_size in ((array, 7), (array, 1), (lines, 13)):
+        got = [dict(r, source=None) for r in parse_dump(path, chunk_size=chunk_size)]
+        assert got == expected
+
+
+def test_json_values_stream():
+    text = '[ {"a": 1},{"b": [1, 2]} ,\n{"c": "x]y"} ]'
+    assert list(iter_json_values(io.StringIO(text), chunk_size=3)) == [
+        {'a': 1}, {'b': [1, 2]}, {'c': 'x]y'}]
+    text = '{"a": 12345}\n{"b": 2}\n'
+    assert list(iter_json_values(io.StringIO(text), chunk_size=4)) == [{'a': 12345}, {'b': 2}]
+
+
+def test_memory_does_not_grow_with_file(tmp_path):
+    messages, _ = simulated_messages(3, seed=7)
+    path = tmp_path / 'big.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(40):
+            for message in messages:
+                f.write(json.dumps(message) + '\n')
+    assert path.stat().st_size > 5_000_000
+
+    tracemalloc.start()
+    kons = 0
+    for _ in parse_dump(path):
+        kons += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert kons > 40
+    assert peak < 1_000_000
+
+
+def test_convert_dumps_in_parallel(tmp_path):
+    paths = []
+    for seed in range(3):
+        messages, _ = simulated_messages(1, seed=seed)
+        path = tmp_path / f'dump{seed}.json'
+        write_array(path, messages)
+        paths.append(path)
+
+    counts = convert_dumps(paths, tmp_path / 'out', workers=2)
+    sequential = list(iter_records(paths))
+    converted = []
+    for path in paths:
+        out = tmp_path / 'out' / (path.stem + '.kons.jsonl')
+        with open(out, encoding='utf-8') as f:
+            converted.extend(json.loads(line) for line in f)
+    assert converted == sequential
+    assert sum(counts.values()) == len(sequential)
+
+
+@pytest.mark.parametrize('module', ['wslog', 'archive', 'features'])
+def test_log_tools_do_not_import_server(module):
+    # parse_card живёт в model: разбор логов не тянет сервер и ИИ
+    if module == 'features':
+        pytest.importorskip('numpy')
+    code = (f"import sys, kozel_engine.{module}; "
+            "print(sorted(m for m in sys.modules "
+            "if m in ('kozel_engine.server', 'kozel_bot_architecture')))")
+    done = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                          check=True, timeout=60)
+    assert done.stdout.strip() == '[]'